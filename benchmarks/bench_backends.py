@@ -0,0 +1,90 @@
+"""
+Benchmark of the pandas and Arrow transform backends
+
+Runs the transform plan and the validation checks with both backends on
+the same raw frame and prints the time of every plan step side by side,
+so it is visible where each backend wins. The outputs are compared too.
+
+    python benchmarks/bench_backends.py --rows 500000
+    python benchmarks/bench_backends.py --input data/dataset.csv --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+
+from synthetic_data import synthetic_frame
+from transform import BACKENDS, build_plan
+from validate import validate_raw_data, validate_transformed_data
+
+
+def run_backend(raw_df: pd.DataFrame, backend: str, repeat: int, workers: int):
+    """Best time of every plan step and of validation over several runs"""
+    best = {}
+    result = None
+    for _ in range(repeat):
+        plan = build_plan(workers=workers, backend=backend)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = plan.execute(raw_df)
+            # Без отчета трансформации - валидация сама ищет дубликаты
+            unreported = result.copy(deep=False)
+            unreported.attrs = {}
+            started = time.perf_counter()
+            validate_raw_data(raw_df, backend=backend)
+            validate_transformed_data(unreported, backend=backend)
+            validate_seconds = time.perf_counter() - started
+        timings = {name: stats['seconds'] for name, stats in plan.stats.items()}
+        timings['total'] = sum(timings.values())
+        timings['validate'] = validate_seconds
+        for name, seconds in timings.items():
+            best[name] = min(best.get(name, seconds), seconds)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение backend pandas и arrow для transform и validate')
+    parser.add_argument('--rows', type=int, default=200000, help='Строк в синтетических данных')
+    parser.add_argument('--input', default=None, help='Свои данные (CSV/Parquet) вместо синтетических')
+    parser.add_argument('--repeat', type=int, default=3, help='Повторов, берется лучшее время')
+    parser.add_argument('--workers', type=int, default=1, help='Потоков на колоночную работу')
+    args = parser.parse_args()
+
+    if args.input:
+        from extract import finish_raw_landing, load_data
+        with contextlib.redirect_stdout(io.StringIO()):
+            raw_df = load_data(args.input)
+            # Снимок дописывается до замеров, а не параллельно с ними
+            finish_raw_landing()
+    else:
+        raw_df = synthetic_frame(args.rows)
+    print(f"Данные: {len(raw_df)} строк, {len(raw_df.columns)} колонок; повторов: {args.repeat}")
+
+    results = {}
+    outputs = {}
+    for backend in BACKENDS:
+        results[backend], outputs[backend] = run_backend(raw_df, backend, args.repeat, args.workers)
+
+    pd.testing.assert_frame_equal(outputs['pandas'], outputs['arrow'])
+    print("Результаты backend совпадают")
+
+    steps = list(dict.fromkeys(list(results['pandas']) + list(results['arrow'])))
+    print(f"\n{'шаг':<22}{'pandas, мс':>12}{'arrow, мс':>12}  быстрее")
+    for step in steps:
+        times = {backend: results[backend].get(step) for backend in BACKENDS}
+        cells = [f"{times[backend] * 1000:12.1f}" if times[backend] is not None else f"{'-':>12}"
+                 for backend in BACKENDS]
+        winner = ''
+        if None not in times.values():
+            fast, slow = sorted(BACKENDS, key=lambda backend: times[backend])
+            winner = f"{fast} x{times[slow] / times[fast]:.1f}" if times[fast] else fast
+        print(f"{step:<22}{''.join(cells)}  {winner}")
+
+
+if __name__ == "__main__":
+    main()
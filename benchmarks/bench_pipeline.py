@@ -0,0 +1,293 @@
+"""
+Benchmark of the whole ETL pipeline and of DataLoader on synthetic data
+
+Generates raw data with the schema of the genetic disorder dataset (see
+synthetic_data.py) at every requested size, runs etl/main.py on it in a
+separate process per run (whole-frame and streaming modes, so peak RSS is
+measured per run) and times every DataLoader method on the same file.
+Stage timings come from the --metrics-json of the pipeline (wall, CPU,
+peak RSS, rows and bytes per stage, plus transform plan steps and load
+sinks). Results are saved as JSON; --compare prints the change against
+an earlier result and exits with 1 on a slowdown above --threshold.
+
+    python benchmarks/bench_pipeline.py --sizes 10k,100k,1m
+    python benchmarks/bench_pipeline.py --sizes 10m --modes stream --batch-rows 500000
+    python benchmarks/bench_pipeline.py --sizes 100k --compare data/benchmarks/pipeline-1a2b3c4-20260101-120000.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(ROOT, 'etl'))
+sys.path.append(os.path.join(ROOT, 'experiments', 'data_loader_project'))
+
+from data_loader import DataLoader
+from stage_cache import code_version
+from synthetic_data import COLUMN_NAMES, write_synthetic
+
+PIPELINE = os.path.join(ROOT, 'etl', 'main.py')
+
+SIZE_SUFFIXES = {'k': 1000, 'm': 1000000}
+
+# Методы DataLoader в порядке обычного запуска; каждый замеряется на свежей копии сырого фрейма
+LOADER_METHODS = ('load_data', 'clean_special_values', 'auto_clean_problematic_columns', 'fix_medical_terminology',
+                  'convert_boolean_columns', 'analyze_data', 'get_recommended_types', 'set_column_types',
+                  'smart_data_preprocessing', 'convert_data_types_smart', 'validate_columns', 'show_info',
+                  'get_data_quality_report', 'save_data')
+
+# Замеры короче этого не сравниваются: в них больше шума, чем сигнала
+MIN_COMPARE_SECONDS = 0.05
+
+
+def parse_size(text: str) -> int:
+    """Row count like 10000, 10k or 10m"""
+    text = text.strip().lower().replace('_', '')
+    multiplier = SIZE_SUFFIXES.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def size_label(rows: int) -> str:
+    if rows % 1000000 == 0:
+        return f"{rows // 1000000}m"
+    if rows % 1000 == 0:
+        return f"{rows // 1000}k"
+    return str(rows)
+
+
+def git_revision() -> str:
+    """Short commit of the tree being measured, with -dirty for uncommitted changes"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def input_file(data_dir: str, rows: int, seed: int, fmt: str) -> dict:
+    """Synthetic input of the given size, generated once and reused by later runs"""
+    path = os.path.abspath(os.path.join(data_dir, f"genetic-{size_label(rows)}-seed{seed}.{fmt}"))
+    generate_seconds = None
+    if not os.path.exists(path):
+        print(f" Генерация {path}...")
+        started = time.perf_counter()
+        write_synthetic(path, rows, seed=seed)
+        generate_seconds = time.perf_counter() - started
+    return {'path': path, 'bytes': os.path.getsize(path), 'generate_seconds': generate_seconds}
+
+
+def run_pipeline(path: str, batch_rows, db_mode: str, extra_args) -> dict:
+    """One run of etl/main.py in a clean working directory, its stage metrics"""
+    with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as tmp:
+        metrics_path = os.path.join(tmp, 'metrics.json')
+        command = [sys.executable, PIPELINE, '--input', path, '--db', 'bench.db', '--db-mode', db_mode,
+                   '--quiet', '--metrics-json', metrics_path] + list(extra_args)
+        if batch_rows:
+            command += ['--batch-rows', str(batch_rows)]
+        started = time.perf_counter()
+        process = subprocess.run(command, cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        process_seconds = time.perf_counter() - started
+        if not os.path.exists(metrics_path):
+            return {'status': 'failed', 'error': process.stderr.strip()[-2000:], 'process_seconds': process_seconds}
+        with open(metrics_path) as f:
+            metrics = json.load(f)
+    if process.returncode != 0 and metrics['status'] == 'ok':
+        metrics['status'] = 'failed'
+        metrics['error'] = process.stderr.strip()[-2000:]
+    metrics['process_seconds'] = process_seconds
+    return metrics
+
+
+def bench_pipeline(path: str, mode: str, args) -> dict:
+    """Best of --repeat runs by wall time (a failed run is returned as is)"""
+    batch_rows = args.batch_rows if mode == 'stream' else None
+    best = None
+    for _ in range(args.repeat):
+        run = run_pipeline(path, batch_rows, args.db_mode, args.pipeline_args)
+        if run['status'] != 'ok':
+            return run
+        if best is None or run['wall_seconds'] < best['wall_seconds']:
+            best = run
+    best['batch_rows'] = batch_rows
+    return best
+
+
+def _call(loader: DataLoader, method: str, column_types: dict, tmp: str):
+    if method == 'set_column_types':
+        return loader.set_column_types(column_types)
+    if method == 'save_data':
+        return loader.save_data(os.path.join(tmp, 'optimized_dataset.parquet'), format='parquet')
+    return getattr(loader, method)()
+
+
+def bench_loader(path: str, repeat: int) -> dict:
+    """Best time of every DataLoader method on a fresh copy of the raw frame"""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bench_loader_') as tmp:
+        loader = DataLoader()
+        loader.file_path = path
+        loader.schema_path = os.path.join(tmp, 'dataset.schema.json')
+        with contextlib.redirect_stdout(io.StringIO()):
+            raw = loader.load_data()
+            validation = loader.validate_columns()
+            column_types = loader.get_recommended_types()
+        if not validation['is_valid']:
+            raise ValueError(f"Синтетические данные не прошли validate_columns: {validation['missing']}, "
+                             f"{validation['extra']}")
+        for method in LOADER_METHODS:
+            timings = []
+            for _ in range(repeat):
+                loader.df = raw if method == 'load_data' else raw.copy()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    started = time.perf_counter()
+                    _call(loader, method, column_types, tmp)
+                    timings.append(time.perf_counter() - started)
+            results[method] = {'seconds': min(timings), 'rows': len(raw),
+                               'rows_per_second': len(raw) / min(timings) if min(timings) else None}
+    return results
+
+
+def print_results(result: dict) -> None:
+    print(f"\n {result['rows']:,} строк ({result['input_bytes'] / 1024 / 1024:.1f} MB {result['format']}):")
+    for mode, run in result['pipeline'].items():
+        if run['status'] != 'ok':
+            print(f"   пайплайн {mode}: ошибка - {run.get('error')}")
+            continue
+        print(f"   пайплайн {mode}: {run['wall_seconds']:.2f} с, CPU {run['cpu_seconds']:.2f} с, "
+              f"пиковый RSS {run['peak_rss_mb'] or 0:.0f} MB")
+        for name, stats in run['stages'].items():
+            rate = f"{stats['rows_per_second']:14,.0f} строк/с" if stats['rows_per_second'] else ''
+            print(f"     {name:<32}{stats['wall_seconds']:9.2f} с{rate}")
+    if result['data_loader']:
+        print("   DataLoader:")
+        for method, stats in result['data_loader'].items():
+            print(f"     {method:<32}{stats['seconds']:9.2f} с")
+
+
+def timings(results: list) -> dict:
+    """Flat {(rows, name): seconds} of a result file: pipeline totals and stages, DataLoader methods"""
+    flat = {}
+    for result in results:
+        for mode, run in result['pipeline'].items():
+            if run['status'] != 'ok':
+                continue
+            flat[(result['rows'], f"{mode}: всего")] = run['wall_seconds']
+            for name, stats in run['stages'].items():
+                flat[(result['rows'], f"{mode}: {name}")] = stats['wall_seconds']
+        for method, stats in result['data_loader'].items():
+            flat[(result['rows'], f"loader: {method}")] = stats['seconds']
+    return flat
+
+
+def compare(old: dict, new: dict, threshold: float) -> int:
+    """Print new/old time ratios, return the number of slowdowns above threshold"""
+    print(f"\n Сравнение с {old['git_revision']} ({old['started_at']}):")
+    old_timings = timings(old['results'])
+    regressions = 0
+    for key, seconds in timings(new['results']).items():
+        before = old_timings.get(key)
+        if before is None or max(before, seconds) < MIN_COMPARE_SECONDS:
+            continue
+        ratio = seconds / before if before else float('inf')
+        mark = ''
+        if ratio > 1 + threshold:
+            mark = '  медленнее'
+            regressions += 1
+        elif ratio < 1 - threshold:
+            mark = '  быстрее'
+        rows, name = key
+        print(f"   {size_label(rows):>5} {name:<40}{before:9.2f} ->{seconds:9.2f} с  x{ratio:.2f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк ETL пайплайна и DataLoader на синтетических данных')
+    parser.add_argument('--sizes', default='10k,100k,1m', help='Размеры входа через запятую: 10k,100k,1m,10m')
+    parser.add_argument('--modes', default='frame,stream', help='Режимы пайплайна: frame - целиком, stream - батчами')
+    parser.add_argument('--batch-rows', type=int, default=100000, help='Размер батча в режиме stream')
+    parser.add_argument('--db-mode', default='full', choices=['sample', 'full', 'upsert'],
+                        help='Режим загрузки в SQLite (по умолчанию: full - вся таблица)')
+    parser.add_argument('--format', default='csv', choices=['csv', 'parquet'], help='Формат синтетического входа')
+    parser.add_argument('--seed', type=int, default=0, help='Зерно генератора данных')
+    parser.add_argument('--repeat', type=int, default=1, help='Сколько раз повторить замер (берется лучший)')
+    parser.add_argument('--loader-max-rows', type=parse_size, default=1000000,
+                        help='DataLoader замеряется до этого размера: он держит весь фрейм в памяти')
+    parser.add_argument('--data-dir', default='data/benchmarks/inputs',
+                        help='Папка сгенерированных входов (переиспользуются между запусками)')
+    parser.add_argument('--output', default=None,
+                        help='JSON с результатами (по умолчанию: data/benchmarks/pipeline-<коммит>-<время>.json)')
+    parser.add_argument('--compare', default=None, help='JSON прошлого запуска для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Замедление больше этой доли считается регрессией (по умолчанию: 0.1)')
+    parser.add_argument('--pipeline-arg', action='append', default=[], dest='pipeline_args',
+                        help='Дополнительный аргумент etl/main.py, например --pipeline-arg=--backend=arrow')
+    args = parser.parse_args()
+
+    sizes = sorted(parse_size(text) for text in args.sizes.split(',') if text.strip())
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = set(modes) - {'frame', 'stream'}
+    if unknown:
+        parser.error(f"Неизвестные режимы: {sorted(unknown)}")
+    if args.repeat <= 0 or args.batch_rows <= 0:
+        parser.error('--repeat и --batch-rows должны быть положительными числами')
+
+    revision = git_revision()
+    started_at = datetime.now()
+    report = {
+        'benchmark': 'pipeline',
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'git_revision': revision,
+        'code_version': code_version(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'versions': {'pandas': pd.__version__, 'numpy': np.__version__, 'pyarrow': pa.__version__},
+        'columns': len(COLUMN_NAMES),
+        'args': vars(args),
+        'results': [],
+    }
+    for rows in sizes:
+        source = input_file(args.data_dir, rows, args.seed, args.format)
+        result = {'rows': rows, 'format': args.format, 'input_bytes': source['bytes'],
+                  'generate_seconds': source['generate_seconds'], 'pipeline': {}, 'data_loader': {}}
+        for mode in modes:
+            print(f" Пайплайн {mode}, {rows:,} строк...")
+            result['pipeline'][mode] = bench_pipeline(source['path'], mode, args)
+        if args.format == 'csv' and rows <= args.loader_max_rows:
+            print(f" DataLoader, {rows:,} строк...")
+            result['data_loader'] = bench_loader(source['path'], args.repeat)
+        report['results'].append(result)
+        print_results(result)
+
+    output = args.output or os.path.join('data', 'benchmarks',
+                                         f"pipeline-{revision}-{started_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    print(f"\n Результаты: {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f" Регрессий: {regressions}")
+            return 1
+    failed = [result['rows'] for result in report['results']
+              if any(run['status'] != 'ok' for run in result['pipeline'].values())]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
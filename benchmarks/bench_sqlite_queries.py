@@ -0,0 +1,136 @@
+"""
+Benchmark of typical queries against the SQLite table
+
+Loads the same transformed frame twice: as pandas to_sql writes it (untyped
+rowid table without indexes, as the sample mode does) and with the bulk
+loader (typed table, index on Patient Id and secondary indexes built
+after the load, ANALYZE). Then it times the same queries on both tables and prints the
+query plans, so the effect of the schema and the indexes is visible.
+
+    python benchmarks/bench_sqlite_queries.py --rows 500000
+    python benchmarks/bench_sqlite_queries.py --index "Institute Name,Gender" --index Status
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+
+from sqlite_loader import DEFAULT_INDEXES, SQLiteBulkLoader, parse_index
+from synthetic_data import synthetic_frame
+from transform import transform_data
+from upsert import UPSERT_KEY
+
+TABLE = 'medical_data'
+
+# Запрос и набор его параметров (см. query_params); за один замер запрос выполняется с каждым
+QUERIES = {
+    'поиск по Patient Id': ('SELECT * FROM medical_data WHERE "Patient Id" = ?', 'ids'),
+    'фильтр Institute+Gender': ('SELECT COUNT(*) FROM medical_data WHERE "Institute Name" = ? AND "Gender" = ?',
+                                'institute_gender'),
+    'выборка по Status': ('SELECT "Patient Id", "Patient Age" FROM medical_data WHERE "Status" = ?',
+                          'status'),
+    'группировка по Institute': ('SELECT "Institute Name", COUNT(*) FROM medical_data GROUP BY "Institute Name"',
+                                 None),
+}
+
+
+def query_params(df: pd.DataFrame, seed: int = 1) -> dict:
+    """Parameters of the queries drawn from the loaded data"""
+    rng = np.random.default_rng(seed)
+    ids = df[UPSERT_KEY].to_numpy(dtype=object)
+    institutes = df['Institute Name'].astype(str).unique()
+    genders = df['Gender'].astype(str).unique()
+    return {
+        'ids': [(ids[index],) for index in rng.integers(0, len(ids), 1000)],
+        'institute_gender': [(rng.choice(institutes), rng.choice(genders)) for _ in range(50)],
+        'status': [('Deceased',)] * 10,
+        None: [()] * 10,
+    }
+
+
+def load_plain(df: pd.DataFrame, db_path: str) -> float:
+    started = time.perf_counter()
+    sample = df.copy()
+    for col in sample.columns:
+        if sample[col].dtype.name == 'category':
+            sample[col] = sample[col].astype(str)
+    sample.to_sql(TABLE, create_engine(f'sqlite:///{db_path}'), if_exists='replace', index=False,
+                  chunksize=100000)
+    return time.perf_counter() - started
+
+
+def load_typed(df: pd.DataFrame, db_path: str, indexes) -> float:
+    started = time.perf_counter()
+    loader = SQLiteBulkLoader(db_path, TABLE, indexes=indexes)
+    loader.write(df)
+    loader.finish()
+    return time.perf_counter() - started
+
+
+def time_queries(db_path: str, params: dict, repeat: int):
+    """Best time of every query (all its parameter sets) over several runs"""
+    conn = sqlite3.connect(db_path)
+    best = {}
+    for name, (sql, key) in QUERIES.items():
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for values in params[key]:
+                conn.execute(sql, values).fetchall()
+            seconds = time.perf_counter() - started
+            best[name] = min(best.get(name, seconds), seconds)
+    plans = {name: ' / '.join(row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}',
+                                                                 params[key][0]).fetchall())
+             for name, (sql, key) in QUERIES.items()}
+    conn.close()
+    return best, plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Скорость запросов к таблице SQLite: to_sql против типизированной '
+                                                 'таблицы с индексами')
+    parser.add_argument('--rows', type=int, default=300000, help='Строк в синтетических данных')
+    parser.add_argument('--repeat', type=int, default=3, help='Повторов, берется лучшее время')
+    parser.add_argument('--index', action='append', default=None, dest='indexes',
+                        help='Вторичный индекс (колонки через запятую), можно несколько; '
+                             'по умолчанию набор загрузчика')
+    args = parser.parse_args()
+    indexes = [parse_index(text) for text in args.indexes] if args.indexes else DEFAULT_INDEXES
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = transform_data(synthetic_frame(args.rows))
+    # Одна строка на ключ - в обеих таблицах одинаковые данные
+    df = df.drop_duplicates(UPSERT_KEY, keep='last').reset_index(drop=True)
+    params = query_params(df)
+    print(f"Данные: {len(df)} строк, {len(df.columns)} колонок; индексы: {[list(cols) for cols in indexes]}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {'to_sql': os.path.join(tmp, 'plain.db'), 'typed': os.path.join(tmp, 'typed.db')}
+        load_seconds = {'to_sql': load_plain(df, paths['to_sql']),
+                        'typed': load_typed(df, paths['typed'], indexes)}
+        results = {name: time_queries(path, params, args.repeat) for name, path in paths.items()}
+        sizes = {name: os.path.getsize(path) / 1024 / 1024 for name, path in paths.items()}
+
+    print(f"\nЗагрузка: to_sql {load_seconds['to_sql']:.2f} с, {sizes['to_sql']:.1f} MB; "
+          f"typed {load_seconds['typed']:.2f} с, {sizes['typed']:.1f} MB")
+    print(f"\n{'запрос':<28}{'раз':>6}{'to_sql, мс':>12}{'typed, мс':>12}  быстрее")
+    for name, (_, key) in QUERIES.items():
+        count = len(params[key])
+        plain, typed = results['to_sql'][0][name], results['typed'][0][name]
+        print(f"{name:<28}{count:>6}{plain * 1000:12.1f}{typed * 1000:12.1f}  x{plain / typed:.1f}")
+    print("\nПланы запросов:")
+    for name in QUERIES:
+        print(f"  {name}:\n    to_sql: {results['to_sql'][1][name]}\n    typed:  {results['typed'][1][name]}")
+
+
+if __name__ == "__main__":
+    main()
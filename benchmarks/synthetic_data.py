@@ -0,0 +1,192 @@
+"""
+Synthetic raw data with the schema of the genetic disorder dataset
+
+Generates the 43 columns checked by DataLoader.validate_columns with the
+quirks of the real CSV: missing values at per-column rates, the sentinels
+'-99', '-', 'Not applicable' and 'Not available', constant Test columns,
+a mostly empty Family Name and exact duplicate rows (within a chunk and
+across chunks, so streaming dedup has work to do). Rows are produced in
+chunks and written with pyarrow writers, so 10M rows never sit in memory.
+
+    python benchmarks/synthetic_data.py --rows 1000000 --output data/benchmarks/genetic-1m.csv
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Доля строк - точных копий других строк (часть из них копирует строки предыдущего чанка)
+DUPLICATE_SHARE = 0.05
+
+# Доля служебного значения -99 в числовых колонках со служебными значениями
+SENTINEL_SHARE = 0.01
+
+_YES_NO = ['Yes', 'No']
+_FIRST_NAMES = ['Richard', 'Mike', 'Kimberly', 'Jeffery', 'Johanna', 'Charles', 'Lisa', 'Shane', 'Alice',
+                'Brian', 'Dorothy', 'Eric', 'Frances', 'George', 'Helen', 'Ivan', 'Julia', 'Kevin',
+                'Laura', 'Martin', 'Nancy', 'Oscar', 'Pamela', 'Quentin', 'Rose', 'Steven', 'Teresa']
+_FAMILY_NAMES = ['Hoelscher', 'Stanton', 'Perry', 'Liles', 'Benitez', 'Green', 'Barnes', 'Lopez',
+                 'Keller', 'Moore', 'Nguyen', 'Olsen', 'Price', 'Quinn', 'Reyes', 'Schultz', 'Turner']
+_INSTITUTES = [f"{name} Hospital" for name in ('Boston Specialty', 'St. Margaret', 'Walter Reed', 'Mercy',
+                                               'Kaiser', 'Lakeview', 'Riverside', 'Northside')] + \
+              [f"Children's Medical Center {index}" for index in range(32)] + ['Not applicable']
+_LOCATIONS = [f"{index} Main Street, City {index % 17}" for index in range(40)] + ['-']
+
+# Колонки в порядке DataLoader.validate_columns: (имя, вид, параметры, доля пропусков).
+# Виды: id, int (low, high, со служебным -99), float (среднее, отклонение), choice (значения), name (значения)
+COLUMNS = [
+    ('Patient Id', 'id', None, 0.0),
+    ('Patient Age', 'int', (0, 15, True), 0.07),
+    ("Genes in mother's side", 'choice', _YES_NO, 0.0),
+    ('Inherited from father', 'choice', _YES_NO, 0.01),
+    ('Maternal gene', 'choice', _YES_NO, 0.13),
+    ('Paternal gene', 'choice', _YES_NO, 0.0),
+    ('Blood cell count (mcL)', 'float', (4.9, 0.25), 0.0),
+    ('Patient First Name', 'name', _FIRST_NAMES, 0.0),
+    ('Family Name', 'name', _FAMILY_NAMES, 0.44),
+    ("Father's name", 'name', _FIRST_NAMES, 0.0),
+    ("Mother's age", 'int', (18, 52, True), 0.27),
+    ("Father's age", 'int', (20, 65, True), 0.27),
+    ('Institute Name', 'choice', _INSTITUTES, 0.23),
+    ('Location of Institute', 'choice', _LOCATIONS, 0.0),
+    ('Status', 'choice', ['Alive', 'Deceased'], 0.0),
+    ('Respiratory Rate (breaths/min)', 'choice', ['Normal (30-60)', 'Tachypnea'], 0.1),
+    ('Heart Rate (rates/min', 'choice', ['Normal', 'Tachycardia'], 0.1),
+    ('Test 1', 'int', (0, 1, False), 0.1),
+    ('Test 2', 'int', (0, 1, False), 0.1),
+    ('Test 3', 'int', (0, 1, False), 0.1),
+    ('Test 4', 'int', (0, 1, False), 0.1),
+    ('Test 5', 'int', (0, 1, False), 0.1),
+    ('Parental consent', 'choice', ['Yes'], 0.1),
+    ('Follow-up', 'choice', ['High', 'Low'], 0.1),
+    ('Gender', 'choice', ['Male', 'Female', 'Ambiguous'], 0.1),
+    ('Birth asphyxia', 'choice', ['Yes', 'No', 'Not available', 'No record'], 0.1),
+    ('Autopsy shows birth defect (if applicable)', 'choice', ['Yes', 'No', 'None', 'Not applicable'], 0.05),
+    ('Place of birth', 'choice', ['Home', 'Institute'], 0.1),
+    ('Folic acid details (peri-conceptional)', 'choice', _YES_NO, 0.1),
+    ('H/O serious maternal illness', 'choice', _YES_NO, 0.1),
+    ('H/O radiation exposure (x-ray)', 'choice', ['Yes', 'No', 'Not applicable', '-'], 0.1),
+    ('H/O substance abuse', 'choice', ['Yes', 'No', 'Not applicable', '-'], 0.1),
+    ('Assisted conception IVF/ART', 'choice', _YES_NO, 0.1),
+    ('History of anomalies in previous pregnancies', 'choice', _YES_NO, 0.1),
+    ('No. of previous abortion', 'int', (0, 5, True), 0.1),
+    ('Birth defects', 'choice', ['Singular', 'Multiple'], 0.1),
+    ('White Blood cell count (thousand per microliter)', 'float', (7.5, 2.7), 0.1),
+    ('Blood test result', 'choice', ['normal', 'abnormal', 'slightly abnormal', 'inconclusive'], 0.1),
+    ('Symptom 1', 'int', (0, 2, False), 0.1),
+    ('Symptom 2', 'int', (0, 2, False), 0.1),
+    ('Symptom 3', 'int', (0, 2, False), 0.1),
+    ('Symptom 4', 'int', (0, 2, False), 0.1),
+    ('Symptom 5', 'int', (0, 2, False), 0.1),
+]
+
+COLUMN_NAMES = [name for name, _, _, _ in COLUMNS]
+
+
+def _column(kind, params, null_share, rows, first_id, rng) -> pd.Series:
+    missing = rng.random(rows) < null_share
+    if kind == 'id':
+        return pd.Series([f"PID0x{index:x}" for index in range(first_id, first_id + rows)], dtype=object)
+    if kind == 'int':
+        low, high, sentinel = params
+        values = rng.integers(low, high, rows)
+        if sentinel:
+            values[rng.random(rows) < SENTINEL_SHARE] = -99
+        # Целые с пропусками: в CSV пишутся как 5 и -99, а не 5.0
+        return pd.Series(pd.array(values, dtype='Int64')).mask(missing)
+    if kind == 'float':
+        mean, std = params
+        values = np.round(np.clip(rng.normal(mean, std, rows), 0.0, None), 6)
+        values[missing] = np.nan
+        return pd.Series(values)
+    values = rng.choice(np.array(params, dtype=object), rows)
+    values[missing] = None
+    return pd.Series(values, dtype=object)
+
+
+def synthetic_chunks(rows: int, chunk_rows: int = 1000000, seed: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Raw frames of the genetic disorder schema, chunk_rows rows each (rows in total)
+
+    About DUPLICATE_SHARE of the rows repeat earlier rows: most of them of
+    the same chunk, some of the previous one. The output depends only on
+    rows, chunk_rows and seed.
+    """
+    rng = np.random.default_rng(seed)
+    previous: Optional[pd.DataFrame] = None
+    first_id = 0
+    remaining = rows
+    while remaining > 0:
+        size = min(chunk_rows, remaining)
+        copies = int(size * DUPLICATE_SHARE)
+        originals = size - copies
+        chunk = pd.DataFrame({name: _column(kind, params, null_share, originals, first_id, rng)
+                              for name, kind, params, null_share in COLUMNS})
+        first_id += originals
+        sources = chunk if previous is None else pd.concat([chunk, previous.sample(
+            min(len(previous), copies // 5 + 1), random_state=int(rng.integers(1 << 31)))], ignore_index=True)
+        duplicates = sources.iloc[rng.integers(0, len(sources), copies)]
+        chunk = pd.concat([chunk, duplicates], ignore_index=True)
+        # Копии разбросаны по чанку, а не собраны в конце
+        chunk = chunk.iloc[rng.permutation(len(chunk))].reset_index(drop=True)
+        previous = chunk
+        remaining -= size
+        yield chunk
+
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """The whole synthetic frame in memory (for small sizes)"""
+    return pd.concat(list(synthetic_chunks(rows, seed=seed)), ignore_index=True)
+
+
+def write_synthetic(path: str, rows: int, seed: int = 0, chunk_rows: int = 1000000) -> int:
+    """
+    Write synthetic raw data to a CSV or Parquet file (by extension) chunk by chunk
+
+    Missing values are empty CSV fields, as in the real dataset.
+
+    Returns:
+        int: Size of the file in bytes
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    schema = None
+    writer = None
+    try:
+        for chunk in synthetic_chunks(rows, chunk_rows=chunk_rows, seed=seed):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if schema is None:
+                schema = table.schema.remove_metadata()
+                if path.endswith('.parquet'):
+                    writer = pq.ParquetWriter(tmp_path, schema, compression='zstd')
+                else:
+                    writer = pa_csv.CSVWriter(tmp_path, schema)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетические сырые данные со схемой датасета генетических нарушений')
+    parser.add_argument('--rows', type=int, default=100000, help='Строк (вместе с дубликатами)')
+    parser.add_argument('--seed', type=int, default=0, help='Зерно генератора: те же параметры - тот же файл')
+    parser.add_argument('--output', required=True, help='Файл .csv или .parquet')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    size = write_synthetic(args.output, args.rows, seed=args.seed)
+    print(f"{args.output}: {args.rows} строк, {size / 1024 / 1024:.1f} MB за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Union
+
+from column_profile import PROFILE_COLUMNS
+from column_schema import NUMERIC_COLUMNS
+from row_dedup import RowDeduplicator
+from transform_plan import (Step, TransformPlan, _category_columns, _choose_numeric, _column_log, _decide_drops,
+                            _deduplicate, _drop_columns, _fill_value, _map_columns, _record_categories,
+                            _record_medians, _string_category, _string_values, _summary)
+
+# --- вычисления на таблицах Arrow ---
+
+def _arrow_compatible(values: pd.Series) -> pd.Series:
+    """Object column as is, or as strings if Arrow cannot convert it (numbers mixed with strings)"""
+    if values.dtype != object:
+        return values
+    try:
+        pa.array(values, from_pandas=True)
+        return values
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Как astype(str) в pandas backend; пропуски остаются пропусками
+        return values.where(values.isna(), values.astype(str))
+
+def as_table(data: Union[pd.DataFrame, pa.Table]) -> pa.Table:
+    """
+    Arrow table of a DataFrame (pandas metadata and index are not kept)
+
+    Object columns that mix types, e.g. numbers and strings, are converted
+    to strings, as the pandas backend does when it encodes them.
+    """
+    if isinstance(data, pa.Table):
+        return data
+    try:
+        table = pa.Table.from_pandas(data, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        data = pd.DataFrame({col: _arrow_compatible(data[col]) for col in data.columns}, index=data.index)
+        table = pa.Table.from_pandas(data, preserve_index=False)
+    return table.replace_schema_metadata(None)
+
+def _is_numeric(data_type: pa.DataType) -> bool:
+    # Как pd.api.types.is_numeric_dtype: bool тоже считается числовым
+    return pa.types.is_integer(data_type) or pa.types.is_floating(data_type) or pa.types.is_boolean(data_type)
+
+def _is_string(data_type: pa.DataType) -> bool:
+    if pa.types.is_dictionary(data_type):
+        data_type = data_type.value_type
+    return pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+def _dictionary(column: pa.ChunkedArray) -> pa.DictionaryArray:
+    return column.combine_chunks() if column.num_chunks else pa.array([], column.type)
+
+def _without_nan(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """NaN values of a float column as nulls (pandas treats both as missing)"""
+    if pa.types.is_floating(column.type) and pc.any(pc.is_nan(column)).as_py():
+        return pc.if_else(pc.is_nan(column), None, column)
+    return column
+
+def _column_profile(column: pa.ChunkedArray, rows: int, numeric: bool) -> list:
+    column = _without_nan(column)
+    nulls = column.null_count
+    if pa.types.is_null(column.type):
+        distinct = 0
+    else:
+        values = _dictionary(column).indices if pa.types.is_dictionary(column.type) else column
+        distinct = pc.count_distinct(values, mode='only_valid').as_py()
+    stats = [float('nan')] * 3
+    if numeric and rows and nulls < rows:
+        min_max = pc.min_max(column)
+        median = pc.quantile(column, q=0.5, interpolation='midpoint')[0].as_py()
+        stats = [float(min_max['min'].as_py()), float(min_max['max'].as_py()), float(median)]
+    return [nulls, nulls / rows if rows else 0.0, distinct, distinct <= 1] + stats
+
+def profile_table(table: pa.Table, numeric_columns: Sequence[str] = (), workers: int = 1) -> pd.DataFrame:
+    """
+    profile_columns for an Arrow table, computed with pyarrow.compute kernels
+
+    Args:
+        table: Table to profile
+        numeric_columns: Columns that get min, max and median
+        workers: Number of threads, one column per task
+
+    Returns:
+        pd.DataFrame: Same layout and values as profile_columns
+    """
+    columns = table.column_names
+    profile_one = lambda col: _column_profile(table.column(col), table.num_rows, col in numeric_columns)
+    if workers > 1 and len(columns) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(columns))) as executor:
+            rows = list(executor.map(profile_one, columns))
+    else:
+        rows = [profile_one(col) for col in columns]
+    profile = pd.DataFrame(rows, index=pd.Index(columns, dtype=object), columns=PROFILE_COLUMNS)
+    return profile.astype({'null_count': 'int64', 'distinct_count': 'int64', 'is_constant': 'bool',
+                           'null_ratio': 'float64', 'min': 'float64', 'max': 'float64',
+                           'median': 'float64'})
+
+def null_counts(table: pa.Table) -> Dict[str, int]:
+    """Missing values per column, counted like pandas isna() (nulls and NaN)"""
+    return {col: _without_nan(table.column(col)).null_count for col in table.column_names}
+
+def count_duplicates(table: pa.Table) -> int:
+    """Number of rows that repeat an earlier row, by grouping on all columns"""
+    if table.num_rows == 0:
+        return 0
+    # Группировка поддерживает не все типы ключей: словари раскодируются
+    keys = []
+    for column in table.columns:
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        elif pa.types.is_null(column.type):
+            column = column.cast(pa.int8())
+        keys.append(column)
+    keys = pa.table(keys, names=[str(index) for index in range(len(keys))])
+    return table.num_rows - keys.group_by(keys.column_names, use_threads=False).aggregate([]).num_rows
+
+# --- шаги плана ---
+
+def _to_arrow(df, state, config):
+    state['index'] = df.index
+    return as_table(df)
+
+def _set_column(table, col, values):
+    return table.set_column(table.column_names.index(col), col, values)
+
+def _arrow_coerce_fill_numeric(table, state, config):
+    """Numeric coercion, profile and median fill with Arrow kernels"""
+    print(" Приведение типов данных и заполнение числовых пропусков...")
+    workers = config.get('workers') or 1
+    candidates = [col for col in NUMERIC_COLUMNS if col in table.column_names]
+    state['numeric_candidates'] = candidates
+    for col in candidates:
+        column = table.column(col)
+        if _is_numeric(column.type):
+            continue
+        # Строки с числами встречаются редко (Arrow CSV и Parquet уже числовые) -
+        # разбор с заменой ошибок на пропуск как в pd.to_numeric(errors='coerce')
+        try:
+            values = pd.to_numeric(column.to_pandas(), errors='coerce')
+            table = _set_column(table, col, pa.chunked_array([pa.array(values, from_pandas=True)]))
+        except Exception as e:
+            print(f"    {col} -> ошибка преобразования: {e}")
+    for col in candidates:
+        # Целые и bool (Parquet) - в float64, как _as_float в pandas backend
+        column = table.column(col)
+        if _is_numeric(column.type) and not pa.types.is_float64(column.type):
+            table = _set_column(table, col, column.cast(pa.float64()))
+
+    numeric_dtype_columns = [col for col in candidates if _is_numeric(table.column(col).type)]
+    numeric_profile = profile_table(table.select(candidates), numeric_dtype_columns, workers=workers)
+    state['numeric_profile'] = numeric_profile
+    state['profile'] = numeric_profile
+    _choose_numeric(table.column_names, numeric_dtype_columns, table.num_rows, state, config)
+    _record_medians(state, config)
+
+    fill_columns = [col for col in state['numeric_columns'] if numeric_profile.at[col, 'null_count'] > 0]
+    fill_values = {col: _fill_value(col, state, config) for col in fill_columns}
+
+    def fill(col):
+        # NaN тоже пропуск, как в pandas
+        column = _without_nan(table.column(col))
+        return pc.fill_null(column, pa.scalar(float(fill_values[col]), column.type))
+
+    for col, values in zip(fill_columns, _map_columns(fill, fill_columns, config)):
+        table = _set_column(table, col, values)
+        _column_log(config, f"    {col}: заполнено {numeric_profile.at[col, 'null_count']} пропусков "
+                            f"медианой {fill_values[col]:.1f}")
+    return table
+
+def _arrow_profile(table, state, config):
+    print(" Профилирование колонок...")
+    numeric_profile = state['numeric_profile']
+    other_columns = [col for col in table.column_names if col not in numeric_profile.index]
+    other_profile = profile_table(table.select(other_columns), workers=config.get('workers') or 1)
+    state['profile'] = pd.concat([numeric_profile, other_profile]).loc[table.column_names]
+    return table
+
+def _fill_dictionary(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """fillna('Unknown') of a dictionary column; 'Unknown' is appended to the dictionary like add_categories"""
+    array = _dictionary(column)
+    dictionary = array.dictionary
+    position = dictionary.index('Unknown').as_py()
+    if position < 0:
+        position = len(dictionary)
+        dictionary = pa.concat_arrays([dictionary, pa.array(['Unknown'], dictionary.type)])
+    indices = pc.fill_null(array.indices.cast(pa.int32()), pa.scalar(position, pa.int32()))
+    return pa.chunked_array([pa.DictionaryArray.from_arrays(indices, dictionary)])
+
+def _arrow_fill_categorical(table, state, config):
+    # Строковые колонки заполняются ядрами Arrow; прочие типы (числа вне
+    # NUMERIC_COLUMNS и т.п.) обрабатываются правилами pandas при кодировании
+    def fill(col):
+        column = table.column(col)
+        if pa.types.is_dictionary(column.type):
+            return _fill_dictionary(column)
+        return pc.fill_null(column, 'Unknown')
+
+    fill_columns = [col for col in state['categorical_columns']
+                    if state['profile'].at[col, 'null_count'] > 0 and _is_string(table.column(col).type)]
+    for col, values in zip(fill_columns, _map_columns(fill, fill_columns, config)):
+        table = _set_column(table, col, values)
+        _column_log(config, f"   🔧 {col}: заполнено пропусков значением 'Unknown'")
+    return table
+
+def _sorted_dictionary(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Dictionary encoding with sorted categories, as pandas astype('category')"""
+    array = _dictionary(pc.dictionary_encode(column))
+    order = pc.array_sort_indices(array.dictionary).to_numpy()
+    # Новый код каждой категории - ее место в отсортированном словаре
+    new_codes = np.empty(len(order), dtype=np.int32)
+    new_codes[order] = np.arange(len(order), dtype=np.int32)
+    indices = pc.take(pa.array(new_codes), array.indices)
+    return pa.chunked_array([pa.DictionaryArray.from_arrays(indices, pc.take(array.dictionary, pa.array(order)))])
+
+def _nullable_integer(data_type: pa.DataType):
+    # Целые с пропусками - Int64, а не float64: в строку 1 -> '1', как у исходной колонки pandas
+    return pd.Int64Dtype() if pa.types.is_integer(data_type) else None
+
+def _pandas_encode(column: pa.ChunkedArray, category: bool) -> pa.ChunkedArray:
+    """Fill and encode a non-string column with the pandas rules (see _fill_categorical and _encode)"""
+    values = _string_values(column.to_pandas(types_mapper=_nullable_integer))
+    if values.isna().any():
+        if values.dtype.name == 'category' and 'Unknown' not in values.cat.categories:
+            values = values.cat.add_categories(['Unknown'])
+        values = values.fillna('Unknown')
+    values = _string_category(values) if category else values.astype(str)
+    return pa.chunked_array([pa.array(values)])
+
+def _arrow_encode(table, state, config):
+    print("🔧 Приведение нечисловых колонок...")
+    dropped = set(state['columns_to_drop'])
+    # Удаляемые колонки нужны только для поиска дубликатов - их не кодируем
+    string_columns = [col for col in table.column_names
+                      if col not in state['numeric_columns'] and col not in dropped]
+    category_columns = _category_columns(string_columns, table.num_rows, state, config)
+
+    def encode(col):
+        column = table.column(col)
+        category = col in category_columns
+        if not _is_string(column.type):
+            return _pandas_encode(column, category)
+        if category:
+            return column if pa.types.is_dictionary(column.type) else _sorted_dictionary(column)
+        return column.cast(column.type.value_type) if pa.types.is_dictionary(column.type) else column
+
+    for col, values in zip(string_columns, _map_columns(encode, string_columns, config)):
+        table = _set_column(table, col, values)
+    _record_categories(string_columns, category_columns,
+                       lambda col: _dictionary(table.column(col)).dictionary.to_pylist(), config)
+    return table
+
+def _to_pandas(table, state, config):
+    df = table.to_pandas(use_threads=(config.get('workers') or 1) > 1)
+    df.index = state['index']
+    return df
+
+def arrow_plan(keep_columns: Optional[List[str]] = None, category_columns: Optional[List[str]] = None,
+               medians: Optional[Dict[str, float]] = None,
+               deduplicator: Optional[RowDeduplicator] = None, workers: int = 1,
+               quiet: bool = False) -> TransformPlan:
+    """
+    Transform plan whose column work runs on an Arrow table with pyarrow.compute
+
+    Coercion, profiling (null and distinct counts, min/max/median), null
+    filling and dictionary encoding are Arrow kernels; the table is
+    converted to pandas once, with dictionary columns becoming categoricals
+    without materializing their strings. Row hashes for deduplication are
+    then computed on the encoded frame (each category is hashed once), so
+    the dedup state stays compatible with the pandas backend. Decisions and
+    output are the same as with TransformPlan.default().optimize().
+    """
+    config = {'keep_columns': keep_columns, 'category_columns': category_columns,
+              'medians': medians, 'deduplicator': deduplicator, 'workers': workers, 'quiet': quiet}
+    return TransformPlan([
+        Step('to_arrow', 'DataFrame -> таблица Arrow', _to_arrow),
+        Step('coerce_fill_numeric', 'приведение, профиль и заполнение числовых колонок (pyarrow.compute)',
+             _arrow_coerce_fill_numeric),
+        Step('profile', 'профиль нечисловых колонок (pyarrow.compute)', _arrow_profile),
+        Step('decide_drops', 'выбор бесполезных колонок по профилю', _decide_drops),
+        Step('fill_categorical', "заполнение категориальных пропусков 'Unknown' (pyarrow.compute)",
+             _arrow_fill_categorical),
+        Step('encode', 'словарное кодирование нечисловых колонок (pyarrow.compute)', _arrow_encode),
+        Step('to_pandas', 'таблица Arrow -> DataFrame (словари -> category)', _to_pandas),
+        Step('dedup', 'удаление дубликатов по хешам строк', _deduplicate),
+        Step('drop_columns', 'удаление бесполезных колонок', _drop_columns),
+        Step('summary', 'статистика и отчет о дубликатах', _summary),
+    ], config, optimized=True, notes=["колонки обрабатываются ядрами pyarrow.compute, в pandas - один раз"])
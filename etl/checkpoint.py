@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from stage_cache import code_version
+
+# Версия формата контрольной точки - меняется при несовместимых изменениях
+CHECKPOINT_FORMAT = 1
+
+# Решения плана, принятые на первом батче потока: с ними продолженный запуск
+# трансформирует оставшиеся батчи так же, как непрерывный
+PLAN_DECISIONS = ('keep_columns', 'dropped_columns', 'numeric_columns', 'null_ratios',
+                  'category_columns', 'vocabulary', 'fitted_medians')
+
+def run_key(*parts) -> str:
+    """Key of a run: input fingerprint, options and the pipeline code it depends on"""
+    payload = json.dumps([code_version(), [str(part) for part in parts]])
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+class RunCheckpoint:
+    """
+    Batch-level checkpoint of a streaming run
+
+    The directory holds manifest.json and, for every transformed batch, the
+    batch itself (batch-NNNNNN.arrow, Arrow IPC with zstd) and the row hashes
+    it added to the deduplicator (dedup-NNNNNN.npy). The manifest records the
+    run key, the medians of the pre-pass, the plan decisions of the first
+    batch and the transformed batches. Files are written next to the target
+    and moved in place, the manifest last, so after a crash it lists only
+    complete batches.
+
+    A resumed run with the same key restores medians, plan decisions and
+    dedup hashes, skips the transformed batches on the input side and
+    replays them from the directory. Which of them a sink has committed is
+    recorded by the sink itself, in the same transaction as the rows (see
+    BulkLoader.resume); the directory is removed after a successful run.
+    """
+
+    def __init__(self, directory: str, key: str):
+        self.directory = directory
+        self.key = key
+        self.manifest: Dict[str, Any] = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _save_manifest(self) -> None:
+        tmp_path = self._path('manifest.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path('manifest.json'))
+
+    def open(self, resume: bool) -> bool:
+        """
+        Continue an interrupted run with the same key, or start a new checkpoint
+
+        Args:
+            resume: Use the existing checkpoint (a new one is started when
+                there is none or it belongs to a different run)
+
+        Returns:
+            bool: True if the run is resumed
+        """
+        manifest_path = self._path('manifest.json')
+        if resume and os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('format') == CHECKPOINT_FORMAT and manifest.get('key') == self.key:
+                self.manifest = manifest
+                return True
+            print(" Контрольная точка относится к другому запуску (вход, параметры или код изменились) - "
+                  "запуск начинается заново")
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self.manifest = {'format': CHECKPOINT_FORMAT, 'key': self.key, 'medians': None, 'plan': None,
+                         'batches': []}
+        self._save_manifest()
+        return False
+
+    @property
+    def transformed_batches(self) -> int:
+        return len(self.manifest['batches'])
+
+    @property
+    def medians(self) -> Optional[Dict[str, float]]:
+        return self.manifest['medians']
+
+    def save_medians(self, medians: Dict[str, float]) -> None:
+        self.manifest['medians'] = {col: float(value) for col, value in medians.items()}
+        self._save_manifest()
+
+    def restore_plan(self, plan) -> None:
+        """Put the saved first-batch decisions into the plan config"""
+        if self.manifest['plan']:
+            plan.config.update(self.manifest['plan'])
+
+    def add_batch(self, df: pd.DataFrame, plan, dedup_hashes: Optional[np.ndarray]) -> int:
+        """
+        Store a transformed batch with its dedup hashes and the plan decisions
+
+        Returns:
+            int: Index of the batch
+        """
+        index = self.transformed_batches
+        name = f"batch-{index:06d}.arrow"
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.OSFile(self._path(f"{name}.tmp"), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        os.replace(self._path(f"{name}.tmp"), self._path(name))
+        if dedup_hashes is not None:
+            # np.save дописывает .npy к имени без этого расширения
+            np.save(self._path(f"dedup-{index:06d}.tmp.npy"), dedup_hashes)
+            os.replace(self._path(f"dedup-{index:06d}.tmp.npy"), self._path(f"dedup-{index:06d}.npy"))
+        self.manifest['plan'] = {key: plan.config.get(key) for key in PLAN_DECISIONS}
+        self.manifest['batches'].append({'file': name, 'rows': len(df)})
+        self._save_manifest()
+        return index
+
+    def batches(self) -> Iterator[pd.DataFrame]:
+        """Transformed batches of the checkpoint, in order"""
+        for entry in self.manifest['batches']:
+            with pa.OSFile(self._path(entry['file']), 'rb') as source:
+                yield pa.ipc.open_file(source).read_all().to_pandas()
+
+    def dedup_hashes(self) -> Iterator[np.ndarray]:
+        """Row hashes added to the deduplicator by the transformed batches"""
+        for index in range(self.transformed_batches):
+            path = self._path(f"dedup-{index:06d}.npy")
+            if os.path.exists(path):
+                yield np.load(path)
+
+    def clear(self) -> None:
+        """Remove the checkpoint after a successful run"""
+        shutil.rmtree(self.directory, ignore_errors=True)
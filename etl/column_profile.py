@@ -0,0 +1,55 @@
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence
+
+PROFILE_COLUMNS = ['null_count', 'null_ratio', 'distinct_count', 'is_constant', 'min', 'max', 'median']
+
+def profile_columns(df: pd.DataFrame, numeric_columns: Optional[Sequence[str]] = None,
+                    workers: int = 1) -> pd.DataFrame:
+    """
+    Profile all columns of a DataFrame in one vectorized pass per statistic
+
+    Every statistic is computed for the whole frame at once instead of in a
+    Python loop over columns, so profiling costs about one scan of the data.
+
+    Args:
+        df: DataFrame to profile
+        numeric_columns: Columns that get min, max and median (all numeric
+            dtypes if None)
+        workers: Number of threads; columns are split into groups that are
+            profiled at the same time
+
+    Returns:
+        pd.DataFrame: One row per column of df with null_count, null_ratio,
+        distinct_count (nulls not counted), is_constant (at most one distinct
+        value), min, max and median (NaN for non-numeric columns)
+    """
+    if numeric_columns is None:
+        numeric_columns = list(df.select_dtypes(include='number').columns)
+    else:
+        numeric_columns = [col for col in numeric_columns if col in df.columns]
+
+    if workers > 1 and len(df.columns) > 1:
+        # Каждая группа колонок профилируется отдельно - статистики колонок независимы
+        groups = [list(df.columns[index::workers]) for index in range(min(workers, len(df.columns)))]
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            profiles = list(executor.map(
+                lambda group: profile_columns(df[group], [col for col in numeric_columns if col in group]),
+                groups))
+        return pd.concat(profiles).loc[df.columns]
+
+    profile = pd.DataFrame(index=df.columns, columns=PROFILE_COLUMNS)
+    profile['null_count'] = df.isna().sum()
+    profile['null_ratio'] = profile['null_count'] / len(df) if len(df) else 0.0
+    profile['distinct_count'] = df.nunique(dropna=True)
+    profile['is_constant'] = profile['distinct_count'] <= 1
+
+    # Для числовых колонок - диапазон и медиана (медиана нужна для заполнения пропусков)
+    profile[['min', 'max', 'median']] = float('nan')
+    if numeric_columns and len(df):
+        stats = df[numeric_columns].agg(['min', 'max', 'median']).T
+        profile.loc[numeric_columns, ['min', 'max', 'median']] = stats.values
+
+    return profile.astype({'null_count': 'int64', 'distinct_count': 'int64', 'is_constant': 'bool',
+                           'null_ratio': 'float64', 'min': 'float64', 'max': 'float64',
+                           'median': 'float64'})
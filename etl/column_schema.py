@@ -0,0 +1,320 @@
+import csv
+import hashlib
+import json
+import os
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+# Колонки, которые в данных о генетических нарушениях точно числовые
+NUMERIC_COLUMNS = [
+    'Patient Age', 'Blood cell count (mcL)', "Mother's age", "Father's age",
+    'Test 1', 'Test 2', 'Test 3', 'Test 4', 'Test 5',
+    'No. of previous abortion', 'White Blood cell count (thousand per microliter)'
+]
+
+# Служебные значения, которые означают пропуск
+NA_VALUES = ['-99', '-', 'Not applicable', 'Not available', '']
+
+# Строковая колонка кодируется словарем, если уникальных значений меньше этой доли строк
+DICTIONARY_MAX_RATIO = 0.5
+
+_INFERENCE_BLOCK_SIZE = 64 * 1024 * 1024
+
+# Число в тексте (после обрезки пробелов) - то, что разбирает pd.to_numeric
+_NUMBER_PATTERN = r'^[-+]?((\d+\.?\d*|\.\d+)([eE][-+]?\d+)?|inf(inity)?|nan)$'
+
+_DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+_TYPE_NAMES = {
+    'double': pa.float64(),
+    'float': pa.float32(),
+    'int64': pa.int64(),
+    'int32': pa.int32(),
+    'bool': pa.bool_(),
+    'string': pa.string(),
+    'dictionary': _DICTIONARY_TYPE,
+    'timestamp[s]': pa.timestamp('s'),
+    'date32[day]': pa.date32(),
+}
+
+CsvSource = Union[str, BinaryIO]
+
+# Схемы лежат в data/schema корня проекта, а не текущей папки запуска
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'schema')
+
+
+def schema_path_for(source: str, schema_dir: str = SCHEMA_DIR) -> str:
+    """Default location of the persisted schema of a CSV source"""
+    name = os.path.splitext(os.path.basename(source.rstrip('/*')))[0] or 'source'
+    # Относительный путь из разных папок - разные файлы, поэтому хешируем абсолютный
+    key = source if source.startswith('http') else os.path.abspath(source)
+    source_hash = hashlib.sha1(key.encode()).hexdigest()[:8]
+    return os.path.join(schema_dir, f"{name}-{source_hash}.json")
+
+
+def load_schema(schema_path: Optional[str]) -> Optional[Dict[str, pa.DataType]]:
+    """Read a persisted column schema, None if there is none"""
+    if not schema_path or not os.path.exists(schema_path):
+        return None
+    try:
+        with open(schema_path) as f:
+            names = json.load(f)['columns']
+    except (OSError, ValueError, KeyError):
+        return None
+    return {column: _TYPE_NAMES[name] for column, name in names.items() if name in _TYPE_NAMES}
+
+
+def save_schema(schema_path: str, schema: pa.Schema) -> None:
+    """Persist column types of a parsed table"""
+    columns = {}
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            columns[field.name] = 'dictionary'
+        elif pa.types.is_null(field.type):
+            columns[field.name] = 'string'
+        else:
+            columns[field.name] = str(field.type)
+    os.makedirs(os.path.dirname(schema_path) or '.', exist_ok=True)
+    # Пишем рядом и подменяем: параллельный читатель не увидит недописанный файл
+    tmp_path = f"{schema_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'columns': columns}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, schema_path)
+
+
+def read_header(source: CsvSource, encoding: str = 'utf8') -> List[str]:
+    """Column names from the first line, without consuming a stream"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            first_line = f.readline()
+    else:
+        first_line = source.peek(1024 * 1024).split(b'\n', 1)[0]
+    return next(csv.reader([first_line.decode(encoding).rstrip('\r')]))
+
+
+def _options(column_types: Dict[str, pa.DataType], columns: Optional[Sequence[str]],
+             encoding: str, block_size: Optional[int] = None):
+    read_options = pa_csv.ReadOptions(use_threads=True, encoding=encoding)
+    if block_size:
+        read_options.block_size = block_size
+    convert_options = pa_csv.ConvertOptions(
+        column_types=column_types,
+        null_values=NA_VALUES,
+        strings_can_be_null=True,
+        include_columns=list(columns) if columns is not None else None,
+    )
+    return read_options, convert_options
+
+
+def _numeric_as_string(column_types: Dict[str, pa.DataType]) -> Dict[str, pa.DataType]:
+    """Column types with the declared numeric columns read as strings (coerced after parsing)"""
+    return {column: pa.string() if column in NUMERIC_COLUMNS else column_type
+            for column, column_type in column_types.items()}
+
+
+def coerce_numeric(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """String column as double; values that are not numbers become nulls, as pd.to_numeric(errors='coerce')"""
+    if pa.types.is_dictionary(column.type):
+        column = pc.cast(column, pa.string())
+    text = pc.utf8_trim_whitespace(column)
+    is_number = pc.match_substring_regex(text, _NUMBER_PATTERN, ignore_case=True)
+    return pc.cast(pc.if_else(is_number, text, pa.scalar(None, pa.string())), pa.float64())
+
+
+def _coerce_numeric_columns(table: pa.Table) -> pa.Table:
+    """Declared numeric columns that were read as strings, parsed as double"""
+    for index, field in enumerate(table.schema):
+        if field.name in NUMERIC_COLUMNS and (pa.types.is_string(field.type)
+                                              or pa.types.is_dictionary(field.type)):
+            table = table.set_column(index, field.name, coerce_numeric(table.column(index)))
+    return table
+
+
+def _dictionary_encode(table: pa.Table) -> pa.Table:
+    """Dictionary-encode low-cardinality string columns"""
+    for index, field in enumerate(table.schema):
+        if not pa.types.is_string(field.type) or table.num_rows == 0:
+            continue
+        column = table.column(index)
+        if pc.count_distinct(column).as_py() <= DICTIONARY_MAX_RATIO * table.num_rows:
+            table = table.set_column(index, field.name, pc.dictionary_encode(column))
+    return table
+
+
+def _encode_columns(table: pa.Table, columns: Sequence[str]) -> pa.Table:
+    """Dictionary-encode the given columns that were read as plain strings"""
+    for index, field in enumerate(table.schema):
+        if field.name in columns and pa.types.is_string(field.type):
+            table = table.set_column(index, field.name, pc.dictionary_encode(table.column(index)))
+    return table
+
+
+def read_csv_table(source: CsvSource, schema_path: Optional[str] = None, encoding: str = 'utf8',
+                   columns: Optional[Sequence[str]] = None) -> pa.Table:
+    """
+    Read a CSV file with the multithreaded Arrow parser
+
+    Declared numeric columns are parsed as double (values that are not
+    numbers become nulls, as with pd.to_numeric), NA_VALUES become nulls and
+    low-cardinality strings are dictionary-encoded. The first read infers the
+    column types and saves them to schema_path; later reads apply that schema
+    at parse time, so no type inference or later re-conversion is needed.
+
+    Args:
+        source: Path to a CSV file or a binary stream
+        schema_path: JSON file of the persisted schema (not persisted if None)
+        encoding: Text encoding of the file (e.g. 'latin1')
+        columns: Columns to parse (all columns if None)
+
+    Returns:
+        pa.Table: Parsed table
+    """
+    column_types = load_schema(schema_path)
+    if column_types is not None:
+        if not isinstance(source, str):
+            column_types = _numeric_as_string(column_types)
+        try:
+            read_options, convert_options = _options(column_types, columns, encoding)
+            table = pa_csv.read_csv(source, read_options=read_options, convert_options=convert_options)
+            return _coerce_numeric_columns(table)
+        except pa.ArrowInvalid as e:
+            if not isinstance(source, str):
+                raise
+            # Данные больше не подходят под схему - выводим ее заново
+            print(f" Сохраненная схема CSV не подходит ({e}), схема будет выведена заново")
+
+    header = read_header(source, encoding)
+    # Поток второй раз не прочитать: числовые колонки сразу читаются строками и разбираются после
+    numeric_type = pa.float64() if isinstance(source, str) else pa.string()
+    numeric_types = {column: numeric_type for column in NUMERIC_COLUMNS if column in header}
+    try:
+        # Типы выводятся по первому блоку, поэтому блок берем большой
+        read_options, convert_options = _options(numeric_types, None, encoding, _INFERENCE_BLOCK_SIZE)
+        table = pa_csv.read_csv(source, read_options=read_options, convert_options=convert_options)
+    except pa.ArrowInvalid:
+        if not isinstance(source, str):
+            raise
+        # Нечисло в числовой колонке или типы в хвосте файла разошлись с выведенными -
+        # все колонки читаем строками, числовые разбираются с заменой ошибок на пропуск
+        string_types = {column: pa.string() for column in header}
+        read_options, convert_options = _options(string_types, None, encoding)
+        table = pa_csv.read_csv(source, read_options=read_options, convert_options=convert_options)
+
+    # Числовые колонки, прочитанные строками, так и сохраняются в схеме: следующее чтение не упадет
+    string_numeric = [field.name for field in table.schema
+                      if field.name in NUMERIC_COLUMNS and not pa.types.is_floating(field.type)]
+    table = _dictionary_encode(_coerce_numeric_columns(table))
+    if schema_path:
+        schema = table.schema
+        for column in string_numeric:
+            schema = schema.set(schema.get_field_index(column), pa.field(column, pa.string()))
+        save_schema(schema_path, schema)
+        print(f" Схема CSV сохранена: {schema_path}")
+    if columns is not None:
+        table = table.select(list(columns))
+    return table
+
+
+def iter_csv_batches(source: CsvSource, batch_rows: int, schema_path: Optional[str] = None,
+                     encoding: str = 'utf8', columns: Optional[Sequence[str]] = None) -> Iterator[pa.Table]:
+    """
+    Stream a CSV file as Arrow tables of at most batch_rows rows
+
+    Uses the persisted schema when there is one; otherwise numeric columns
+    are parsed as double and all other columns as strings, and string
+    columns with few distinct values in the first batch are dictionary-encoded
+    in every batch, as read_csv_table does. The inferred types are saved to
+    schema_path unless only some columns are read. If the data no longer fits the persisted schema, the rest
+    of the file is read with inferred types and the schema is rewritten; if
+    a numeric column holds a value that is not a number, the rest of the file
+    is read with numeric columns as strings, and such values become nulls.
+    """
+    header = read_header(source, encoding)
+    inferred_types = {column: pa.float64() if column in NUMERIC_COLUMNS else pa.string() for column in header}
+    column_types = load_schema(schema_path)
+    # Словарные колонки выбираются по первому батчу, если схемы еще нет
+    infer_dictionary = column_types is None
+    if column_types is None:
+        column_types = inferred_types
+    if not isinstance(source, str):
+        # Поток второй раз не прочитать: числовые колонки сразу читаются строками
+        column_types = _numeric_as_string(column_types)
+    dictionary_columns = [column for column, column_type in column_types.items() if column_type == _DICTIONARY_TYPE]
+
+    def record_batches(skip_rows: int = 0):
+        # Генератор: open_csv разбирает первый блок сразу, его ошибки ловятся вместе с остальными
+        read_options, convert_options = _options(column_types, columns, encoding)
+        read_options.skip_rows_after_names = skip_rows
+        yield from pa_csv.open_csv(source, read_options=read_options, convert_options=convert_options)
+
+    def save(types):
+        # Проекция видит не все колонки - такую схему не сохраняем, ее выведет полное чтение
+        if schema_path and columns is None:
+            save_schema(schema_path, pa.schema(list(types.items())))
+            print(f" Схема CSV сохранена: {schema_path}")
+
+    def finish(table):
+        nonlocal infer_dictionary, dictionary_columns, column_types
+        table = _coerce_numeric_columns(table)
+        if infer_dictionary:
+            infer_dictionary = False
+            dictionary_columns = [field.name for field in _dictionary_encode(table).schema
+                                  if pa.types.is_dictionary(field.type)]
+            column_types = {column: _DICTIONARY_TYPE if column in dictionary_columns else column_type
+                            for column, column_type in column_types.items()}
+            save(column_types)
+        return _encode_columns(table, dictionary_columns)
+
+    reader = record_batches()
+    emitted = 0
+    # Блоки парсера режутся по байтам - собираем из них батчи нужного размера
+    pending = []
+    pending_rows = 0
+    while True:
+        try:
+            record_batch = next(reader, None)
+        except pa.ArrowInvalid as e:
+            if not isinstance(source, str):
+                raise
+            # Выведенные типы с уже выбранными словарными колонками
+            inferred = {column: column_type if column_type == _DICTIONARY_TYPE
+                        else inferred_types.get(column, column_type)
+                        for column, column_type in column_types.items()}
+            if column_types != inferred and _numeric_as_string(column_types) != _numeric_as_string(inferred):
+                # Сохраненная схема устарела (нечисловая колонка объявлена числом и т.п.) -
+                # дочитываем с выведенными типами и переписываем схему
+                print(f" Сохраненная схема CSV не подходит ({e}), схема будет выведена заново "
+                      f"с {emitted} строки")
+                column_types = inferred
+                if not emitted:
+                    # Батчей еще не было - словарные колонки тоже выбираются заново
+                    column_types = dict(inferred_types)
+                    infer_dictionary = True
+            elif _numeric_as_string(column_types) != column_types:
+                print(f" Нечисловое значение в числовой колонке ({e}) - "
+                      f"числовые колонки дочитываются строками с {emitted} строки")
+                column_types = _numeric_as_string(column_types)
+            else:
+                raise
+            # Схема переписывается с новыми типами: следующее чтение не упадет
+            save(column_types)
+            reader = record_batches(skip_rows=emitted)
+            pending = []
+            pending_rows = 0
+            continue
+        if record_batch is None:
+            break
+        pending.append(record_batch)
+        pending_rows += record_batch.num_rows
+        while pending_rows >= batch_rows:
+            table = pa.Table.from_batches(pending)
+            yield finish(table.slice(0, batch_rows))
+            emitted += batch_rows
+            rest = table.slice(batch_rows)
+            pending = rest.to_batches()
+            pending_rows = rest.num_rows
+    if pending_rows:
+        yield finish(pa.Table.from_batches(pending))
@@ -1,31 +1,391 @@
-import pandas as pd
+import atexit
+import glob
+import operator
 import os
+import re
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow.dataset as ds
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from landing import RawLandingZone
+from http_download import RangedDownload
+from column_schema import iter_csv_batches, read_csv_table, read_header, schema_path_for
+
+# Условие фильтра: (колонка, оператор, значение)
+Filter = Tuple[str, str, Any]
+
+_FILTER_PATTERN = re.compile(
+    r'''^\s*(?:"(?P<dq>[^"]+)"|'(?P<sq>[^']+)'|(?P<bare>[^\s=!<>]+))'''
+    r'''\s*(?P<op>==|!=|>=|<=|>|<|=)\s*(?P<value>.+?)\s*$'''
+)
+
+_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+}
 
-def load_data(source: str) -> pd.DataFrame:
+def parse_filter(text: str) -> Filter:
+    """
+    Parse a filter like '"Patient Age" >= 5' or 'Gender == "Male"'
+    
+    Column names with spaces must be quoted. Quoted values are strings,
+    unquoted values are parsed as numbers when possible.
+    
+    Args:
+        text: Filter expression
+        
+    Returns:
+        Filter: (column, operator, value)
+    """
+    match = _FILTER_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Не удалось разобрать фильтр: {text}")
+    
+    column = match.group('dq') or match.group('sq') or match.group('bare')
+    op = '==' if match.group('op') == '=' else match.group('op')
+    raw_value = match.group('value')
+    
+    if len(raw_value) >= 2 and raw_value[0] == raw_value[-1] and raw_value[0] in '"\'':
+        value = raw_value[1:-1]
+    else:
+        try:
+            value = int(raw_value)
+        except ValueError:
+            try:
+                value = float(raw_value)
+            except ValueError:
+                value = raw_value
+    return column, op, value
+
+def _filters_to_expression(filters: Sequence[Filter]) -> Optional[ds.Expression]:
+    """Combine filters with AND into a pyarrow dataset expression"""
+    expression = None
+    for column, op, value in filters:
+        condition = _OPERATORS[op](ds.field(column), ds.scalar(value))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def _apply_filters(df: pd.DataFrame, filters: Sequence[Filter]) -> pd.DataFrame:
+    """Apply filters to a DataFrame read by pandas (sources without a dataset scan)"""
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        if column not in df.columns:
+            raise ValueError(f"Колонка из фильтра не найдена: {column}")
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Словарные колонки из Arrow CSV сравниваем по значениям, а не по категориям
+            values = values.astype(object)
+        mask &= _OPERATORS[op](values, value)
+    return df[mask]
+
+def _pandas_usecols(columns: Optional[Sequence[str]], filters: Sequence[Filter]) -> Optional[List[str]]:
+    """Columns pandas has to parse: the projection plus columns used in filters"""
+    if columns is None:
+        return None
+    return list(columns) + [column for column, _, _ in filters if column not in columns]
+
+def _scan_key(columns: Optional[Sequence[str]], filters: Sequence[Filter]) -> str:
+    """Describe projection and filters, so raw snapshots of different scans do not mix"""
+    if columns is None and not filters:
+        return ''
+    return repr((list(columns) if columns is not None else None, list(filters)))
+
+SUPPORTED_FORMATS = {'.parquet': 'parquet', '.csv': 'csv'}
+
+_GLOB_CHARS = ('*', '?', '[')
+
+class SourceFiles(NamedTuple):
+    """Resolved input: file format, list of files and root of Hive partitions"""
+    format: str
+    files: List[str]
+    partition_root: Optional[str]
+
+def _file_format(path: str) -> Optional[str]:
+    return SUPPORTED_FORMATS.get(os.path.splitext(path)[1].lower())
+
+def resolve_source(source: str) -> SourceFiles:
+    """
+    Resolve a file, glob pattern, directory or URL into a list of input files
+    
+    Directories are walked recursively; hidden and '_'-prefixed files
+    (_SUCCESS, .crc) are skipped. For directories and globs the path
+    segments like 'Institute Name=X' below the root become partition columns.
+    
+    Args:
+        source: Path to a file, glob pattern, directory or URL
+        
+    Returns:
+        SourceFiles: Format, sorted files and partition root
+    """
+    if source.startswith('http'):
+        return SourceFiles('csv', [source], None)
+    
+    if any(char in source for char in _GLOB_CHARS):
+        files = sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+        # Корень партиций - часть шаблона до первого wildcard
+        prefix = source[:min(source.index(char) for char in _GLOB_CHARS if char in source)]
+        partition_root = os.path.dirname(prefix) or '.'
+    elif os.path.isdir(source):
+        files = []
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames[:] = sorted(name for name in dirnames if not name.startswith(('.', '_')))
+            files.extend(os.path.join(dirpath, name) for name in filenames
+                         if not name.startswith(('.', '_')) and _file_format(name))
+        files.sort()
+        partition_root = source
+    else:
+        files = [source]
+        partition_root = None
+    
+    if not files:
+        raise ValueError(f"Не найдено файлов с данными: {source}")
+    
+    formats = {_file_format(path) for path in files}
+    if None in formats:
+        unsupported = [path for path in files if _file_format(path) is None]
+        raise ValueError(f"Неподдерживаемый формат файла: {unsupported[0]}")
+    if len(formats) > 1:
+        raise ValueError(f"Смешаны форматы файлов в источнике {source}: {sorted(formats)}")
+    
+    return SourceFiles(formats.pop(), files, partition_root)
+
+def _hive_partitions(path: str, partition_root: Optional[str]) -> Dict[str, Any]:
+    """Parse 'key=value' directories between the partition root and the file"""
+    if partition_root is None:
+        return {}
+    partitions = {}
+    relative_dir = os.path.dirname(os.path.relpath(path, partition_root))
+    for segment in relative_dir.split(os.sep):
+        if '=' in segment:
+            key, value = segment.split('=', 1)
+            try:
+                partitions[key] = int(value)
+            except ValueError:
+                partitions[key] = value
+    return partitions
+
+def _partition_matches(partitions: Dict[str, Any], filters: Sequence[Filter]) -> bool:
+    """Prune a file when a filter on a partition column already rejects it"""
+    for column, op, value in filters:
+        if column in partitions:
+            try:
+                if not _OPERATORS[op](partitions[column], value):
+                    return False
+            except TypeError:
+                # Несравнимые типы - решение примет фильтр по строкам
+                continue
+    return True
+
+def _parquet_dataset(source_files: SourceFiles) -> ds.Dataset:
+    """One logical pyarrow dataset over all Parquet files, with Hive partition columns"""
+    if source_files.partition_root is None:
+        return ds.dataset(source_files.files, format='parquet')
+    return ds.dataset(source_files.files, format='parquet', partitioning='hive',
+                      partition_base_dir=source_files.partition_root)
+
+def _csv_files(source_files: SourceFiles, filters: Sequence[Filter]) -> List[Tuple[str, Dict[str, Any]]]:
+    """CSV files with their partition values, after partition pruning"""
+    selected = []
+    for path in source_files.files:
+        partitions = _hive_partitions(path, source_files.partition_root)
+        if _partition_matches(partitions, filters):
+            selected.append((path, partitions))
+    if len(selected) < len(source_files.files):
+        print(f" Пропущено файлов по фильтру партиций: {len(source_files.files) - len(selected)}")
+    return selected
+
+def _prepare_csv_chunk(chunk: pd.DataFrame, partitions: Dict[str, Any], columns: Optional[Sequence[str]],
+                       filters: Sequence[Filter]) -> pd.DataFrame:
+    """Add partition columns, apply filters and the projection to a CSV chunk"""
+    for key, value in partitions.items():
+        if columns is None or key in columns or any(column == key for column, _, _ in filters):
+            chunk[key] = value
+    chunk = _apply_filters(chunk, filters)
+    return chunk[list(columns)] if columns is not None else chunk
+
+def _csv_usecols(columns: Optional[Sequence[str]], filters: Sequence[Filter],
+                 partitions: Dict[str, Any]) -> Optional[List[str]]:
+    """Columns to parse from the file itself (partition columns live in the path)"""
+    usecols = _pandas_usecols(columns, filters)
+    if usecols is None:
+        return None
+    return [column for column in usecols if column not in partitions]
+
+def _ordered_parallel(tasks: Sequence[Callable[[], Iterator[pd.DataFrame]]],
+                      workers: int) -> Iterator[pd.DataFrame]:
+    """
+    Run chunk iterators in a thread pool and yield their chunks in task order
+    
+    Up to `workers` tasks read ahead at the same time, each one holds at most
+    two chunks, so memory stays bounded and the output order is deterministic.
+    """
+    done = object()
+    stop = threading.Event()
+    
+    def run(task, buffer):
+        try:
+            for chunk in task():
+                if stop.is_set():
+                    return
+                buffer.put(chunk)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(done)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        buffers = []
+        next_task = 0
+        try:
+            for index in range(len(tasks)):
+                # Держим в работе не больше workers задач впереди текущей
+                while next_task < len(tasks) and next_task < index + workers:
+                    buffer = queue.Queue(maxsize=2)
+                    executor.submit(run, tasks[next_task], buffer)
+                    buffers.append(buffer)
+                    next_task += 1
+                buffer = buffers[index]
+                while True:
+                    item = buffer.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+                buffers[index] = None
+        finally:
+            # Освобождаем потоки, если потребитель остановился раньше
+            stop.set()
+            for buffer in buffers:
+                while buffer is not None and not buffer.empty():
+                    buffer.get_nowait()
+
+# Снимки сырых данных, которые еще дописываются в фоне
+_pending_landings: List[RawLandingZone] = []
+
+def finish_raw_landing(discard: bool = False) -> Optional[str]:
+    """
+    Wait until background raw snapshots are written
+    
+    Args:
+        discard: Drop unfinished snapshots instead of publishing them
+        
+    Returns:
+        str: Path to the last raw snapshot
+    """
+    snapshot_path = None
+    while _pending_landings:
+        snapshot_path = _pending_landings.pop(0).close(discard=discard)
+    return snapshot_path
+
+def _finish_at_exit() -> None:
+    # Писатель - поток-демон: без этого вызывающий, не дождавшийся finish_raw_landing
+    # (скрипты, бенчмарки), терял бы снимок и оставлял .raw_*.tmp
+    try:
+        finish_raw_landing()
+    except Exception as e:
+        print(f" Сырые данные не сохранены: {e}")
+
+atexit.register(_finish_at_exit)
+
+@contextmanager
+def _csv_input(path: str):
+    """
+    Local CSV path as is, or a URL downloaded in parallel ranges
+    
+    For a URL the CSV parser gets a stream over the download: parsing starts
+    while later chunks are still arriving. The file stays in data/downloads,
+    so the next run only revalidates it with a conditional request.
+    """
+    if not path.startswith('http'):
+        yield path
+        return
+    download = RangedDownload(path).start()
+    with download.open_stream() as stream:
+        yield stream
+    download.wait()
+    if download.not_modified:
+        print(f" Файл на сервере не изменился, прочитана локальная копия: {download.dest_path}")
+    elif download.resumed_chunks:
+        print(f" Загрузка продолжена с {download.resumed_chunks} готовых чанков: {download.dest_path}")
+    else:
+        print(f" Файл скачан: {download.dest_path}")
+
+def _read_csv_file(path: str, partitions: Dict[str, Any], columns: Optional[Sequence[str]],
+                   filters: Sequence[Filter], schema_path: Optional[str], encoding: str) -> pd.DataFrame:
+    with _csv_input(path) as csv_input:
+        table = read_csv_table(csv_input, schema_path, encoding,
+                               columns=_csv_usecols(columns, filters, partitions))
+    return _prepare_csv_chunk(table.to_pandas(), partitions, columns, filters)
+
+def load_data(source: str, raw_format: str = 'parquet', columns: Optional[Sequence[str]] = None,
+              filters: Sequence[Filter] = (), read_workers: Optional[int] = None,
+              csv_encoding: str = 'utf8', csv_schema: Optional[str] = None) -> pd.DataFrame:
     """
     Extract data from source and save to raw data folder
     
+    The source may be a file, a glob pattern or a (Hive-partitioned)
+    directory; several files are read in parallel. The raw snapshot is
+    written in the background; call finish_raw_landing() to wait for it.
+    For Parquet the projection and filters are pushed down into the pyarrow
+    dataset scan, so unneeded columns and row groups are never decoded.
+    CSV is parsed by the multithreaded Arrow reader with the column schema
+    persisted on the first read (see column_schema).
+    
     Args:
-        source: Path to data file or URL
+        source: Path to data file, glob pattern, directory or URL
+        raw_format: Format of the raw snapshot ('parquet' or 'arrow')
+        columns: Columns to read (all columns if None)
+        filters: Row filters combined with AND, see parse_filter
+        read_workers: Number of files read at the same time (CPU count by default)
+        csv_encoding: Text encoding of CSV files (e.g. 'latin1')
+        csv_schema: JSON file of the CSV column schema (data/schema/<source>.json of the project by default)
         
     Returns:
         pd.DataFrame: Loaded data
     """
     print(f" Загрузка данных из: {source}")
+    if columns is not None:
+        print(f" Проекция колонок: {list(columns)}")
+    if filters:
+        print(f" Фильтры: {list(filters)}")
+    
+    source_files = resolve_source(source)
+    read_workers = read_workers or os.cpu_count() or 1
+    csv_schema = csv_schema or schema_path_for(source)
+    if len(source_files.files) > 1:
+        print(f" Найдено файлов: {len(source_files.files)} ({source_files.format})")
     
     # Определяем тип источника и загружаем данные
-    if source.endswith('.parquet'):
-        df = pd.read_parquet(source)
-        print(" Загружен Parquet файл")
-    elif source.endswith('.csv'):
-        df = pd.read_csv(source)
-        print(" Загружен CSV файл")
+    if source_files.format == 'parquet':
+        # Файлы и row group'ы читаются параллельно пулом потоков pyarrow
+        dataset = _parquet_dataset(source_files)
+        table = dataset.to_table(columns=columns, filter=_filters_to_expression(filters),
+                                 use_threads=True, fragment_readahead=read_workers)
+        df = table.to_pandas()
+        print(" Загружен Parquet файл" if len(source_files.files) == 1 else " Загружены Parquet файлы")
     elif source.startswith('http'):
         # Загрузка из интернета
-        df = pd.read_csv(source)
+        df = _read_csv_file(source, {}, columns, filters, csv_schema, csv_encoding)
         print(" Загружены данные из URL")
     else:
-        raise ValueError(f"Неподдерживаемый формат файла: {source}")
+        csv_files = _csv_files(source_files, filters)
+        read_file = lambda item: _read_csv_file(item[0], item[1], columns, filters, csv_schema, csv_encoding)
+        # Первый файл читаем отдельно: он фиксирует схему для остальных
+        frames = [read_file(csv_files[0])] if csv_files else []
+        with ThreadPoolExecutor(max_workers=read_workers) as executor:
+            frames.extend(executor.map(read_file, csv_files[1:]))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        print(" Загружен CSV файл" if len(source_files.files) == 1 else " Загружены CSV файлы")
     
     # Базовая валидация
     if df.empty:
@@ -34,15 +394,138 @@ def load_data(source: str) -> pd.DataFrame:
     print(f" Размер данных: {df.shape[0]} строк, {df.shape[1]} колонок")
     print(f" Колонки: {list(df.columns)}")
     
-    # Сохраняем сырые данные
-    os.makedirs('data/raw', exist_ok=True)
-    raw_output_path = 'data/raw/raw_data.csv'
-    df.to_csv(raw_output_path, index=False)
-    print(f" Сырые данные сохранены: {raw_output_path}")
+    # Сохраняем сырые данные в фоне, не блокируя извлечение
+    landing = RawLandingZone(source, raw_format=raw_format, scan_key=_scan_key(columns, filters),
+                             source_files=source_files.files)
+    landing.write(df)
+    _pending_landings.append(landing)
     
     return df
 
+def _read_batches(source_files: SourceFiles, batch_rows: int, columns: Optional[Sequence[str]] = None,
+                  filters: Sequence[Filter] = (), read_workers: int = 1, csv_schema: Optional[str] = None,
+                  csv_encoding: str = 'utf8') -> Iterator[pd.DataFrame]:
+    """Read source as bounded DataFrame chunks without loading it whole"""
+    if source_files.format == 'parquet':
+        # Parquet читаем по record batch'ам - в памяти только текущий кусок.
+        # Row group'ы и партиции, не проходящие фильтр, пропускаются
+        dataset = _parquet_dataset(source_files)
+        scanner = dataset.scanner(columns=columns, filter=_filters_to_expression(filters),
+                                  batch_size=batch_rows, use_threads=True,
+                                  fragment_readahead=read_workers)
+        for record_batch in scanner.to_batches():
+            if record_batch.num_rows:
+                yield record_batch.to_pandas()
+    else:
+        # CSV и URL читаем чанками, несколько файлов - параллельно с упреждением
+        def chunk_task(path, partitions):
+            def read_chunks():
+                usecols = _csv_usecols(columns, filters, partitions)
+                with _csv_input(path) as csv_input:
+                    for table in iter_csv_batches(csv_input, batch_rows, csv_schema, csv_encoding,
+                                                  columns=usecols):
+                        yield _prepare_csv_chunk(table.to_pandas(), partitions, columns, filters)
+            return read_chunks
+        
+        tasks = [chunk_task(path, partitions) for path, partitions in _csv_files(source_files, filters)]
+        yield from _ordered_parallel(tasks, read_workers)
+
+def iter_batches(source: str, batch_rows: int, raw_format: str = 'parquet',
+                 columns: Optional[Sequence[str]] = None, filters: Sequence[Filter] = (),
+                 read_workers: Optional[int] = None, csv_encoding: str = 'utf8',
+                 csv_schema: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Extract data from source as a stream of bounded record batches
+    
+    Peak memory is limited by batch_rows instead of the size of the source.
+    Multi-file sources are streamed as one logical dataset in a stable file
+    order. Raw data is appended to the raw snapshot batch by batch in the
+    background.
+    
+    Args:
+        source: Path to data file, glob pattern, directory or URL
+        batch_rows: Maximum number of rows in one batch
+        raw_format: Format of the raw snapshot ('parquet' or 'arrow')
+        columns: Columns to read (all columns if None)
+        filters: Row filters combined with AND, see parse_filter
+        read_workers: Number of files read ahead at the same time (CPU count by default)
+        csv_encoding: Text encoding of CSV files (e.g. 'latin1')
+        csv_schema: JSON file of the CSV column schema (data/schema/<source>.json of the project by default)
+        
+    Yields:
+        pd.DataFrame: Next batch of loaded data
+    """
+    if batch_rows <= 0:
+        raise ValueError(f"Размер батча должен быть положительным: {batch_rows}")
+    
+    print(f" Потоковая загрузка данных из: {source} (батчи по {batch_rows} строк)")
+    
+    source_files = resolve_source(source)
+    if len(source_files.files) > 1:
+        print(f" Найдено файлов: {len(source_files.files)} ({source_files.format})")
+    
+    landing = RawLandingZone(source, raw_format=raw_format, scan_key=_scan_key(columns, filters),
+                             source_files=source_files.files)
+    _pending_landings.append(landing)
+    
+    total_rows = 0
+    batch_count = 0
+    for batch in _read_batches(source_files, batch_rows, columns, filters,
+                               read_workers or os.cpu_count() or 1,
+                               csv_schema or schema_path_for(source), csv_encoding):
+        if batch.empty:
+            continue
+        landing.write(batch)
+        batch_count += 1
+        total_rows += len(batch)
+        yield batch
+    
+    if total_rows == 0:
+        raise ValueError("Загруженный файл пустой")
+    
+    print(f" Загружено батчей: {batch_count}, всего строк: {total_rows}")
+
+def _source_columns(source_files: SourceFiles) -> Optional[List[str]]:
+    """Column names of a source without reading its data (None if unknown, e.g. a URL)"""
+    if source_files.format == 'parquet':
+        return _parquet_dataset(source_files).schema.names
+    first_file = source_files.files[0]
+    if first_file.startswith('http'):
+        return None
+    return read_header(first_file) + list(_hive_partitions(first_file, source_files.partition_root))
+
+def scan_batches(source: str, batch_rows: int, columns: Optional[Sequence[str]] = None,
+                 filters: Sequence[Filter] = (), read_workers: Optional[int] = None,
+                 csv_encoding: str = 'utf8', csv_schema: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Extra pass over a source for statistics, without a raw snapshot
+    
+    Reads only those of the requested columns that exist in the source and
+    applies the same filters as iter_batches, so the rows match the main pass.
+    
+    Args:
+        source: Path to data file, glob pattern, directory or URL
+        batch_rows: Maximum number of rows in one batch
+        columns: Columns to read (all columns if None)
+        filters: Row filters combined with AND, see parse_filter
+        read_workers: Number of files read ahead at the same time
+        csv_encoding: Text encoding of CSV files
+        csv_schema: JSON file of the CSV column schema
+        
+    Yields:
+        pd.DataFrame: Next batch
+    """
+    source_files = resolve_source(source)
+    if columns is not None:
+        available = _source_columns(source_files)
+        if available is not None:
+            columns = [column for column in columns if column in available]
+    yield from _read_batches(source_files, batch_rows, columns, filters,
+                             read_workers or os.cpu_count() or 1,
+                             csv_schema or schema_path_for(source), csv_encoding)
+
 if __name__ == "__main__":
     # Тестирование модуля
     test_df = load_data("/Users/anna/data_loader_project_clean/data/optimized_dataset.parquet")
+    finish_raw_landing()
     print(" Модуль extract работает корректно")
@@ -0,0 +1,351 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_DOWNLOAD_DIR = 'data/downloads'
+
+_BLOCK_SIZE = 1024 * 1024
+
+
+def download_path(url: str, download_dir: str = DEFAULT_DOWNLOAD_DIR) -> str:
+    """Local file for a URL: its file name plus a short hash of the full URL"""
+    name = os.path.basename(urllib.parse.urlparse(url).path) or 'download'
+    url_hash = hashlib.sha1(url.encode()).hexdigest()[:8]
+    stem, extension = os.path.splitext(name)
+    return os.path.join(download_dir, f"{stem}-{url_hash}{extension}")
+
+
+class RangedDownload:
+    """
+    Parallel, resumable download of one URL into a local file
+
+    When the server supports byte ranges, the file is split into chunks that
+    are fetched by a pool of threads and written in place into '<dest>.part'.
+    Finished chunks are recorded in '<dest>.meta.json', so an interrupted
+    download continues from the missing chunks. A finished file is revalidated
+    with a conditional request (ETag / Last-Modified) and not downloaded again
+    if the server answers 304. Servers without range support (for example
+    http.server) are downloaded in one sequential stream.
+
+    open_stream() returns a file object that can be parsed while the
+    download is still running: reads block until the bytes have arrived.
+    """
+
+    def __init__(self, url: str, dest_path: Optional[str] = None, parts: int = 4,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, timeout: float = 60, retries: int = 3):
+        self.url = url
+        self.dest_path = dest_path or download_path(url)
+        self.part_path = f"{self.dest_path}.part"
+        self.meta_path = f"{self.dest_path}.meta.json"
+        self.parts = max(1, parts)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+
+        self.size = None
+        self.ranged = False
+        self.not_modified = False
+        self.resumed_chunks = 0
+
+        self._meta = {}
+        self._cond = threading.Condition()
+        self._completed = set()
+        self._contiguous = 0
+        self._ready = False
+        self._done = False
+        self._error = None
+        self._thread = None
+
+    # --- управление загрузкой ---
+
+    def start(self) -> 'RangedDownload':
+        """Start the download in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ranged-download', daemon=True)
+            self._thread.start()
+        return self
+
+    def wait(self) -> str:
+        """
+        Wait for the download to finish
+
+        Returns:
+            str: Path to the downloaded file
+        """
+        self.start()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.dest_path
+
+    def open_stream(self) -> io.BufferedReader:
+        """File object over the downloaded bytes that blocks until they arrive"""
+        self.start()
+        return io.BufferedReader(_DownloadStream(self), buffer_size=_BLOCK_SIZE)
+
+    # --- фоновая часть ---
+
+    def _run(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.dest_path) or '.', exist_ok=True)
+            self._meta = self._load_meta()
+
+            probe = self._probe()
+            if probe is None:
+                self._finish_not_modified()
+                return
+            size, ranged, etag, last_modified = probe
+
+            # Без ETag/Last-Modified версию файла на сервере сравнить нельзя
+            same_version = (bool(etag or last_modified)
+                            and self._meta.get('etag') == etag
+                            and self._meta.get('last_modified') == last_modified
+                            and self._meta.get('size') == size)
+            if same_version and self._meta.get('complete') and os.path.exists(self.dest_path):
+                # Сервер не поддерживает условные запросы, но версия та же
+                self._finish_not_modified()
+                return
+
+            previous = self._meta if same_version else {}
+            self._meta = {'url': self.url, 'etag': etag, 'last_modified': last_modified,
+                          'size': size, 'chunk_size': self.chunk_size, 'completed': [],
+                          'complete': False}
+
+            if ranged and size:
+                self._download_ranges(size, previous)
+            else:
+                self._download_sequential()
+
+            os.replace(self.part_path, self.dest_path)
+            with self._cond:
+                self._meta['complete'] = True
+                self._save_meta()
+                self._done = True
+                self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self._error = e
+                self._cond.notify_all()
+
+    def _request(self, method: str = 'GET', headers: Optional[dict] = None):
+        request = urllib.request.Request(self.url, method=method, headers=headers or {})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _probe(self) -> Optional[Tuple[Optional[int], bool, Optional[str], Optional[str]]]:
+        """HEAD request with conditional headers; None means 304 Not Modified"""
+        headers = {}
+        if self._meta.get('complete') and os.path.exists(self.dest_path):
+            if self._meta.get('etag'):
+                headers['If-None-Match'] = self._meta['etag']
+            if self._meta.get('last_modified'):
+                headers['If-Modified-Since'] = self._meta['last_modified']
+        try:
+            with self._request('HEAD', headers) as response:
+                response_headers = response.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            if e.code not in (403, 405, 501):
+                raise
+            # HEAD не поддерживается - спрашиваем первый байт обычным GET
+            with self._request('GET', dict(headers, Range='bytes=0-0')) as response:
+                response_headers = response.headers
+                if response.status == 206:
+                    total = response_headers.get('Content-Range', '').rpartition('/')[2]
+                    return (int(total) if total.isdigit() else None, True,
+                            response_headers.get('ETag'), response_headers.get('Last-Modified'))
+
+        length = response_headers.get('Content-Length')
+        ranged = response_headers.get('Accept-Ranges', '').lower() == 'bytes'
+        return (int(length) if length and length.isdigit() else None, ranged,
+                response_headers.get('ETag'), response_headers.get('Last-Modified'))
+
+    def _download_ranges(self, size: int, previous: dict) -> None:
+        chunk_count = (size + self.chunk_size - 1) // self.chunk_size
+
+        # Докачка: та же версия файла на сервере и тот же размер чанка
+        completed = set()
+        if (previous and os.path.exists(self.part_path)
+                and previous.get('chunk_size') == self.chunk_size):
+            completed = set(previous.get('completed', []))
+        if not completed:
+            with open(self.part_path, 'wb') as f:
+                f.truncate(size)
+
+        with self._cond:
+            self.size = size
+            self.ranged = True
+            self.resumed_chunks = len(completed)
+            self._completed = completed
+            self._meta['completed'] = sorted(completed)
+            self._save_meta()
+            self._ready = True
+            self._cond.notify_all()
+
+        missing = [index for index in range(chunk_count) if index not in completed]
+        # Чанки ставятся в очередь по порядку - начало файла приходит первым
+        with ThreadPoolExecutor(max_workers=self.parts) as executor:
+            for future in [executor.submit(self._fetch_chunk, index, size) for index in missing]:
+                future.result()
+
+    def _fetch_chunk(self, index: int, size: int) -> None:
+        start = index * self.chunk_size
+        end = min(size, start + self.chunk_size) - 1
+        for attempt in range(self.retries + 1):
+            try:
+                with self._request('GET', {'Range': f'bytes={start}-{end}'}) as response:
+                    if response.status != 206:
+                        raise IOError(f"Сервер вернул {response.status} вместо 206 для диапазона")
+                    data = response.read()
+                if len(data) != end - start + 1:
+                    raise IOError(f"Получено {len(data)} байт вместо {end - start + 1}")
+                with open(self.part_path, 'r+b') as f:
+                    f.seek(start)
+                    f.write(data)
+                break
+            except (OSError, urllib.error.URLError):
+                if attempt == self.retries or self._error is not None:
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+
+        with self._cond:
+            self._completed.add(index)
+            self._meta['completed'] = sorted(self._completed)
+            self._save_meta()
+            self._cond.notify_all()
+
+    def _download_sequential(self) -> None:
+        with self._request('GET') as response, open(self.part_path, 'wb') as f:
+            length = response.headers.get('Content-Length')
+            with self._cond:
+                self.size = int(length) if length and length.isdigit() else None
+                self._ready = True
+                self._cond.notify_all()
+            for block in iter(lambda: response.read(_BLOCK_SIZE), b''):
+                f.write(block)
+                f.flush()
+                with self._cond:
+                    self._contiguous += len(block)
+                    self._cond.notify_all()
+        with self._cond:
+            self.size = self._contiguous
+            self._meta['size'] = self.size
+
+    def _finish_not_modified(self) -> None:
+        with self._cond:
+            self.not_modified = True
+            self.size = os.path.getsize(self.dest_path)
+            self._ready = True
+            self._done = True
+            self._cond.notify_all()
+
+    def _load_meta(self) -> dict:
+        if not os.path.exists(self.meta_path):
+            return {}
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return meta if meta.get('url') == self.url else {}
+
+    def _save_meta(self) -> None:
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    # --- доступ для потокового чтения ---
+
+    def _available(self, position: int) -> int:
+        """Number of bytes readable at position right now (caller holds the lock)"""
+        if self._done:
+            return max(0, self.size - position)
+        if not self._ready:
+            return 0
+        if self.ranged:
+            index = position // self.chunk_size
+            if index not in self._completed:
+                return 0
+            return min(self.size, (index + 1) * self.chunk_size) - position
+        return max(0, self._contiguous - position)
+
+
+class _DownloadStream(io.RawIOBase):
+    """Sequential reader over a running RangedDownload"""
+
+    def __init__(self, download: RangedDownload):
+        self._download = download
+        self._position = 0
+        self._file = None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        download = self._download
+        with download._cond:
+            while True:
+                if download._error is not None:
+                    raise download._error
+                if download._ready and download.size is not None and self._position >= download.size \
+                        and (download._done or download.ranged):
+                    return 0
+                available = download._available(self._position)
+                if available > 0:
+                    break
+                if download._done:
+                    return 0
+                download._cond.wait()
+
+            if self._file is None:
+                # .part переименовывается по завершении, открытый дескриптор остается валидным
+                path = download.dest_path if download._done else download.part_path
+                # Без буфера: упреждающее чтение захватило бы нули еще не скачанных
+                # диапазонов .part, читаются только байты, которые уже пришли
+                self._file = open(path, 'rb', buffering=0)
+
+        self._file.seek(self._position)
+        count = self._file.readinto(memoryview(buffer)[:min(len(buffer), available)])
+        self._position += count
+        return count
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+def download_file(url: str, dest_path: Optional[str] = None, parts: int = 4,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """
+    Download a URL with parallel ranges, resume and conditional GET
+
+    Args:
+        url: File URL
+        dest_path: Local path (data/downloads/<name>-<hash> by default)
+        parts: Number of ranges fetched at the same time
+        chunk_size: Size of one range in bytes
+
+    Returns:
+        str: Path to the downloaded file
+    """
+    download = RangedDownload(url, dest_path, parts=parts, chunk_size=chunk_size)
+    path = download.wait()
+    if download.not_modified:
+        print(f" Файл не изменился на сервере, используется локальная копия: {path}")
+    elif download.resumed_chunks:
+        print(f" Загрузка продолжена ({download.resumed_chunks} чанков уже было): {path}")
+    else:
+        print(f" Файл скачан: {path} ({download.size} байт)")
+    return path
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from stage_cache import input_fingerprint
+
+# Локальные колоночные файлы не копируем - они уже являются сырым снимком
+COLUMNAR_EXTENSIONS = ('.parquet', '.arrow', '.feather', '.ipc')
+
+RAW_FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+_STOP = object()
+
+# Временный файл писателя: .raw_<pid>_<поток>.<формат>.tmp (прежние версии писали без pid)
+_TMP_NAME = re.compile(r'^\.raw_(?:(?P<pid>\d+)_)?\d+\.(?:parquet|arrow)\.tmp$')
+
+# Сколько ждать места в очереди, прежде чем снова проверить, жив ли писатель
+_PUT_TIMEOUT = 0.5
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # os.kill на Windows завершает процесс, а не проверяет его - считаем живым
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_stale_tmp(raw_dir: str) -> List[str]:
+    """
+    Remove temporary snapshot files left by writers of finished processes
+
+    A process killed during a write (or whose writer thread was stopped at
+    interpreter exit) leaves its .raw_*.tmp behind. Files of processes that
+    are still running are kept: they may be writing right now.
+
+    Returns:
+        list: Paths of the removed files
+    """
+    removed = []
+    if not os.path.isdir(raw_dir):
+        return removed
+    for name in os.listdir(raw_dir):
+        match = _TMP_NAME.match(name)
+        if match is None:
+            continue
+        pid = match.group('pid')
+        if pid is not None and _process_alive(int(pid)):
+            continue
+        path = os.path.join(raw_dir, name)
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError:
+            pass
+    return removed
+
+
+class RawLandingZone:
+    """
+    Background writer of content-addressed raw data snapshots
+
+    Batches are hashed and written to a compressed Parquet or Arrow IPC file
+    in a separate thread, so extraction does not wait for the disk. The file
+    is named after the content hash: a repeated run with the same data keeps
+    the existing snapshot instead of writing a new one.
+
+    close() must be called to publish the snapshot (extract registers an
+    atexit hook for landings its callers did not finish). Temporary files of
+    dead writers are swept when a new landing starts writing.
+    """
+
+    def __init__(self, source: str, raw_dir: str = 'data/raw', raw_format: str = 'parquet',
+                 compression: str = 'zstd', scan_key: str = '', source_files: Optional[List[str]] = None):
+        if raw_format not in RAW_FORMATS:
+            raise ValueError(f"Неизвестный формат сырых данных: {raw_format}")
+
+        self.source = source
+        self.raw_dir = raw_dir
+        self.raw_format = raw_format
+        self.compression = compression
+        self.snapshot_path = None
+        self.skipped = False
+
+        self._index_path = os.path.join(raw_dir, 'index.json')
+        source_files = source_files if source_files is not None else [source]
+        self._fingerprint = input_fingerprint(source_files)
+        self._queue = queue.Queue(maxsize=2)
+        self._thread = None
+        self._error = None
+        self._discard = False
+
+        # 1. Источник уже лежит локально в колоночном формате
+        if self._fingerprint and all(path.lower().endswith(COLUMNAR_EXTENSIONS) for path in source_files):
+            self.snapshot_path = source
+            self.skipped = True
+            print(f" Источник уже колоночный, копия сырых данных не нужна: {source}")
+            return
+
+        # 2. Этот же файл (путь, размер, mtime) уже сохранялся раньше
+        if self._fingerprint:
+            # Снимки с разной проекцией/фильтрами одного файла различаются
+            self._fingerprint = f"{self._fingerprint}:{raw_format}{scan_key}"
+        known_snapshot = self._load_index().get(self._fingerprint) if self._fingerprint else None
+        if known_snapshot and os.path.exists(known_snapshot):
+            self.snapshot_path = known_snapshot
+            self.skipped = True
+            print(f" Источник не изменился, используется снимок: {known_snapshot}")
+            return
+
+        os.makedirs(raw_dir, exist_ok=True)
+        for path in sweep_stale_tmp(raw_dir):
+            print(f" Удален недописанный снимок: {path}")
+        self._thread = threading.Thread(target=self._run, name='raw-landing', daemon=True)
+        self._thread.start()
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Queue a batch for the background writer"""
+        if self.skipped:
+            return
+        if not self._put(df) or self._error is not None:
+            raise self._error or RuntimeError("Писатель сырых данных остановлен")
+
+    def _put(self, item) -> bool:
+        """Queue an item unless the writer thread has stopped (a plain put would block forever)"""
+        while self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self, discard: bool = False) -> Optional[str]:
+        """
+        Wait for the background writer and publish the snapshot
+
+        Args:
+            discard: Drop the unfinished snapshot (used when the run failed)
+
+        Returns:
+            str: Path to the raw snapshot (or to the source itself)
+        """
+        if self._thread is not None:
+            self._discard = discard
+            self._put(_STOP)
+            self._thread.join()
+            self._thread = None
+            if self._error is not None and not discard:
+                raise self._error
+        return self.snapshot_path
+
+    def _run(self) -> None:
+        digest = hashlib.sha256()
+        extension = RAW_FORMATS[self.raw_format]
+        tmp_path = os.path.join(self.raw_dir, f".raw_{os.getpid()}_{threading.get_ident()}{extension}.tmp")
+        writer = None
+        schema = None
+        try:
+            while True:
+                df = self._queue.get()
+                if df is _STOP:
+                    break
+
+                # Хеш содержимого: имена колонок + векторный хеш каждой строки
+                if writer is None:
+                    digest.update(json.dumps([str(col) for col in df.columns]).encode())
+                digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+                # Схема фиксируется по первому батчу
+                table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    writer = self._open_writer(tmp_path, schema)
+                writer.write_table(table)
+
+            if writer is None:
+                return
+            writer.close()
+            writer = None
+            if self._discard:
+                os.remove(tmp_path)
+                return
+
+            snapshot_path = os.path.join(self.raw_dir, f"raw_{digest.hexdigest()[:16]}{extension}")
+            if os.path.exists(snapshot_path):
+                # Такие же данные уже лежат в зоне - новый файл не нужен
+                os.remove(tmp_path)
+                print(f" Сырые данные не изменились, снимок уже есть: {snapshot_path}")
+            else:
+                os.replace(tmp_path, snapshot_path)
+                print(f" Сырые данные сохранены: {snapshot_path}")
+
+            self.snapshot_path = snapshot_path
+            if self._fingerprint:
+                index = self._load_index()
+                index[self._fingerprint] = snapshot_path
+                with open(self._index_path, 'w') as f:
+                    json.dump(index, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            self._error = e
+            # Не блокируем производителя, если писатель упал
+            while not self._queue.empty():
+                self._queue.get_nowait()
+        finally:
+            if writer is not None:
+                writer.close()
+            if self._error is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _open_writer(self, path: str, schema: pa.Schema):
+        if self.raw_format == 'arrow':
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            return pa.ipc.new_file(path, schema, options=options)
+        return pq.ParquetWriter(path, schema, compression=self.compression)
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self._index_path):
+            return {}
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
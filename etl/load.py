@@ -1,10 +1,78 @@
 import pandas as pd
 import os
-from sqlalchemy import create_engine, text
+import time
+from typing import Iterable, List, Optional, Sequence
 
-def load_data(transformed_df: pd.DataFrame, db_path: str = 'medical_data.db') -> None:
+from parquet_sink import ParquetOptions
+from load_sinks import LoadSink, ParquetLoadSink, DatabaseLoadSink, fan_out
+
+PARQUET_PATH = 'data/processed/processed_data.parquet'
+
+def default_sinks(db_path: str, db_mode: str = 'sample', db_indexes: Optional[Sequence[Sequence[str]]] = None,
+                  parquet_options: Optional[ParquetOptions] = None, checkpoint: bool = False,
+                  resume: bool = False) -> List[LoadSink]:
+    """The processed Parquet output and the SQLite table"""
+    os.makedirs(os.path.dirname(PARQUET_PATH), exist_ok=True)
+    return [ParquetLoadSink(PARQUET_PATH, parquet_options),
+            DatabaseLoadSink(db_path, db_mode=db_mode, indexes=db_indexes, checkpoint=checkpoint, resume=resume)]
+
+def _load(batches: Iterable[pd.DataFrame], sinks: Sequence[LoadSink]) -> None:
+    """Write the batches to all sinks at once, report every sink and its validation"""
+    print(f"  Параллельная запись: {', '.join(sink.name for sink in sinks)}")
+    started = time.perf_counter()
+    rows = fan_out(batches, sinks)
+    seconds = time.perf_counter() - started
+    
+    if not rows:
+        print(" Ошибка: нет данных для загрузки")
+        return
+    
+    for sink in sinks:
+        if sink.error is None:
+            for line in sink.report():
+                print(line)
+    timings = ', '.join(f"{sink.name} {sink.seconds:.2f} с" for sink in sinks)
+    print(f"   • Запись: {rows} строк за {seconds:.2f} с ({timings})")
+    
+    # Финальная валидация по метаданным, без повторного чтения данных
+    print(" Финальная валидация...")
+    for sink in sinks:
+        if sink.error is None:
+            for line in sink.validation():
+                print(line)
+    
+    failed = [sink for sink in sinks if sink.error is not None]
+    for sink in failed:
+        print(f" Ошибка записи в {sink.name}: {sink.error}")
+    if failed:
+        raise RuntimeError(f"Загрузка не удалась: {', '.join(sink.name for sink in failed)}")
+
+def load_data(transformed_df: pd.DataFrame, db_path: str = 'medical_data.db', db_mode: str = 'sample',
+              db_indexes: Optional[Sequence[Sequence[str]]] = None,
+              parquet_options: Optional[ParquetOptions] = None,
+              sinks: Optional[Sequence[LoadSink]] = None) -> None:
     """
     Load transformed data to SQLite database and save as parquet
+    
+    Parquet and SQLite are written concurrently, each sink in its own thread
+    (see load_sinks.fan_out), so the load takes as long as the slowest
+    sink. Categorical columns are written to Parquet dictionary-encoded and
+    are decoded to strings only for SQLite. The final validation compares
+    digests computed while writing with the Parquet footers and a SQLite
+    aggregate query, nothing is read back. A sink that fails keeps its
+    previous output; the others are published, then RuntimeError is raised.
+    
+    Args:
+        transformed_df: Transformed DataFrame
+        db_path: Path to SQLite database
+        db_mode: 'sample' - first 100 rows through to_sql, 'full' - the whole
+            table through the bulk loader (see sqlite_loader), 'upsert' - the
+            whole table merged into the existing one by Patient Id
+        db_indexes: Secondary indexes of the full/upsert table, every one a
+            list of columns (None - sqlite_loader.DEFAULT_INDEXES)
+        parquet_options: Row groups, codec, dictionary/statistics columns and
+            Hive partitioning of the Parquet output (see parquet_sink)
+        sinks: Load targets instead of the default Parquet and SQLite ones
     """
     print(" Начало загрузки данных...")
     
@@ -13,86 +81,40 @@ def load_data(transformed_df: pd.DataFrame, db_path: str = 'medical_data.db') ->
         print(" Ошибка: нет данных для загрузки")
         return
     
-    # 1. Сохраняем в Parquet (все данные)
-    os.makedirs('data/processed', exist_ok=True)
-    parquet_path = 'data/processed/processed_data.parquet'
-    
-    try:
-        transformed_df.to_parquet(parquet_path, index=False)
-        print(f" Данные сохранены в Parquet: {parquet_path}")
-        
-        if os.path.exists(parquet_path):
-            file_size = os.path.getsize(parquet_path) / 1024 / 1024
-            print(f"   • Размер файла: {file_size:.2f} MB")
-    except Exception as e:
-        print(f" Ошибка сохранения Parquet: {e}")
-        raise
-    
-    # 2. Загружаем в SQLite (максимум 100 строк)
-    print(f"  Загрузка в базу данных: {db_path}")
+    _load([transformed_df], sinks or default_sinks(db_path, db_mode, db_indexes, parquet_options))
+
+def load_batches(batches: Iterable[pd.DataFrame], db_path: str = 'medical_data.db',
+                 db_mode: str = 'sample', db_indexes: Optional[Sequence[Sequence[str]]] = None,
+                 parquet_options: Optional[ParquetOptions] = None,
+                 sinks: Optional[Sequence[LoadSink]] = None,
+                 checkpoint: bool = False, resume: bool = False) -> None:
+    """
+    Load a stream of transformed batches without collecting them in memory
     
-    try:
-        engine = create_engine(f'sqlite:///{db_path}')
-        
-        # Берем только 100 строк для БД
-        sample_df = transformed_df.head(100).copy()  # Используем .copy() чтобы избежать предупреждений
-        
-        table_name = 'medical_data'
-        
-        # Дополнительная проверка типов данных перед записью в SQLite
-        for col in sample_df.columns:
-            if sample_df[col].dtype == 'object':
-                # Убедимся что все строковые значения действительно строки
-                sample_df[col] = sample_df[col].astype(str)
-                # Заменяем возможные NaN в строках
-                sample_df.loc[sample_df[col] == 'nan', col] = 'Unknown'
-        
-        # Загружаем данные в SQLite
-        sample_df.to_sql(
-            table_name, 
-            engine, 
-            if_exists='replace', 
-            index=False
-        )
-        
-        # Проверяем что данные записались - правильный способ с text()
-        with engine.connect() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-            row_count = result.scalar()
-        
-        print(f" Данные загружены в SQLite:")
-        print(f"   • Таблица: {table_name}")
-        print(f"   • Записей: {row_count}")
-        print(f"   • Колонок: {len(sample_df.columns)}")
-        
-        # Показываем первые 5 колонок
-        if len(sample_df.columns) > 0:
-            print(f"   • Пример колонок: {list(sample_df.columns[:5])}")
-        
-    except Exception as e:
-        print(f" Ошибка при загрузке в БД: {e}")
-        raise
+    Every batch goes to all sinks as it arrives; each sink holds at most a
+    couple of pending batches (ParquetSink additionally keeps the
+    unfinished row groups). SQLite gets the same 100-row sample as in
+    load_data, or every batch with db_mode='full'/'upsert'.
     
-    # 3. Финальная валидация
-    print(" Финальная валидация...")
+    In a checkpointed run (see checkpoint.RunCheckpoint) the table commits
+    every batch with its number and keeps the loaded batches after an
+    error; a resumed run skips the batches the table already has. Parquet
+    is written from the first batch again, the batches are replayed.
     
-    # Проверяем Parquet файл
-    if os.path.exists(parquet_path):
-        try:
-            parquet_df = pd.read_parquet(parquet_path)
-            if len(parquet_df) == len(transformed_df):
-                print("    Parquet файл содержит все данные")
-            else:
-                print(f"     Parquet: {len(parquet_df)} строк (исходно: {len(transformed_df)})")
-        except Exception as e:
-            print(f"    Ошибка чтения Parquet: {e}")
+    Args:
+        batches: Iterable of transformed DataFrames with the same columns
+        db_path: Path to SQLite database
+        db_mode: 'sample', 'full' or 'upsert' (see load_data)
+        db_indexes: Secondary indexes of the full/upsert table (see load_data)
+        parquet_options: Layout of the Parquet output (see load_data)
+        sinks: Load targets instead of the default Parquet and SQLite ones
+        checkpoint: Commit the table batch by batch for a resumed run
+        resume: Continue the table of an interrupted checkpointed run
+    """
+    print(" Начало потоковой загрузки данных...")
     
-    # Проверяем что в БД ровно 100 строк или меньше если данных мало
-    expected_rows = min(100, len(transformed_df))
-    if row_count == expected_rows:
-        print(f"    В БД загружено {row_count} строк (как и ожидалось)")
-    else:
-        print(f"     В БД загружено {row_count} строк (ожидалось {expected_rows})")
+    _load(batches, sinks or default_sinks(db_path, db_mode, db_indexes, parquet_options,
+                                          checkpoint=checkpoint, resume=resume))
 
 if __name__ == "__main__":
     # Тестирование модуля
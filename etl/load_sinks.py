@@ -0,0 +1,322 @@
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from parquet_sink import ParquetOptions, ParquetSink
+from bulk_loader import BulkLoader, display_target, is_database_url, open_bulk_loader
+from sqlite_loader import DEFAULT_INDEXES
+from verify import FrameDigest, verify_table
+
+# Сколько батчей может ждать каждый синк, пока пишет предыдущий
+PENDING_BATCHES = 2
+
+def _prepare_for_sqlite(df: pd.DataFrame) -> pd.DataFrame:
+    """Make sure object and category columns hold plain strings before writing to SQLite"""
+    for col in df.columns:
+        if df[col].dtype.name == 'category':
+            # Словарные колонки декодируются только здесь - SQLite хранит их как TEXT
+            df[col] = df[col].astype(str)
+        elif df[col].dtype == 'object':
+            # Убедимся что все строковые значения действительно строки
+            df[col] = df[col].astype(str)
+            # Заменяем возможные NaN в строках
+            df.loc[df[col] == 'nan', col] = 'Unknown'
+    return df
+
+class LoadSink:
+    """
+    One target of the load stage
+
+    A sink gets the same transformed batches as every other sink (read-only,
+    a sink copies what it has to change), is finished once after the last
+    batch and verified after that. All calls of a sink happen in its own
+    thread, so it may open connections lazily in write(). The outcome is
+    kept on the sink: error is None on success, otherwise the exception of
+    the failed write or finish, and the output is rolled back by abort().
+
+    Batches are numbered from 0. A sink that durably commits batch by batch
+    returns from start() how many of them a resumed run already committed:
+    those are passed to skip() instead of write().
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        # Часть seconds, ушедшая на проверку после публикации
+        self.verify_seconds = 0.0
+        self.error: Optional[BaseException] = None
+        self.problems: List[str] = []
+
+    def start(self) -> int:
+        """Number of the first batch to write (batches before it are already committed)"""
+        return 0
+
+    def write(self, df: pd.DataFrame, index: int) -> None:
+        raise NotImplementedError
+
+    def skip(self, df: pd.DataFrame) -> None:
+        """Account for a batch committed by the interrupted run"""
+        self.rows += len(df)
+
+    def finish(self) -> None:
+        """Publish the output after the last batch"""
+
+    def abort(self) -> None:
+        """Drop the unfinished output (after an error)"""
+
+    def verify(self) -> List[str]:
+        """Problems of the published output (empty if it is complete)"""
+        return []
+
+    def output_bytes(self) -> Optional[int]:
+        """Size of the published output on disk (None if unknown, e.g. a server database)"""
+        return None
+
+    def report(self) -> List[str]:
+        """Report lines printed after the load"""
+        return []
+
+    def validation(self) -> List[str]:
+        """Result lines of verify() for the final validation"""
+        return []
+
+class ParquetLoadSink(LoadSink):
+    """Processed Parquet file (or Hive directory) written by ParquetSink"""
+
+    def __init__(self, path: str, options: Optional[ParquetOptions] = None):
+        super().__init__('Parquet')
+        self.sink = ParquetSink(path, options or ParquetOptions())
+
+    def write(self, df: pd.DataFrame, index: int) -> None:
+        self.sink.write(df)
+        self.rows += len(df)
+
+    def finish(self) -> None:
+        self.sink.close()
+
+    def abort(self) -> None:
+        self.sink.abort()
+
+    def verify(self) -> List[str]:
+        return self.sink.verify()
+
+    def output_bytes(self) -> Optional[int]:
+        return sum(os.path.getsize(file_path) for file_path in self.sink.files if os.path.exists(file_path))
+
+    def report(self) -> List[str]:
+        layout = f"{len(self.sink.files)} файлов, " if self.sink.options.partition_by else ''
+        return [f" Данные сохранены в Parquet: {self.sink.path}",
+                f"   • Размер: {self.sink.size_mb():.2f} MB ({layout}{self.sink.row_group_count()} групп строк, "
+                f"{self.sink.options.compression})"]
+
+    def validation(self) -> List[str]:
+        if self.problems:
+            return [f"     Parquet: {problem}" for problem in self.problems]
+        return [f"    Parquet файл содержит все данные ({self.sink.rows} строк; пропуски и min/max колонок сверены со статистиками футера)"]
+
+class DatabaseLoadSink(LoadSink):
+    """
+    The medical_data table in SQLite (a file path) or Postgres (a URL)
+
+    db_mode='sample' writes the first sample_rows rows through to_sql,
+    'full' and 'upsert' write every batch with the bulk loader of the
+    database (see bulk_loader.open_bulk_loader; replace or merge by
+    Patient Id). A digest of the rows written is kept for verify().
+
+    With checkpoint=True 'full' and 'upsert' commit every batch together
+    with its number and keep the staging table after an error; with
+    resume=True as well, start() continues with the staging table of the
+    interrupted run (see BulkLoader.resume).
+    """
+
+    def __init__(self, db_path: str, db_mode: str = 'sample', indexes: Optional[Sequence[Sequence[str]]] = None,
+                 table_name: str = 'medical_data', sample_rows: int = 100,
+                 checkpoint: bool = False, resume: bool = False):
+        super().__init__('PostgreSQL' if is_database_url(db_path) else 'SQLite')
+        self.db_path = db_path
+        self.db_mode = db_mode
+        self.indexes = DEFAULT_INDEXES if indexes is None else indexes
+        self.table_name = table_name
+        self.sample_rows = sample_rows
+        self.checkpoint = checkpoint and db_mode in ('full', 'upsert')
+        self.resume = resume and self.checkpoint
+        self.row_count = 0
+        self.written = FrameDigest()
+        self._columns: List[str] = []
+        self._loader: Optional[BulkLoader] = None
+        self._engine = None
+
+    def _open_loader(self) -> BulkLoader:
+        if self._loader is None:
+            # Соединение открывается в потоке синка - в нем оно и используется (так требует sqlite3)
+            self._loader = open_bulk_loader(self.db_path, table_name=self.table_name,
+                                            mode='upsert' if self.db_mode == 'upsert' else 'replace',
+                                            indexes=self.indexes)
+        return self._loader
+
+    def start(self) -> int:
+        if not self.resume:
+            return 0
+        committed = self._open_loader().resume()
+        if committed:
+            print(f"   {self.name}: {committed} батчей уже загружено прерванным запуском")
+        return committed
+
+    def write(self, df: pd.DataFrame, index: int) -> None:
+        self._columns = list(df.columns)
+        if self.db_mode in ('full', 'upsert'):
+            self._open_loader().write(df, batch=index if self.checkpoint else None)
+            self.written.update(df)
+            self.rows += len(df)
+        elif self.rows < self.sample_rows:
+            # Добираем образец для SQLite до sample_rows строк
+            sample_df = _prepare_for_sqlite(df.head(self.sample_rows - self.rows).copy())
+            if self._engine is None:
+                url = self.db_path if is_database_url(self.db_path) else f'sqlite:///{self.db_path}'
+                self._engine = create_engine(url)
+            sample_df.to_sql(
+                self.table_name,
+                self._engine,
+                if_exists='replace' if self.rows == 0 else 'append',
+                index=False
+            )
+            self.written.update(sample_df)
+            self.rows += len(sample_df)
+
+    def finish(self) -> None:
+        if self._loader is not None:
+            self.row_count = self._loader.finish()
+        elif self._engine is not None:
+            with self._engine.connect() as conn:
+                self.row_count = conn.execute(text(f"SELECT COUNT(*) FROM {self.table_name}")).scalar()
+
+    def skip(self, df: pd.DataFrame) -> None:
+        self._columns = list(df.columns)
+        self.written.update(df)
+        self.rows += len(df)
+
+    def abort(self) -> None:
+        if self._loader is not None:
+            # Загруженные батчи остаются для --resume
+            self._loader.close(keep=self.checkpoint)
+
+    def verify(self) -> List[str]:
+        # После дозагрузки в таблице остаются и строки прошлых запусков
+        if self.db_mode == 'upsert' or not self.rows:
+            return []
+        return verify_table(self.db_path, self.table_name, self.written)
+
+    def output_bytes(self) -> Optional[int]:
+        if is_database_url(self.db_path) or not os.path.exists(self.db_path):
+            return None
+        return os.path.getsize(self.db_path)
+
+    def report(self) -> List[str]:
+        lines = [f" Данные загружены в {self.name}: {display_target(self.db_path)}",
+                 f"   • Таблица: {self.table_name}",
+                 f"   • Записей: {self.row_count}",
+                 f"   • Колонок: {len(self._columns)}"]
+        if self._columns:
+            lines.append(f"   • Пример колонок: {self._columns[:5]}")
+        if self._loader is not None:
+            lines.append(f"   • Скорость загрузки: {self._loader.report()}")
+        return lines
+
+    def validation(self) -> List[str]:
+        if self.db_mode == 'upsert':
+            return [f"    В БД {self.row_count} строк после дозагрузки"]
+        if self.problems:
+            return [f"     БД: {problem}" for problem in self.problems]
+        return [f"    В БД загружено {self.row_count} строк (как и ожидалось, совпадают число значений, суммы и min/max колонок)"]
+
+_END = object()
+_ABORT = object()
+
+def _run_sink(sink: LoadSink, batches: queue.Queue) -> None:
+    """Write the queued batches to one sink, then finish (or abort) and verify it"""
+    started = time.perf_counter()
+    first = 0
+    try:
+        first = sink.start()
+    except Exception as e:
+        sink.error = e
+    sink.seconds += time.perf_counter() - started
+    while True:
+        batch = batches.get()
+        if batch is _END or batch is _ABORT:
+            break
+        if sink.error is not None:
+            # Упавший синк только разбирает очередь, чтобы не блокировать остальные
+            continue
+        index, df = batch
+        started = time.perf_counter()
+        try:
+            if index < first:
+                sink.skip(df)
+            else:
+                sink.write(df, index)
+        except Exception as e:
+            sink.error = e
+        sink.seconds += time.perf_counter() - started
+    started = time.perf_counter()
+    if sink.error is None and batch is _END:
+        try:
+            sink.finish()
+            verify_started = time.perf_counter()
+            sink.problems = sink.verify()
+            sink.verify_seconds = time.perf_counter() - verify_started
+        except Exception as e:
+            sink.error = e
+    if sink.error is not None or batch is _ABORT:
+        try:
+            sink.abort()
+        except Exception:
+            pass
+    sink.seconds += time.perf_counter() - started
+
+def fan_out(batches: Iterable[pd.DataFrame], sinks: Sequence[LoadSink],
+            pending_batches: int = PENDING_BATCHES) -> int:
+    """
+    Write a stream of batches to several sinks concurrently
+
+    Every sink runs in its own thread with a bounded queue: the producer
+    hands each batch to all queues, so the batches are produced once and
+    at most pending_batches of them wait per sink. The stage takes as long
+    as the slowest sink, not the sum of all sinks. A failing sink records
+    its error, aborts its output and drops the rest of its batches; the
+    other sinks are finished and verified as usual. If the producer fails,
+    every sink is aborted and the error is raised.
+
+    Batches are numbered in the order of the stream, empty ones included,
+    so the numbers match those of a run checkpoint.
+
+    Returns:
+        int: Number of rows produced
+    """
+    queues = [queue.Queue(maxsize=pending_batches) for _ in sinks]
+    rows = 0
+    with ThreadPoolExecutor(max_workers=len(sinks), thread_name_prefix='load-sink') as executor:
+        futures = [executor.submit(_run_sink, sink, batches_queue) for sink, batches_queue in zip(sinks, queues)]
+        end = _END
+        try:
+            for index, batch in enumerate(batches):
+                if batch.empty:
+                    continue
+                for batches_queue in queues:
+                    batches_queue.put((index, batch))
+                rows += len(batch)
+        except BaseException:
+            end = _ABORT
+            raise
+        finally:
+            for batches_queue in queues:
+                batches_queue.put(end)
+            for future in futures:
+                future.result()
+    return rows
@@ -0,0 +1,241 @@
+import os
+import shutil
+import urllib.parse
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from verify import FrameDigest, verify_parquet_file
+
+PARQUET_CODECS = ('zstd', 'snappy', 'gzip', 'none')
+
+# 128K строк: группа достаточно крупная для сжатия и при этом пропускается читателем по статистике
+DEFAULT_ROW_GROUP_ROWS = 131072
+
+# Значение партиции для пропуска - так его понимают Hive, Spark и pyarrow
+HIVE_NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+class ParquetOptions(NamedTuple):
+    """
+    Layout of the processed Parquet output
+
+    row_group_rows: Rows per row group; batches are buffered up to this
+        size, so small streaming batches do not produce tiny row groups
+    compression: 'zstd', 'snappy', 'gzip' or 'none'
+    compression_level: Codec level (None - codec default)
+    dictionary_columns: Dictionary-encoded columns (None - columns with
+        less than half distinct values in the first batch)
+    statistics_columns: Columns with min/max statistics (None - all)
+    partition_by: Hive partition columns, one directory level per column
+    """
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS
+    compression: str = 'zstd'
+    compression_level: Optional[int] = None
+    dictionary_columns: Optional[Sequence[str]] = None
+    statistics_columns: Optional[Sequence[str]] = None
+    partition_by: Sequence[str] = ()
+
+def _partition_segment(column: str, value) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return f"{column}={HIVE_NULL_PARTITION}"
+    # Значение кодируется как в URI - так его раскодирует чтение с partitioning='hive'
+    return f"{column}={urllib.parse.quote(str(value), safe=' ')}"
+
+def _dictionary_columns(df: pd.DataFrame) -> List[str]:
+    """Columns worth dictionary encoding: repeated values (categories, codes, small numbers)"""
+    return [col for col in df.columns if len(df) and df[col].nunique(dropna=True) < len(df) / 2]
+
+class _PartitionFile:
+    """One open Parquet file with rows buffered up to a full row group"""
+
+    def __init__(self, writer: pq.ParquetWriter):
+        self.writer = writer
+        self.pending: List[pa.Table] = []
+        self.pending_rows = 0
+        # Отпечаток строк файла, сверяется со статистиками футера
+        self.digest = FrameDigest()
+
+class ParquetSink:
+    """
+    Incremental Parquet writer for the processed data
+
+    Batches are converted to Arrow and written with one pq.ParquetWriter per
+    output file as they arrive; only the rows of the current unfinished row
+    group of every file are held in memory. Row groups have row_group_rows
+    rows (the last one of a file may be smaller), carry min/max statistics,
+    and with partition_by the output is a Hive directory tree
+    ('Institute Name=Hospital A/part-00000.parquet'), so readers can skip
+    whole files by partition and row groups by statistics.
+
+    The output is written next to the target and moved in place by
+    close(): a failed run leaves the previous output untouched.
+
+    Every file gets a FrameDigest of its rows computed while writing;
+    verify() compares it with the row count and the column statistics
+    (null counts, min/max) of the footers alone.
+    """
+
+    def __init__(self, path: str, options: ParquetOptions = ParquetOptions()):
+        if options.compression not in PARQUET_CODECS:
+            raise ValueError(f"Неизвестный кодек Parquet: {options.compression}")
+        if options.row_group_rows <= 0:
+            raise ValueError("Размер группы строк должен быть положительным")
+        self.path = path
+        self.options = options
+        self.rows = 0
+        self.files: List[str] = []
+        self._tmp_path = f"{path}.tmp"
+        self._schema: Optional[pa.Schema] = None
+        self._columns: Optional[List[str]] = None
+        self._writer_options: Dict = {}
+        self._open: Dict[Tuple, _PartitionFile] = {}
+        self._digests: Dict[str, FrameDigest] = {}
+
+    def _start(self, df: pd.DataFrame) -> None:
+        self._columns = list(df.columns)
+        missing = [col for col in self.options.partition_by if col not in self._columns]
+        if missing:
+            raise ValueError(f"Нет колонок для партиционирования: {missing}")
+        data_columns = [col for col in self._columns if col not in self.options.partition_by]
+        schema = pa.Schema.from_pandas(df[data_columns], preserve_index=False).remove_metadata()
+        # Ширина кодов словаря фиксируется с запасом: в следующих батчах категорий может стать больше
+        self._schema = pa.schema([
+            field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+            if pa.types.is_dictionary(field.type) else field
+            for field in schema
+        ])
+
+        dictionary = self.options.dictionary_columns
+        if dictionary is None:
+            dictionary = _dictionary_columns(df[data_columns])
+        statistics = self.options.statistics_columns
+        self._writer_options = {
+            'compression': self.options.compression,
+            'compression_level': self.options.compression_level,
+            'use_dictionary': [col for col in dictionary if col in data_columns],
+            'write_statistics': True if statistics is None else [col for col in statistics if col in data_columns],
+        }
+        if os.path.isdir(self._tmp_path):
+            shutil.rmtree(self._tmp_path)
+        elif os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+        if self.options.partition_by:
+            os.makedirs(self._tmp_path)
+
+    def _file(self, key: Tuple) -> _PartitionFile:
+        part = self._open.get(key)
+        if part is None:
+            if self.options.partition_by:
+                segments = [_partition_segment(col, value) for col, value in zip(self.options.partition_by, key)]
+                directory = os.path.join(self._tmp_path, *segments)
+                os.makedirs(directory, exist_ok=True)
+                file_path = os.path.join(directory, 'part-00000.parquet')
+            else:
+                file_path = self._tmp_path
+            part = _PartitionFile(pq.ParquetWriter(file_path, self._schema, **self._writer_options))
+            self.files.append(file_path)
+            self._digests[file_path] = part.digest
+            self._open[key] = part
+        return part
+
+    def _flush(self, part: _PartitionFile, final: bool = False) -> None:
+        """Write the buffered rows as full row groups (and the remainder when final)"""
+        size = self.options.row_group_rows
+        if part.pending_rows < size and not (final and part.pending_rows):
+            return
+        table = pa.concat_tables(part.pending)
+        full_rows = len(table) if final else len(table) - len(table) % size
+        for start in range(0, full_rows, size):
+            part.writer.write_table(table.slice(start, min(size, full_rows - start)), row_group_size=size)
+        rest = table.slice(full_rows)
+        part.pending = [rest] if len(rest) else []
+        part.pending_rows = len(rest)
+
+    def _append(self, key: Tuple, df: pd.DataFrame) -> None:
+        data = df.drop(columns=list(self.options.partition_by)) if self.options.partition_by else df
+        table = pa.Table.from_pandas(data, schema=self._schema, preserve_index=False)
+        part = self._file(key)
+        part.digest.update(data)
+        part.pending.append(table)
+        part.pending_rows += len(table)
+        self._flush(part)
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Add a batch (the first one defines the columns and the schema)"""
+        if df.empty:
+            return
+        if self._columns is None:
+            self._start(df)
+        elif list(df.columns) != self._columns:
+            raise ValueError(f"Колонки батча не совпадают с файлом {self.path}")
+        # Большой DataFrame переводится в Arrow по частям размером с группу строк
+        for start in range(0, len(df), self.options.row_group_rows):
+            chunk = df.iloc[start:start + self.options.row_group_rows]
+            if not self.options.partition_by:
+                self._append((), chunk)
+                continue
+            groups = chunk.groupby(list(self.options.partition_by), observed=True, dropna=False, sort=False)
+            for key, group in groups:
+                self._append(key if isinstance(key, tuple) else (key,), group)
+        self.rows += len(df)
+
+    def close(self) -> Optional[str]:
+        """
+        Flush the last row groups, close the files and move the output in place
+
+        Returns:
+            str: Output path (None if nothing was written)
+        """
+        if self._columns is None:
+            return None
+        try:
+            for part in self._open.values():
+                self._flush(part, final=True)
+        finally:
+            for part in self._open.values():
+                part.writer.close()
+        self._open = {}
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        os.replace(self._tmp_path, self.path)
+        self.files = [self.path + file_path[len(self._tmp_path):] for file_path in self.files]
+        self._digests = {self.path + file_path[len(self._tmp_path):]: digest
+                         for file_path, digest in self._digests.items()}
+        return self.path
+
+    def abort(self) -> None:
+        """Close the files and drop the unfinished output (after an error)"""
+        for part in self._open.values():
+            try:
+                part.writer.close()
+            except Exception:
+                pass
+        self._open = {}
+        if os.path.isdir(self._tmp_path):
+            shutil.rmtree(self._tmp_path)
+        elif os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def size_mb(self) -> float:
+        return sum(os.path.getsize(file_path) for file_path in self.files) / 1024 / 1024
+
+    def row_group_count(self) -> int:
+        return sum(pq.ParquetFile(file_path).metadata.num_row_groups for file_path in self.files)
+
+    def verify(self) -> List[str]:
+        """
+        Check the published files against the digests computed while writing
+
+        Only the footers are read (row counts, null counts and min/max of
+        the column statistics), so the cost does not grow with the number
+        of rows.
+
+        Returns:
+            list: Problems found (empty if the output is complete)
+        """
+        return [problem for file_path in self.files
+                for problem in verify_parquet_file(file_path, self._digests[file_path], self._schema.names)]
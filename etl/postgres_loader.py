@@ -0,0 +1,213 @@
+import io
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from bulk_loader import BulkLoader
+from sqlite_loader import DEFAULT_INDEXES, index_name
+from upsert import UPSERT_KEY, merge_statement, quote_identifier as _quote
+
+# Маркер NULL в CSV для COPY: пустая строка в данных остается пустой строкой, а не NULL
+COPY_NULL = r'\N'
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+def pooled_engine(url: str) -> Engine:
+    """One engine (and its connection pool) per URL for the whole process"""
+    with _engines_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = create_engine(url, pool_pre_ping=True)
+            _engines[url] = engine
+        return engine
+
+def postgres_type(values: pd.Series) -> str:
+    """Declared Postgres type of a transformed column by its dtype, as sqlite_type (bool is stored as 0/1)"""
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'SMALLINT'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'BIGINT'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'DOUBLE PRECISION'
+    return 'TEXT'
+
+class PostgresBulkLoader(BulkLoader):
+    """
+    Bulk load of whole DataFrames (or a stream of batches) into one Postgres table
+
+    The Postgres implementation of BulkLoader. Rows are streamed with
+    COPY ... FROM STDIN from an in-memory CSV buffer of commit_rows rows
+    (one COPY and one commit per buffer, no per-row INSERTs) into a staging
+    table without constraints. The connection comes from a pool shared by
+    all loaders of the same URL (see pooled_engine) and goes back to it in
+    finish() or close().
+
+    finish() publishes in one transaction (DDL is transactional in Postgres,
+    readers see the old or the new table): mode='replace' keeps every row,
+    drops the target and renames the staging table to it, then indexes the
+    key; mode='upsert' keeps the last row of every repeated key, adds the
+    primary key in one pass over the loaded data and merges the staging
+    rows with INSERT ... ON CONFLICT DO UPDATE. Secondary indexes are
+    created after that, then ANALYZE.
+
+    write(df, batch) copies the whole frame in one transaction that also
+    stores the batch number in a checkpoint table, for resume().
+    """
+
+    def __init__(self, url: str, table_name: str = 'medical_data', schema: str = 'public',
+                 commit_rows: int = 100000, indexes: Sequence[Sequence[str]] = DEFAULT_INDEXES,
+                 mode: str = 'replace', key: str = UPSERT_KEY):
+        super().__init__(table_name, mode=mode, key=key, indexes=indexes)
+        self.url = url
+        self.schema = schema
+        self.commit_rows = commit_rows
+        self._table = f"{_quote(schema)}.{_quote(table_name)}"
+        self._staging = f"{_quote(schema)}.{_quote(self.staging_name)}"
+        self._checkpoint = f"{_quote(schema)}.{_quote(table_name + '__checkpoint')}"
+        self._columns: Optional[List[str]] = None
+        self._bool_columns: Optional[List[str]] = None
+        self._copy_sql = None
+        self._conn = pooled_engine(url).raw_connection()
+
+    def _execute(self, sql: str):
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone() if cursor.description else cursor.rowcount
+
+    def _set_columns(self, columns: List[str]) -> None:
+        self._columns = columns
+        if self.mode == 'upsert' and self.key not in self._columns:
+            raise ValueError(f"Для дозагрузки нужна колонка {self.key}")
+        names = ', '.join(_quote(col) for col in self._columns)
+        self._copy_sql = f"COPY {self._staging} ({names}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+
+    def _create_staging(self, df: pd.DataFrame) -> None:
+        self._set_columns(list(df.columns))
+        definitions = ', '.join(f"{_quote(col)} {postgres_type(df[col])}" for col in self._columns)
+        # При дозагрузке промежуточная таблица удаляется после слияния - WAL для нее не нужен
+        unlogged = 'UNLOGGED ' if self.mode == 'upsert' else ''
+        self._execute(f"DROP TABLE IF EXISTS {self._staging}")
+        self._execute(f"DROP TABLE IF EXISTS {self._checkpoint}")
+        self._execute(f"CREATE {unlogged}TABLE {self._staging} ({definitions})")
+        self._execute(f"CREATE TABLE {self._checkpoint} (batches INTEGER NOT NULL)")
+        self._execute(f"INSERT INTO {self._checkpoint} VALUES (0)")
+        self._conn.commit()
+
+    def resume(self) -> int:
+        found = self._execute(f"SELECT to_regclass('{self._checkpoint}') IS NOT NULL "
+                              f"AND to_regclass('{self._staging}') IS NOT NULL")[0]
+        if not found:
+            self._conn.commit()
+            return 0
+        with self._conn.cursor() as cursor:
+            cursor.execute("SELECT column_name FROM information_schema.columns "
+                           "WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position",
+                           (self.schema, self.staging_name))
+            columns = [row[0] for row in cursor.fetchall()]
+        self._set_columns(columns)
+        batches = self._execute(f"SELECT batches FROM {self._checkpoint}")[0]
+        self._conn.commit()
+        return batches
+
+    def _copy(self, chunk: pd.DataFrame) -> None:
+        if self._bool_columns:
+            chunk = chunk.astype({col: 'int8' for col in self._bool_columns})
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, index=False, header=False, na_rep=COPY_NULL)
+        buffer.seek(0)
+        with self._conn.cursor() as cursor:
+            cursor.copy_expert(self._copy_sql, buffer)
+
+    def write(self, df: pd.DataFrame, batch: Optional[int] = None) -> None:
+        started = time.perf_counter()
+        if self._columns is None:
+            self._create_staging(df)
+        elif list(df.columns) != self._columns:
+            raise ValueError(f"Колонки батча не совпадают с таблицей {self.table_name}")
+        if self._bool_columns is None:
+            self._bool_columns = [col for col in self._columns if pd.api.types.is_bool_dtype(df[col].dtype)]
+        chunks = [df.iloc[start:start + self.commit_rows] for start in range(0, len(df), self.commit_rows)]
+        # С номером батча весь батч и отметка о нем - одна транзакция
+        transactions = [chunks] if batch is not None else [[chunk] for chunk in chunks]
+        for transaction in transactions:
+            try:
+                for chunk in transaction:
+                    self._copy(chunk)
+                if batch is not None:
+                    self._execute(f"UPDATE {self._checkpoint} SET batches = {batch + 1}")
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            self.rows += sum(len(chunk) for chunk in transaction)
+        self.seconds += time.perf_counter() - started
+
+    def _merge(self) -> None:
+        self._execute(f"CREATE TABLE IF NOT EXISTS {self._table} (LIKE {self._staging} INCLUDING ALL)")
+        # Таблица прежнего формата без первичного ключа - ON CONFLICT нужен уникальный индекс
+        unique_name = _quote(f"uq_{self.table_name}_{self.key}".replace(' ', '_'))
+        self._execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {unique_name} ON {self._table} ({_quote(self.key)})")
+        rows_before = self._execute(f"SELECT COUNT(*) FROM {self._table}")[0]
+        changes = self._execute(merge_statement(self._table, self._staging, self._columns, self.key,
+                                                dialect='postgresql'))
+        self.inserted = self._execute(f"SELECT COUNT(*) FROM {self._table}")[0] - rows_before
+        self.updated = changes - self.inserted
+        self._execute(f"DROP TABLE {self._staging}")
+
+    def _create_indexes(self) -> None:
+        for columns in self.index_columns(self._columns):
+            missing = [col for col in columns if col not in self._columns]
+            if missing:
+                print(f"     Индекс {list(columns)} пропущен: нет колонок {missing}")
+                continue
+            self._execute(f"CREATE INDEX IF NOT EXISTS {_quote(index_name(self.table_name, columns))} "
+                          f"ON {self._table} ({', '.join(_quote(col) for col in columns)})")
+
+    def finish(self) -> int:
+        started = time.perf_counter()
+        if self._columns is None:
+            self._conn.close()
+            return 0
+        try:
+            if self.mode == 'upsert':
+                key = _quote(self.key)
+                # COPY дописывает строки по порядку: из повторов ключа остается последняя, как в SQLite
+                self._execute(f"DELETE FROM {self._staging} AS earlier USING {self._staging} AS later "
+                              f"WHERE earlier.{key} = later.{key} AND earlier.ctid < later.ctid")
+                self._execute(f"ALTER TABLE {self._staging} ADD PRIMARY KEY ({key})")
+                self._merge()
+            else:
+                self._execute(f"DROP TABLE IF EXISTS {self._table}")
+                self._execute(f"ALTER TABLE {self._staging} RENAME TO {_quote(self.table_name)}")
+            self._execute(f"DROP TABLE IF EXISTS {self._checkpoint}")
+            self._create_indexes()
+            if self.mode == 'replace' and self.key in self._columns:
+                key = _quote(self.key)
+                self.repeated_keys = self._execute(f"SELECT COUNT(*) - COUNT(DISTINCT {key}) FROM {self._table}")[0]
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        # Статистика распределения значений для планировщика запросов
+        self._execute(f"ANALYZE {self._table}")
+        row_count = self._execute(f"SELECT COUNT(*) FROM {self._table}")[0]
+        self._conn.commit()
+        self._conn.close()
+        self.seconds += time.perf_counter() - started
+        return row_count
+
+    def close(self, keep: bool = False) -> None:
+        try:
+            self._conn.rollback()
+            if not keep:
+                self._execute(f"DROP TABLE IF EXISTS {self._staging}")
+                self._execute(f"DROP TABLE IF EXISTS {self._checkpoint}")
+                self._conn.commit()
+        finally:
+            self._conn.close()
@@ -0,0 +1,215 @@
+import glob
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+# Хеш строки - два независимых 64-битных хеша, вероятность коллизии ~2**-128
+HASH_DTYPE = np.dtype([('high', '<u8'), ('low', '<u8')])
+
+_SECOND_HASH_KEY = 'etl-row-dedup-02'
+
+# Сколько файлов сброса на партицию допускается до их слияния
+_MAX_SPILL_FILES = 8
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Vectorized 128-bit hash of every row
+
+    Categorical and plain string columns with the same values get the same
+    hash, so batches with different dtypes of a column are comparable.
+
+    Returns:
+        np.ndarray: Array of HASH_DTYPE, one element per row
+    """
+    hashes = np.empty(len(df), dtype=HASH_DTYPE)
+    hashes['high'] = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    hashes['low'] = pd.util.hash_pandas_object(df, index=False, hash_key=_SECOND_HASH_KEY).to_numpy()
+    return hashes
+
+def _first_occurrences(hashes: np.ndarray) -> np.ndarray:
+    """Mask of rows whose hash did not occur earlier in the same array"""
+    _, first_index = np.unique(hashes, return_index=True)
+    mask = np.zeros(len(hashes), dtype=bool)
+    mask[first_index] = True
+    return mask
+
+def count_duplicates(df: pd.DataFrame) -> int:
+    """Number of rows that repeat an earlier row (same result as df.duplicated().sum())"""
+    if df.empty:
+        return 0
+    return int(len(df) - np.count_nonzero(_first_occurrences(row_hashes(df))))
+
+class RowDeduplicator:
+    """
+    Exact duplicate removal across batches with a bounded memory budget
+
+    Row hashes of every kept row are stored in hash partitions. While they
+    fit into memory_budget_mb, partitions are kept in memory; beyond that
+    they are spilled to .npy files in spill_dir, and a batch is checked
+    against one partition at a time, so memory stays bounded by the budget
+    plus one partition.
+
+    With state_dir the hashes are loaded at start and saved by close(), so
+    rows loaded by earlier runs are removed as duplicates too. Use it only
+    with sinks that keep earlier rows (append/upsert).
+
+    With track_added the hashes kept since the last take_added() call are
+    also collected, so a run checkpoint can store them batch by batch and a
+    resumed run restores them with add_hashes().
+    """
+
+    def __init__(self, memory_budget_mb: int = 256, spill_dir: Optional[str] = None,
+                 state_dir: Optional[str] = None, partitions: int = 64, track_added: bool = False):
+        self.partitions = partitions
+        self.max_memory_hashes = max(1, memory_budget_mb * 1024 * 1024 // HASH_DTYPE.itemsize)
+        self.state_dir = state_dir
+        self.removed = 0
+        self.rows_seen = 0
+        self.spilled = False
+
+        self._own_spill_dir = spill_dir is None
+        self._spill_dir = spill_dir or tempfile.mkdtemp(prefix='etl_dedup_')
+        os.makedirs(self._spill_dir, exist_ok=True)
+        self._memory: Dict[int, List[np.ndarray]] = {}
+        self._memory_hashes = 0
+        self._spill_files: Dict[int, List[str]] = {}
+        self._spill_count = 0
+        self._added: Optional[List[np.ndarray]] = [] if track_added else None
+
+        if state_dir:
+            # Хеши прошлых запусков читаются с диска по партициям, по мере надобности
+            for path in sorted(glob.glob(os.path.join(state_dir, 'part-*.npy'))):
+                partition = int(os.path.basename(path)[5:-4])
+                if partition < partitions:
+                    self._spill_files.setdefault(partition, []).append(path)
+
+    def drop_duplicates(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Remove rows seen earlier in this frame, in earlier frames or in earlier runs
+
+        Args:
+            df: Next batch (all batches must have the same columns)
+
+        Returns:
+            pd.DataFrame: Rows that were not seen before, in their original order
+        """
+        if df.empty:
+            return df
+        hashes = row_hashes(df)
+        keep = _first_occurrences(hashes)
+        self.rows_seen += len(df)
+
+        candidates = np.flatnonzero(keep)
+        partition_ids = hashes['high'][candidates] % self.partitions
+        order = np.argsort(partition_ids, kind='stable')
+        boundaries = np.flatnonzero(np.diff(partition_ids[order])) + 1
+        for group in np.split(order, boundaries):
+            if not group.size:
+                continue
+            rows = candidates[group]
+            partition = int(partition_ids[group[0]])
+            seen = self._partition_hashes(partition)
+            if seen.size:
+                repeated = np.isin(hashes[rows], seen)
+                keep[rows[repeated]] = False
+                rows = rows[~repeated]
+            if rows.size:
+                self._remember(partition, hashes[rows])
+
+        if self._memory_hashes > self.max_memory_hashes:
+            self._spill()
+
+        removed = len(df) - int(np.count_nonzero(keep))
+        self.removed += removed
+        return df[keep] if removed else df
+
+    def take_added(self) -> np.ndarray:
+        """Hashes kept since the previous call (requires track_added)"""
+        if self._added is None:
+            raise ValueError("Дедупликатор создан без track_added")
+        added = np.concatenate(self._added) if self._added else np.empty(0, dtype=HASH_DTYPE)
+        self._added = []
+        return added
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Mark rows as seen by their hashes (e.g. batches of an interrupted run)"""
+        if not hashes.size:
+            return
+        partition_ids = hashes['high'] % self.partitions
+        for partition in np.unique(partition_ids):
+            # Восстановленные хеши уже сохранены в контрольной точке - в take_added они не попадают
+            self._remember(int(partition), hashes[partition_ids == partition], track=False)
+        if self._memory_hashes > self.max_memory_hashes:
+            self._spill()
+
+    def _remember(self, partition: int, hashes: np.ndarray, track: bool = True) -> None:
+        self._memory.setdefault(partition, []).append(hashes)
+        self._memory_hashes += hashes.size
+        if track and self._added is not None:
+            self._added.append(hashes)
+
+    def close(self, save: bool = True) -> None:
+        """
+        Save the state (if state_dir is set) and remove spill files
+
+        Args:
+            save: Write the hashes to state_dir (False when the run failed)
+        """
+        if save and self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+            touched = set(self._memory) | set(self._spill_files)
+            for partition in touched:
+                hashes = self._partition_hashes(partition)
+                path = os.path.join(self.state_dir, f'part-{partition:04d}.npy')
+                tmp_path = os.path.join(self.state_dir, f'.tmp-{partition:04d}.npy')
+                np.save(tmp_path, hashes)
+                os.replace(tmp_path, path)
+        if self._own_spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+        else:
+            for paths in self._spill_files.values():
+                for path in paths:
+                    if os.path.dirname(path) == self._spill_dir and os.path.exists(path):
+                        os.remove(path)
+        self._memory = {}
+        self._spill_files = {}
+
+    def _partition_hashes(self, partition: int) -> np.ndarray:
+        chunks = list(self._memory.get(partition, []))
+        for path in self._spill_files.get(partition, []):
+            chunks.append(np.load(path, mmap_mode='r'))
+        if not chunks:
+            return np.empty(0, dtype=HASH_DTYPE)
+        if len(chunks) == 1:
+            return chunks[0]
+        merged = np.concatenate(chunks)
+        if partition in self._memory:
+            # Склеиваем куски в памяти, чтобы не повторять concatenate на каждом батче
+            memory_chunks = self._memory[partition]
+            if len(memory_chunks) > 1:
+                self._memory[partition] = [np.concatenate(memory_chunks)]
+        return merged
+
+    def _spill(self) -> None:
+        """Move all in-memory partitions to disk"""
+        if not self.spilled:
+            print(f" Дедупликация: превышен бюджет памяти, хеши сбрасываются на диск ({self._spill_dir})")
+            self.spilled = True
+        for partition, chunks in self._memory.items():
+            path = os.path.join(self._spill_dir, f'spill-{self._spill_count:06d}-{partition:04d}.npy')
+            own_files = [file for file in self._spill_files.get(partition, [])
+                         if os.path.dirname(file) == self._spill_dir]
+            if len(own_files) >= _MAX_SPILL_FILES:
+                # Сливаем накопившиеся файлы партиции в один, чтобы проверка читала мало файлов
+                chunks = [np.load(file) for file in own_files] + chunks
+                for file in own_files:
+                    os.remove(file)
+                    self._spill_files[partition].remove(file)
+            np.save(path, np.concatenate(chunks))
+            self._spill_files.setdefault(partition, []).append(path)
+            self._spill_count += 1
+        self._memory = {}
+        self._memory_hashes = 0
@@ -0,0 +1,236 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from stage_cache import code_version
+
+try:
+    import resource
+except ImportError:
+    # Windows: пиковый RSS не измеряется
+    resource = None
+
+# Порядок этапов в отчете (этапы потока заходят друг в друга в обратном порядке)
+STAGE_ORDER = ('extract', 'medians', 'transform', 'checkpoint', 'load')
+
+# Сколько функций cProfile и мест выделения памяти tracemalloc печатается в отчете
+PROFILE_TOP = 15
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of the process so far, MB (None where getrusage is missing)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def frame_bytes(df) -> int:
+    """In-memory size of a DataFrame or Arrow table (object columns counted by reference)"""
+    if isinstance(df, pd.DataFrame):
+        return int(df.memory_usage(index=False).sum())
+    return int(df.nbytes)
+
+def _new_stage() -> Dict[str, Any]:
+    return {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_rss_mb': None,
+            'rows_in': 0, 'rows_out': 0, 'bytes_read': 0, 'bytes_written': 0}
+
+class RunMetrics:
+    """
+    Wall time, CPU time, peak RSS, rows and bytes of every stage of a run
+
+    stage(name) times a block of the main thread. Stages nest: the time of a
+    stage entered inside another one (e.g. extract, pulled through a
+    generator by transform, pulled by load) is subtracted from the outer
+    stage, so in the streaming mode every stage gets only its own share of
+    the interleaved work. metered() times a generator stage batch by batch
+    and consumed() counts what the next stage takes from it.
+
+    CPU time is the process CPU time (time.process_time): thread pools of
+    a stage are included, as is whatever other threads (e.g. load sinks)
+    do meanwhile. Peak RSS is the high-water mark of the process when a
+    stage is left. Bytes are what a stage reads and writes: files at the
+    edges of the pipeline (input files, raw snapshot, Parquet and SQLite
+    outputs), in-memory frames in between.
+
+    Sub-steps (transform plan steps, load sinks) are added with add_steps().
+    With cprofile_path or tracemalloc_path the run is also profiled by
+    cProfile (pstats file) or tracemalloc (snapshot file) between start()
+    and finish().
+    """
+
+    def __init__(self, cprofile_path: Optional[str] = None, tracemalloc_path: Optional[str] = None):
+        self.cprofile_path = cprofile_path
+        self.tracemalloc_path = tracemalloc_path
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.steps: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.context: Dict[str, Any] = {}
+        self.status = 'running'
+        self.error: Optional[str] = None
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.tracemalloc_peak_mb: Optional[float] = None
+        self._started = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self._local = threading.local()
+        self._profiler: Optional[cProfile.Profile] = None
+        self._top_functions = ''
+        self._top_allocations: List[str] = []
+
+    def start(self) -> None:
+        """Start the clock and the optional profilers"""
+        self._started = time.perf_counter()
+        self._started_cpu = time.process_time()
+        if self.tracemalloc_path:
+            tracemalloc.start()
+        if self.cprofile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Stop the clock and the profilers, dump the profiles"""
+        if self._profiler is not None:
+            self._profiler.disable()
+            _make_parent(self.cprofile_path)
+            self._profiler.dump_stats(self.cprofile_path)
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            self._top_functions = out.getvalue()
+            self._profiler = None
+        if self.tracemalloc_path and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            self.tracemalloc_peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+            _make_parent(self.tracemalloc_path)
+            snapshot.dump(self.tracemalloc_path)
+            self._top_allocations = [str(stat) for stat in snapshot.statistics('lineno')[:PROFILE_TOP]]
+        self.wall_seconds = time.perf_counter() - self._started
+        self.cpu_seconds = time.process_time() - self._started_cpu
+        self.status = 'ok' if error is None else 'failed'
+        self.error = None if error is None else str(error)
+
+    def _stack(self) -> List[List[float]]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def stats(self, name: str) -> Dict[str, Any]:
+        """Counters of a stage (created on first use)"""
+        return self.stages.setdefault(name, _new_stage())
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as the stage name, without the time of stages nested in it"""
+        stats = self.stats(name)
+        stack = self._stack()
+        # Время вложенных этапов: [wall, cpu]
+        stack.append([0.0, 0.0])
+        started = time.perf_counter()
+        started_cpu = time.process_time()
+        try:
+            yield stats
+        finally:
+            wall = time.perf_counter() - started
+            cpu = time.process_time() - started_cpu
+            nested_wall, nested_cpu = stack.pop()
+            stats['wall_seconds'] += wall - nested_wall
+            stats['cpu_seconds'] += cpu - nested_cpu
+            if stack:
+                stack[-1][0] += wall
+                stack[-1][1] += cpu
+            peak = peak_rss_mb()
+            if peak is not None:
+                stats['peak_rss_mb'] = max(stats['peak_rss_mb'] or 0.0, peak)
+
+    def metered(self, batches: Iterable, name: str) -> Iterator:
+        """Pass a stream of batches through, timing the production of every batch as the stage name"""
+        iterator = iter(batches)
+        while True:
+            with self.stage(name) as stats:
+                batch = next(iterator, None)
+            if batch is None:
+                return
+            stats['rows_out'] += len(batch)
+            stats['bytes_written'] += frame_bytes(batch)
+            yield batch
+
+    def consumed(self, batches: Iterable, name: str) -> Iterator:
+        """Pass a stream of batches through, counting them as the input of the stage name"""
+        stats = self.stats(name)
+        for batch in batches:
+            stats['rows_in'] += len(batch)
+            stats['bytes_read'] += frame_bytes(batch)
+            yield batch
+
+    def add_steps(self, stage: str, steps: Dict[str, Dict[str, Any]]) -> None:
+        """Sub-steps of a stage, e.g. TransformPlan.stats"""
+        self.steps.setdefault(stage, {}).update({name: dict(stats) for name, stats in steps.items()})
+
+    def to_dict(self) -> Dict[str, Any]:
+        stages = {}
+        order = lambda name: STAGE_ORDER.index(name) if name in STAGE_ORDER else len(STAGE_ORDER)
+        for name, stats in sorted(self.stages.items(), key=lambda item: order(item[0])):
+            rows = max(stats['rows_in'], stats['rows_out'])
+            stages[name] = dict(stats, rows_per_second=rows / stats['wall_seconds'] if stats['wall_seconds'] else None)
+        return {
+            'started_at': self.started_at,
+            'status': self.status,
+            'error': self.error,
+            'code_version': code_version(),
+            'context': self.context,
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'peak_rss_mb': peak_rss_mb(),
+            'tracemalloc_peak_mb': self.tracemalloc_peak_mb,
+            'stages': stages,
+            'steps': self.steps,
+        }
+
+    def save(self, path: str) -> None:
+        """Write the metrics as JSON"""
+        _make_parent(path)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+
+    def report(self) -> str:
+        """Text table of the stages and sub-steps"""
+        lines = [f" Профиль запуска: {self.wall_seconds:.2f} с, CPU {self.cpu_seconds:.2f} с"
+                 + (f", пиковый RSS {peak_rss_mb():.0f} MB" if peak_rss_mb() is not None else '')]
+        lines.append(f"   {'этап':<22}{'с':>9}{'CPU, с':>9}{'RSS, MB':>9}{'строк вх.':>12}{'строк вых.':>12}"
+                     f"{'MB чтен.':>10}{'MB зап.':>10}{'строк/с':>12}")
+        for name, stats in self.to_dict()['stages'].items():
+            rss = f"{stats['peak_rss_mb']:9.0f}" if stats['peak_rss_mb'] is not None else f"{'-':>9}"
+            rate = f"{stats['rows_per_second']:12,.0f}" if stats['rows_per_second'] else f"{'-':>12}"
+            lines.append(f"   {name:<22}{stats['wall_seconds']:9.2f}{stats['cpu_seconds']:9.2f}{rss}"
+                         f"{stats['rows_in']:12}{stats['rows_out']:12}"
+                         f"{stats['bytes_read'] / 1024 / 1024:10.1f}{stats['bytes_written'] / 1024 / 1024:10.1f}{rate}")
+        for stage, steps in self.steps.items():
+            lines.append(f"   Шаги {stage}:")
+            for name, stats in steps.items():
+                details = ', '.join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}"
+                                    for key, value in stats.items())
+                lines.append(f"     {name:<22}{details}")
+        if self.tracemalloc_peak_mb is not None:
+            lines.append(f"   Пик памяти Python (tracemalloc): {self.tracemalloc_peak_mb:.1f} MB; "
+                         f"снимок: {self.tracemalloc_path}")
+            lines.extend(f"     {line}" for line in self._top_allocations)
+        if self._top_functions:
+            lines.append(f"   cProfile: {self.cprofile_path} (python -m pstats {self.cprofile_path})")
+            lines.extend(f"     {line}" for line in self._top_functions.strip().splitlines())
+        return "\n".join(lines)
+
+def _make_parent(path: str) -> None:
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
@@ -0,0 +1,256 @@
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from bulk_loader import BulkLoader
+from upsert import UPSERT_KEY, merge_statement, quote_identifier as _quote
+
+# Режимы записи в SQLite: образец из 100 строк (как раньше), вся таблица
+# с заменой или дозагрузка с обновлением строк по Patient Id
+DB_MODES = ('sample', 'full', 'upsert')
+
+# Вторичные индексы под частые запросы аналитиков; составной индекс - кортеж колонок.
+# Составной индекс обслуживает и фильтр по одной Institute Name, и группировку по ней.
+# Индекс по колонке с парой значений (Status) медленнее полного прохода - его нет.
+# Создаются после загрузки данных - так индекс строится один раз, без перестройки на каждой вставке
+DEFAULT_INDEXES = (('Institute Name', 'Gender'),)
+
+def parse_index(text: str) -> Tuple[str, ...]:
+    """Index spec from the CLI: 'Institute Name' or a composite 'Institute Name,Gender'"""
+    columns = tuple(col.strip() for col in text.split(',') if col.strip())
+    if not columns:
+        raise ValueError(f"Пустое описание индекса: '{text}'")
+    return columns
+
+def sqlite_type(values: pd.Series) -> str:
+    """
+    Declared SQLite type of a transformed column
+
+    Decided by the dtype only, as postgres_type: the values of the first
+    frame say nothing about later batches, so a float column is REAL even
+    if the first frame holds only whole numbers.
+    """
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+def table_ddl(name: str, columns: Sequence[str], types: Sequence[str], key: Optional[str] = None) -> str:
+    """
+    CREATE TABLE with declared column types
+
+    With a key column the table is WITHOUT ROWID and clustered by the key:
+    rows are stored in the primary key B-tree, so a lookup by key reads
+    one tree and no separate key index is needed.
+    """
+    definitions = [f"{_quote(col)} {sql_type}" + (' NOT NULL' if col == key else '')
+                   for col, sql_type in zip(columns, types)]
+    if key is None:
+        return f"CREATE TABLE {_quote(name)} ({', '.join(definitions)})"
+    definitions.append(f"PRIMARY KEY ({_quote(key)})")
+    return f"CREATE TABLE {_quote(name)} ({', '.join(definitions)}) WITHOUT ROWID"
+
+def index_name(table_name: str, columns: Sequence[str]) -> str:
+    return f"idx_{table_name}_" + '__'.join(col.replace(' ', '_') for col in columns)
+
+def _column_values(values: pd.Series) -> list:
+    """Python values of a column for executemany (SQLite itself stores NaN as NULL)"""
+    if values.dtype.name == 'category':
+        # Категории декодируются по кодам: каждая строка категории создается один раз
+        categories = np.append(values.cat.categories.astype(str).to_numpy(dtype=object), None)
+        # Код -1 (пропуск) указывает на последний элемент - None
+        return categories[values.cat.codes.to_numpy()].tolist()
+    return values.tolist()
+
+def dataframe_rows(df: pd.DataFrame) -> Iterator[Tuple]:
+    """Row tuples of a DataFrame, built column-wise (much faster than itertuples)"""
+    return zip(*[_column_values(df[col]) for col in df.columns])
+
+class SQLiteBulkLoader(BulkLoader):
+    """
+    Bulk load of whole DataFrames (or a stream of batches) into one SQLite table
+
+    The SQLite implementation of BulkLoader.
+    The table schema is generated from the dtypes of the first frame
+    (INTEGER/REAL/TEXT, see sqlite_type). mode='replace' loads every row
+    into a rowid table and indexes the key column afterwards. mode='upsert'
+    stages into a WITHOUT ROWID table with the key as primary key, where a
+    row repeating a key replaces the earlier one (rows are sorted by key
+    inside a transaction, so the B-tree is filled in order). Rows go to a
+    staging table, inserted with executemany in explicit transactions of
+    commit_rows rows. During the load the database runs in WAL mode with
+    synchronous=OFF and a large page cache. finish() publishes the staging
+    table in one transaction, so readers see either the old or the new
+    table, never a half-loaded one:
+
+    - mode='replace': the target is dropped and the staging table renamed to it
+    - mode='upsert': staging rows are merged with INSERT ... ON CONFLICT(key)
+      DO UPDATE; rows with a new key are added, existing rows are rewritten
+      only if some value changed, rows missing from the load are kept
+
+    Secondary indexes (single or composite) are created after the data is
+    in, then ANALYZE collects statistics for the query planner, and
+    synchronous is restored to NORMAL.
+
+    write(df, batch) commits the whole frame in one transaction together
+    with the batch number in a checkpoint table, so after a crash resume()
+    continues with the staging table of the interrupted run.
+    """
+
+    def __init__(self, db_path: str, table_name: str = 'medical_data', commit_rows: int = 100000,
+                 indexes: Sequence[Sequence[str]] = DEFAULT_INDEXES, cache_mb: int = 256,
+                 mode: str = 'replace', key: str = UPSERT_KEY):
+        super().__init__(table_name, mode=mode, key=key, indexes=indexes)
+        self.db_path = db_path
+        self.commit_rows = commit_rows
+        self.checkpoint_name = f"{table_name}__checkpoint"
+        self._columns: Optional[List[str]] = None
+        self._column_types: List[str] = []
+        self._primary_key: Optional[str] = None
+        self._insert_sql = None
+        self._conn = sqlite3.connect(db_path, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=OFF')
+        self._conn.execute(f'PRAGMA cache_size=-{cache_mb * 1024}')
+        self._conn.execute('PRAGMA temp_store=MEMORY')
+
+    def _table_ddl(self, name: str) -> str:
+        return table_ddl(name, self._columns, self._column_types, self._primary_key)
+
+    def _set_columns(self, columns: List[str], column_types: List[str]) -> None:
+        self._columns = columns
+        self._column_types = column_types
+        if self.mode == 'upsert' and self.key not in self._columns:
+            raise ValueError(f"Для дозагрузки нужна колонка {self.key}")
+        # Первичный ключ только для дозагрузки: там повтор ключа заменяет прежнюю строку,
+        # а full загружает все строки, в том числе с повторами ключа
+        self._primary_key = self.key if self.mode == 'upsert' else None
+        placeholders = ', '.join('?' for _ in self._columns)
+        verb = 'INSERT OR REPLACE' if self._primary_key else 'INSERT'
+        self._insert_sql = f'{verb} INTO {_quote(self.staging_name)} VALUES ({placeholders})'
+
+    def _create_staging(self, df: pd.DataFrame) -> None:
+        self._set_columns(list(df.columns), [sqlite_type(df[col]) for col in df.columns])
+        self._conn.execute('BEGIN')
+        self._conn.execute(f'DROP TABLE IF EXISTS {_quote(self.staging_name)}')
+        self._conn.execute(f'DROP TABLE IF EXISTS {_quote(self.checkpoint_name)}')
+        self._conn.execute(self._table_ddl(self.staging_name))
+        self._conn.execute(f'CREATE TABLE {_quote(self.checkpoint_name)} (batches INTEGER NOT NULL)')
+        self._conn.execute(f'INSERT INTO {_quote(self.checkpoint_name)} VALUES (0)')
+        self._conn.execute('COMMIT')
+
+    def resume(self) -> int:
+        checkpoint = _quote(self.checkpoint_name)
+        if not self._conn.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (self.checkpoint_name,)).fetchone():
+            return 0
+        staging_info = self._conn.execute(f'PRAGMA table_info({_quote(self.staging_name)})').fetchall()
+        if not staging_info:
+            return 0
+        self._set_columns([row[1] for row in staging_info], [row[2] for row in staging_info])
+        return self._conn.execute(f'SELECT batches FROM {checkpoint}').fetchone()[0]
+
+    def write(self, df: pd.DataFrame, batch: Optional[int] = None) -> None:
+        started = time.perf_counter()
+        if self._columns is None:
+            self._create_staging(df)
+        elif list(df.columns) != self._columns:
+            raise ValueError(f"Колонки батча не совпадают с таблицей {self.table_name}")
+        chunks = [df.iloc[start:start + self.commit_rows] for start in range(0, len(df), self.commit_rows)]
+        # С номером батча весь батч и отметка о нем - одна транзакция
+        transactions = [chunks] if batch is not None else [[chunk] for chunk in chunks]
+        for transaction in transactions:
+            self._conn.execute('BEGIN')
+            try:
+                for chunk in transaction:
+                    if self._primary_key:
+                        # Устойчивая сортировка: из повторов ключа по-прежнему остается последний
+                        chunk = chunk.sort_values(self._primary_key, kind='stable')
+                    self._conn.executemany(self._insert_sql, dataframe_rows(chunk))
+                if batch is not None:
+                    self._conn.execute(f'UPDATE {_quote(self.checkpoint_name)} SET batches = ?', (batch + 1,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self.rows += sum(len(chunk) for chunk in transaction)
+        self.seconds += time.perf_counter() - started
+
+    def _create_indexes(self) -> None:
+        table = _quote(self.table_name)
+        for columns in self.index_columns(self._columns):
+            missing = [col for col in columns if col not in self._columns]
+            if missing:
+                print(f"     Индекс {list(columns)} пропущен: нет колонок {missing}")
+                continue
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(index_name(self.table_name, columns))} "
+                               f"ON {table} ({', '.join(_quote(col) for col in columns)})")
+
+    def _target_info(self) -> List[tuple]:
+        return self._conn.execute(f'PRAGMA table_info({_quote(self.table_name)})').fetchall()
+
+    def _merge(self) -> None:
+        table = _quote(self.table_name)
+        target_info = self._target_info()
+        if not target_info:
+            self._conn.execute(self._table_ddl(self.table_name))
+            target_info = self._target_info()
+        target_columns = [row[1] for row in target_info]
+        if sorted(target_columns) != sorted(self._columns):
+            raise ValueError(f"Колонки таблицы {self.table_name} отличаются от загружаемых: "
+                             f"{sorted(set(target_columns) ^ set(self._columns))}")
+        if [row[1] for row in target_info if row[5]] != [self.key]:
+            # Таблица прежнего формата без первичного ключа - ON CONFLICT нужен уникальный индекс
+            unique_name = _quote(f"uq_{self.table_name}_{self.key}".replace(' ', '_'))
+            self._conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {unique_name} ON {table} ({_quote(self.key)})')
+        rows_before = self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        changes_before = self._conn.total_changes
+        self._conn.execute(merge_statement(table, _quote(self.staging_name), self._columns, self.key))
+        changes = self._conn.total_changes - changes_before
+        self.inserted = self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] - rows_before
+        self.updated = changes - self.inserted
+
+    def finish(self) -> int:
+        started = time.perf_counter()
+        table = _quote(self.table_name)
+        if self._columns is None:
+            self._conn.close()
+            return 0
+        # Замена или слияние - одна транзакция: читатели видят старую таблицу до COMMIT
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self.mode == 'upsert':
+                self._merge()
+                self._conn.execute(f'DROP TABLE {_quote(self.staging_name)}')
+            else:
+                self._conn.execute(f'DROP TABLE IF EXISTS {table}')
+                self._conn.execute(f'ALTER TABLE {_quote(self.staging_name)} RENAME TO {table}')
+            self._conn.execute(f'DROP TABLE IF EXISTS {_quote(self.checkpoint_name)}')
+            self._create_indexes()
+            if self.mode == 'replace' and self.key in self._columns:
+                key = _quote(self.key)
+                self.repeated_keys = self._conn.execute(
+                    f'SELECT COUNT(*) - COUNT(DISTINCT {key}) FROM {table}').fetchone()[0]
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        # Статистика распределения значений для планировщика запросов
+        self._conn.execute(f'ANALYZE {table}')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        row_count = self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        self._conn.close()
+        self.seconds += time.perf_counter() - started
+        return row_count
+
+    def close(self, keep: bool = False) -> None:
+        try:
+            if not keep:
+                self._conn.execute(f'DROP TABLE IF EXISTS {_quote(self.staging_name)}')
+                self._conn.execute(f'DROP TABLE IF EXISTS {_quote(self.checkpoint_name)}')
+        finally:
+            self._conn.close()
@@ -0,0 +1,158 @@
+import glob
+import hashlib
+import json
+import os
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+ETL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_DIGEST_KEY = b'etl_content_digest'
+
+
+def input_fingerprint(source_files: List[str], mode: str = 'stat') -> Optional[str]:
+    """
+    Fingerprint of local input files
+
+    Args:
+        source_files: Input files
+        mode: 'stat' - path, size and mtime (cheap); 'hash' - file contents
+
+    Returns:
+        str: Hex digest, or None when some input is not a local file (URL)
+    """
+    if not source_files or not all(os.path.isfile(path) for path in source_files):
+        return None
+
+    digest = hashlib.sha256()
+    for path in source_files:
+        stat = os.stat(path)
+        if mode == 'hash':
+            digest.update(f"{os.path.basename(path)}:{stat.st_size}".encode())
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        else:
+            digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def code_version() -> str:
+    """Hash of the ETL sources: any change of the pipeline code invalidates the cache"""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(ETL_DIR, '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def content_digest(df: pd.DataFrame) -> str:
+    """Vectorized hash of a DataFrame's columns, dtypes and rows"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Content-addressed cache of pipeline stage outputs
+
+    Every entry is an uncompressed Arrow IPC file, read back through a memory
+    map. A hit refreshes the entry's mtime; when the cache grows over
+    max_bytes the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir: str = 'data/cache', max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.evict()
+
+    @staticmethod
+    def make_key(stage: str, *parts) -> str:
+        """Build an entry key from the stage name and everything its output depends on"""
+        payload = json.dumps([stage, code_version(), [str(part) for part in parts]])
+        return f"{stage}-{hashlib.sha256(payload.encode()).hexdigest()[:24]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.arrow")
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, str]]:
+        """
+        Read a cached stage output
+
+        Returns:
+            tuple: (DataFrame, content digest), or None on a miss
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with pa.memory_map(path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+            df = table.to_pandas()
+        except (OSError, pa.ArrowInvalid):
+            # Поврежденная запись - считаем промахом
+            os.remove(path)
+            return None
+        # Отмечаем использование для LRU
+        os.utime(path)
+        digest = (table.schema.metadata or {}).get(_DIGEST_KEY, b'').decode()
+        return df, digest
+
+    def put(self, key: str, df: pd.DataFrame, digest: str) -> None:
+        """Store a stage output and evict old entries if the cache is too large"""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_DIGEST_KEY] = digest.encode()
+        table = table.replace_schema_metadata(metadata)
+
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        # Без сжатия, чтобы файл можно было читать через memory map
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, '*.arrow')):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            print(f" Кэш: удалена старая запись {os.path.basename(path)}")
+
+    def get_or_compute(self, stage: str, key: str,
+                       compute: Callable[[], pd.DataFrame]) -> Tuple[pd.DataFrame, str]:
+        """
+        Return the cached output of a stage, or compute and store it
+
+        Returns:
+            tuple: (DataFrame, content digest of the DataFrame)
+        """
+        cached = self.get(key)
+        if cached is not None:
+            df, digest = cached
+            print(f" Кэш: этап {stage} пропущен, результат взят из кэша ({df.shape[0]} строк)")
+            return df, digest
+
+        df = compute()
+        digest = content_digest(df)
+        try:
+            self.put(key, df, digest)
+            print(f" Кэш: результат этапа {stage} сохранен")
+        except (OSError, pa.ArrowException) as e:
+            # Кэш - только ускорение, пайплайн продолжает работу без него
+            print(f" Кэш: не удалось сохранить результат этапа {stage} - {e}")
+        return df, digest
@@ -1,126 +1,127 @@
 import pandas as pd
 import numpy as np
+from typing import Dict, Iterable, Iterator, List, Optional
 
-def transform_data(raw_df: pd.DataFrame) -> pd.DataFrame:
+from arrow_backend import arrow_plan
+from row_dedup import RowDeduplicator
+from transform_plan import TransformPlan
+
+# Чем выполняется работа над колонками: pandas или ядра pyarrow.compute
+BACKENDS = ('pandas', 'arrow')
+
+def build_plan(keep_columns: Optional[List[str]] = None, category_columns: Optional[List[str]] = None,
+               medians: Optional[Dict[str, float]] = None,
+               deduplicator: Optional[RowDeduplicator] = None, workers: int = 1,
+               backend: str = 'pandas', quiet: bool = False) -> TransformPlan:
+    """Optimized transform plan for a backend ('pandas' or 'arrow'), both give the same output"""
+    if backend == 'arrow':
+        return arrow_plan(keep_columns=keep_columns, category_columns=category_columns,
+                          medians=medians, deduplicator=deduplicator, workers=workers, quiet=quiet)
+    if backend != 'pandas':
+        raise ValueError(f"Неизвестный backend трансформации: {backend}")
+    return TransformPlan.default(keep_columns=keep_columns, category_columns=category_columns,
+                                 medians=medians, deduplicator=deduplicator, workers=workers,
+                                 quiet=quiet).optimize()
+
+def transform_data(raw_df: pd.DataFrame, keep_columns: Optional[List[str]] = None,
+                   category_columns: Optional[List[str]] = None,
+                   medians: Optional[Dict[str, float]] = None,
+                   deduplicator: Optional[RowDeduplicator] = None,
+                   plan: Optional[TransformPlan] = None, explain: bool = False,
+                   workers: int = 1, backend: str = 'pandas', quiet: bool = False) -> pd.DataFrame:
     """
     Transform and clean the medical data
+    
+    The steps are described by a TransformPlan (see transform_plan) that is
+    optimized before execution. Null counts, distinct counts, ranges and
+    medians of all columns come from one profiling pass; imputation and the
+    decision which columns to drop are taken from that profile.
+    
+    Args:
+        raw_df: Raw DataFrame to transform (not modified)
+        keep_columns: Fixed set of output columns. When given, useless columns
+            are not detected on this frame, so every batch of a stream gets
+            the same schema.
+        category_columns: Non-numeric columns kept as pandas category (detected
+            by cardinality if None); other non-numeric columns become str
+        medians: Fill values for numeric columns computed over the whole
+            input (see quantile_sketch); medians of this frame if None
+        deduplicator: Shared RowDeduplicator that also removes rows seen in
+            earlier batches or runs; duplicates within this frame only if None
+        plan: Plan to execute (a new optimized plan with the options above if None)
+        explain: Print the plan and the cost of every step
+        workers: Threads for the per-column work; the result is the same as
+            with one worker
+        backend: 'pandas', or 'arrow' to run coercion, profiling, fills and
+            encoding with pyarrow.compute kernels (same result)
+        quiet: Do not print a line per column
+    
+    The number of removed duplicates is stored in df.attrs['duplicates_removed'],
+    so validation does not have to search for duplicates again.
     """
     print(" Начало трансформации данных...")
+    print(f" Исходный размер: {raw_df.shape[0]} строк, {raw_df.shape[1]} колонок")
     
-    df = raw_df.copy()
-    
-    print(f" Исходный размер: {df.shape[0]} строк, {df.shape[1]} колонок")
-    
-    # 1. Приведение типов данных - только для явно числовых колонок
-    print(" Приведение типов данных...")
-    
-    # Определяем какие колонки точно числовые по их названиям и содержимому
-    numeric_candidates = [
-        'Patient Age', 'Blood cell count (mcL)', "Mother's age", "Father's age",
-        'Test 1', 'Test 2', 'Test 3', 'Test 4', 'Test 5',
-        'No. of previous abortion', 'White Blood cell count (thousand per microliter)'
-    ]
-    
-    numeric_columns = []
-    for col in numeric_candidates:
-        if col in df.columns:
-            try:
-                # Пробуем преобразовать в числовой тип
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                # Проверяем что получились нормальные числа (не все NaN)
-                if not df[col].isnull().all():
-                    numeric_columns.append(col)
-                    print(f"    {col} -> числовой тип")
-                else:
-                    print(f"    {col} -> все значения NaN после преобразования")
-            except Exception as e:
-                print(f"    {col} -> ошибка преобразования: {e}")
-    
-    # 2. Обработка пропущенных значений
-    print(" Обработка пропущенных значений...")
-    
-    # Для числовых колонок заполняем медианой
-    for col in numeric_columns:
-        if df[col].isnull().sum() > 0:
-            median_val = df[col].median()
-            # Исправленный способ без inplace
-            df.loc[df[col].isnull(), col] = median_val
-            print(f"    {col}: заполнено {df[col].isnull().sum()} пропусков медианой {median_val:.1f}")
-    
-    # Для категориальных колонок - аккуратная обработка
-    categorical_columns = [col for col in df.columns if col not in numeric_columns]
-    
-    # Обрабатываем только первые 10 категориальных колонок чтобы не перегружать
-    for col in categorical_columns[:10]:
-        if df[col].isnull().sum() > 0:
-            try:
-                # Для категориальных данных используем моду
-                if df[col].dtype.name == 'category':
-                    # Для категориальных типов добавляем новую категорию
-                    if 'Unknown' not in df[col].cat.categories:
-                        df[col] = df[col].cat.add_categories(['Unknown'])
-                    df.loc[df[col].isnull(), col] = 'Unknown'
-                else:
-                    # Для обычных строковых данных - убедимся что тип object
-                    df[col] = df[col].astype(str)
-                    df.loc[df[col].isnull(), col] = 'Unknown'
-                    df.loc[df[col] == 'nan', col] = 'Unknown'  # Обрабатываем строки 'nan'
-                print(f"   🔧 {col}: заполнено пропусков значением 'Unknown'")
-            except Exception as e:
-                print(f"     {col}: не удалось заполнить пропуски - {e}")
-    
-    # 3. Обработка дубликатов
-    print("🔍 Поиск дубликатов...")
-    duplicates = df.duplicated().sum()
-    if duplicates > 0:
-        df = df.drop_duplicates()
-        print(f"     Удалено дубликатов: {duplicates}")
-    else:
-        print("    Дубликатов не найдено")
-    
-    # 4. Удаляем колонки где все значения одинаковые или бесполезные
-    print(" Очистка бесполезных колонок...")
-    columns_to_drop = []
-    for col in df.columns:
-        # Колонки где все значения одинаковые
-        if df[col].nunique() <= 1:
-            columns_to_drop.append(col)
-            print(f"     Удалена колонка {col} (все значения одинаковые)")
-        # Колонки где слишком много пропусков (>90%)
-        elif df[col].isnull().sum() / len(df) > 0.9:
-            columns_to_drop.append(col)
-            print(f"     Удалена колонка {col} (>90% пропусков)")
-    
-    if columns_to_drop:
-        df = df.drop(columns=columns_to_drop)
-    
-    # 5. Преобразуем все оставшиеся нечисловые колонки в строки для совместимости с SQLite
-    print("🔧 Приведение типов для SQLite...")
-    for col in df.columns:
-        if col not in numeric_columns:
-            try:
-                df[col] = df[col].astype(str)
-                # Заменяем 'nan' строки на 'Unknown'
-                df.loc[df[col] == 'nan', col] = 'Unknown'
-                print(f"    {col} -> строковый тип")
-            except Exception as e:
-                print(f"     {col}: не удалось преобразовать в строку - {e}")
-    
-    # 6. Базовая статистика после трансформации
-    print(" Статистика после трансформации:")
-    print(f"   • Размер данных: {df.shape[0]} строк, {df.shape[1]} колонок")
-    print(f"   • Числовые колонки: {len(numeric_columns)}")
-    print(f"   • Строковые колонки: {len(df.columns) - len(numeric_columns)}")
-    
-    if numeric_columns:
-        print(f"   • Примеры числовых колонок:")
-        for col in numeric_columns[:3]:
-            if col in df.columns:
-                print(f"     {col}: {df[col].min():.1f} - {df[col].max():.1f}")
+    if plan is None:
+        plan = build_plan(keep_columns=keep_columns, category_columns=category_columns,
+                          medians=medians, deduplicator=deduplicator, workers=workers, backend=backend,
+                          quiet=quiet)
+    df = plan.execute(raw_df)
     
     print(" Трансформация данных завершена")
+    if explain:
+        print(plan.explain())
     return df
 
+def transform_batches(raw_batches: Iterable[pd.DataFrame],
+                      medians: Optional[Dict[str, float]] = None,
+                      deduplicator: Optional[RowDeduplicator] = None,
+                      explain: bool = False, workers: int = 1,
+                      plan: Optional[TransformPlan] = None,
+                      backend: str = 'pandas', quiet: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Transform a stream of raw batches one by one
+    
+    The first batch decides which columns are kept and which of them are
+    categorical, the following batches are aligned to it. Duplicates are
+    removed across all batches; row hashes spill to disk over the memory
+    budget of the deduplicator. Missing numbers are filled with the given medians
+    of the whole input, or with medians of the batch if none are given.
+    
+    Args:
+        raw_batches: Iterable of raw DataFrames
+        medians: Medians of numeric columns over the whole input
+        deduplicator: Shared RowDeduplicator, e.g. with the state of earlier
+            runs (the caller closes it); a new in-memory one if None
+        explain: Print the plan with the cost of every step summed over all batches
+        workers: Threads for the per-column work of every batch
+        plan: Plan to execute for every batch, e.g. TransformPlan.from_state
+            (medians, deduplicator, workers and quiet are taken from it)
+        backend: 'pandas' or 'arrow' (see transform_data)
+        quiet: Do not print a line per column
+        
+    Yields:
+        pd.DataFrame: Transformed batch
+    """
+    local_deduplicator = plan is None and deduplicator is None
+    if local_deduplicator:
+        deduplicator = RowDeduplicator()
+    if plan is None:
+        # Один план на весь поток: колонки, выбранные на первом батче, сохраняются в нем
+        plan = build_plan(medians=medians, deduplicator=deduplicator, workers=workers, backend=backend,
+                          quiet=quiet)
+    try:
+        for batch_number, raw_df in enumerate(raw_batches, start=1):
+            print(f" Батч {batch_number}: {len(raw_df)} строк")
+            yield transform_data(raw_df, plan=plan)
+    finally:
+        if local_deduplicator:
+            deduplicator.close()
+    if explain:
+        print(plan.explain())
+    dedup_stats = plan.stats['dedup']
+    print(f" Дубликатов удалено по всем батчам: {dedup_stats['rows_in'] - dedup_stats['rows_out']}")
+
 if __name__ == "__main__":
     # Тестирование модуля
     import sys
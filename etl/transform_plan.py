@@ -0,0 +1,531 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from column_profile import profile_columns
+from column_schema import DICTIONARY_MAX_RATIO, NUMERIC_COLUMNS
+from row_dedup import RowDeduplicator
+
+# Состояние одного выполнения плана: профиль, списки колонок, счетчики
+PlanState = Dict[str, Any]
+
+class Step(NamedTuple):
+    """One step of a transform plan"""
+    name: str
+    description: str
+    run: Callable[[pd.DataFrame, PlanState, Dict[str, Any]], pd.DataFrame]
+    fused: Tuple[str, ...] = ()
+
+def _string_category(values: pd.Series) -> pd.Series:
+    """Categorical column whose categories are strings, without converting every value"""
+    if values.dtype.name != 'category':
+        values = values.astype('category')
+    categories = values.cat.categories
+    if categories.dtype != object or not all(isinstance(value, str) for value in categories):
+        string_categories = categories.astype(str)
+        if string_categories.is_unique:
+            # Переименовываются только категории, коды значений не меняются
+            values = values.cat.rename_categories(string_categories)
+        else:
+            # Пропуски остаются пропусками, а не строкой 'nan'
+            values = values.astype(str).where(values.notna()).astype('category')
+    return values
+
+def _string_values(values: pd.Series) -> pd.Series:
+    """
+    Non-numeric column with string values and nulls kept, ready for fillna('Unknown')
+
+    Categories are renamed to strings (see _string_category); other non-string
+    dtypes, e.g. nullable Int64 from Parquet, become object strings: 1 -> '1'.
+    """
+    if values.dtype.name == 'category':
+        return _string_category(values)
+    if values.dtype == object:
+        return values
+    return values.astype(str).where(values.notna())
+
+def _map_columns(func: Callable[[str], Any], columns: List[str], config: Dict[str, Any]) -> List[Any]:
+    """
+    Apply a per-column function, in a thread pool when config['workers'] > 1
+    
+    Results come back in column order, so the parallel path produces exactly
+    the same frame and log as the serial one. Threads share the DataFrame's
+    buffers, so no column is copied or pickled.
+    """
+    workers = config.get('workers') or 1
+    if workers <= 1 or len(columns) <= 1:
+        return [func(col) for col in columns]
+    with ThreadPoolExecutor(max_workers=min(workers, len(columns))) as executor:
+        return list(executor.map(func, columns))
+
+def _as_float(values: pd.Series) -> pd.Series:
+    """
+    Numeric candidate column as float64, as it is read from CSV
+
+    Int64/int/bool input (e.g. Parquet written by pandas) is cast too: the
+    median fill may be fractional, and the dtype must not depend on whether
+    a batch happened to have nulls.
+    """
+    if pd.api.types.is_numeric_dtype(values) and values.dtype != 'float64':
+        return values.astype('float64')
+    return values
+
+def _column_log(config: Dict[str, Any], message: str) -> None:
+    """Per-column log line, skipped with config['quiet'] (on wide tables the lines add up)"""
+    if not config.get('quiet'):
+        print(message)
+
+# --- шаги плана ---
+
+def _copy_input(df, state, config):
+    return df.copy()
+
+def _coerce_numeric(df, state, config):
+    print(" Приведение типов данных...")
+    state['numeric_candidates'] = [col for col in NUMERIC_COLUMNS if col in df.columns]
+    for col in state['numeric_candidates']:
+        # Колонки из Arrow CSV и Parquet обычно уже числовые
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            try:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+            except Exception as e:
+                print(f"    {col} -> ошибка преобразования: {e}")
+        df[col] = _as_float(df[col])
+    return df
+
+def _choose_numeric(columns, numeric_dtype_columns, rows, state, config):
+    """Numeric columns: candidates that are numeric and not entirely NaN"""
+    profile = state['profile']
+    keep_columns = config.get('keep_columns')
+    numeric_columns = []
+    for col in state['numeric_candidates']:
+        if col not in numeric_dtype_columns:
+            continue
+        # Проверяем что получились нормальные числа (не все NaN).
+        # В потоковом режиме колонка остается числовой, как в первом батче
+        keep_numeric = keep_columns is not None and col in keep_columns
+        if keep_numeric or profile.at[col, 'null_count'] < rows:
+            numeric_columns.append(col)
+            _column_log(config, f"    {col} -> числовой тип")
+        else:
+            _column_log(config, f"    {col} -> все значения NaN после преобразования")
+    state['numeric_columns'] = numeric_columns
+    state['categorical_columns'] = [col for col in columns if col not in numeric_columns]
+
+def _select_numeric(df, state, config):
+    numeric_dtype_columns = [col for col in state['numeric_candidates']
+                             if pd.api.types.is_numeric_dtype(df[col])]
+    _choose_numeric(df.columns, numeric_dtype_columns, len(df), state, config)
+
+def _profile(df, state, config):
+    print(" Профилирование колонок...")
+    numeric_profile = state.get('numeric_profile')
+    if numeric_profile is None:
+        state['profile'] = profile_columns(df, state['numeric_candidates'], workers=config.get('workers') or 1)
+    else:
+        # Числовые колонки уже профилированы при слитом приведении типов
+        other_columns = [col for col in df.columns if col not in numeric_profile.index]
+        other_profile = profile_columns(df[other_columns], [], workers=config.get('workers') or 1)
+        state['profile'] = pd.concat([numeric_profile, other_profile]).loc[df.columns]
+    _select_numeric(df, state, config)
+    return df
+
+def _fill_value(col, state, config):
+    medians = config.get('medians')
+    if medians is not None and col in medians:
+        return medians[col]
+    return state['profile'].at[col, 'median']
+
+def _record_medians(state, config):
+    """Remember the fill value of every numeric column for the fitted state"""
+    fitted = config.setdefault('fitted_medians', {})
+    for col in state['numeric_columns']:
+        fitted[col] = float(_fill_value(col, state, config))
+
+def _fill_numeric(df, state, config):
+    # Для числовых колонок заполняем медианой - одним вызовом для всех колонок.
+    # В потоковом режиме медианы посчитаны заранее по всему входу
+    print(" Обработка пропущенных значений...")
+    _record_medians(state, config)
+    fill_values = {}
+    for col in state['numeric_columns']:
+        null_count = state['profile'].at[col, 'null_count']
+        if null_count > 0:
+            fill_values[col] = _fill_value(col, state, config)
+            _column_log(config, f"    {col}: заполнено {null_count} пропусков медианой {fill_values[col]:.1f}")
+    return df.fillna(fill_values) if fill_values else df
+
+def _coerce_fill_numeric(df, state, config):
+    """Fused coerce + profile + fill: every numeric column is materialized once"""
+    print(" Приведение типов данных и заполнение числовых пропусков...")
+    # Поверхностная копия: столбцы заменяются, входной DataFrame не меняется
+    df = df.copy(deep=False)
+    candidates = [col for col in NUMERIC_COLUMNS if col in df.columns]
+    state['numeric_candidates'] = candidates
+
+    def coerce(col):
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            try:
+                values = pd.to_numeric(values, errors='coerce')
+            except Exception as e:
+                print(f"    {col} -> ошибка преобразования: {e}")
+        return _as_float(values)
+
+    converted = dict(zip(candidates, _map_columns(coerce, candidates, config)))
+    numeric_frame = pd.DataFrame(converted, index=df.index)
+    numeric_profile = profile_columns(numeric_frame, [col for col in candidates
+                                                      if pd.api.types.is_numeric_dtype(numeric_frame[col])],
+                                      workers=config.get('workers') or 1)
+    state['numeric_profile'] = numeric_profile
+    state['profile'] = numeric_profile
+
+    # Решение о числовых колонках нужно до заполнения
+    for col in candidates:
+        df[col] = converted[col]
+    _select_numeric(df[candidates], state, config)
+    _record_medians(state, config)
+
+    fill_columns = [col for col in state['numeric_columns'] if numeric_profile.at[col, 'null_count'] > 0]
+    fill_values = {col: _fill_value(col, state, config) for col in fill_columns}
+    filled = _map_columns(lambda col: converted[col].fillna(fill_values[col]), fill_columns, config)
+    for col, values in zip(fill_columns, filled):
+        df[col] = values
+        _column_log(config, f"    {col}: заполнено {numeric_profile.at[col, 'null_count']} пропусков "
+                            f"медианой {fill_values[col]:.1f}")
+    return df
+
+def _decide_drops(df, state, config):
+    # Колонки где все значения одинаковые или бесполезные - решение по профилю
+    print(" Очистка бесполезных колонок...")
+    profile = state['profile']
+    numeric_columns = state['numeric_columns']
+    # Колонки берутся из профиля: шаг работает и с DataFrame, и с таблицей Arrow
+    columns = list(profile.index)
+    state['categorical_columns'] = [col for col in columns if col not in numeric_columns]
+    keep_columns = config.get('keep_columns')
+    columns_to_drop = []
+    if keep_columns is not None:
+        # Набор колонок уже определен (потоковый режим) - просто выравниваем
+        columns_to_drop = [col for col in columns if col not in keep_columns]
+    else:
+        for col in columns:
+            stats = profile.loc[col]
+            # Пропуски не считаются значением (nunique()), поэтому колонка из одного значения
+            # с пропусками тоже удаляется. Исходная версия проверяла после заполнения и так
+            # поступала только с нечисловыми колонками после первых десяти (их она не заполняла);
+            # здесь правило одно для всех нечисловых колонок, независимо от их позиции
+            if stats['is_constant']:
+                columns_to_drop.append(col)
+                print(f"     Удалена колонка {col} (все значения одинаковые)")
+            # Колонки где слишком много пропусков (>90%). Числовые, как и в исходной версии,
+            # остаются: к проверке они уже заполнены медианой
+            elif col not in numeric_columns and stats['null_ratio'] > 0.9:
+                columns_to_drop.append(col)
+                print(f"     Удалена колонка {col} (>90% пропусков)")
+        # Следующие батчи потока выравниваются по этому набору колонок
+        config['keep_columns'] = [col for col in columns if col not in columns_to_drop]
+        config['dropped_columns'] = columns_to_drop
+        config['numeric_columns'] = [col for col in numeric_columns if col in config['keep_columns']]
+        config['null_ratios'] = {col: float(profile.at[col, 'null_ratio']) for col in config['keep_columns']}
+    state['columns_to_drop'] = columns_to_drop
+    return df
+
+def _fill_categorical(df, state, config):
+    # Для категориальных колонок - значение 'Unknown'
+    # Нестроковые значения (Int64, числовые категории) сначала приводятся к строкам:
+    # 'Unknown' не вставить в Int64. Ошибка заполнения прерывает трансформацию -
+    # иначе колонка ушла бы в выход с пропусками
+    def fill(col):
+        values = _string_values(df[col])
+        if values.dtype.name == 'category' and 'Unknown' not in values.cat.categories:
+            # Для категориальных типов добавляем новую категорию
+            values = values.cat.add_categories(['Unknown'])
+        return values.fillna('Unknown')
+
+    fill_columns = [col for col in state['categorical_columns'] if state['profile'].at[col, 'null_count'] > 0]
+    for col, values in zip(fill_columns, _map_columns(fill, fill_columns, config)):
+        df[col] = values
+        _column_log(config, f"   🔧 {col}: заполнено пропусков значением 'Unknown'")
+    return df
+
+def _deduplicate(df, state, config):
+    # Дубликаты ищутся по всем исходным колонкам - по векторным хешам строк.
+    # Общий дедупликатор помнит строки прошлых батчей и сбрасывает хеши на диск
+    print("🔍 Поиск дубликатов...")
+    deduplicator = config.get('deduplicator')
+    local_deduplicator = deduplicator is None
+    if local_deduplicator:
+        deduplicator = RowDeduplicator()
+    try:
+        rows_before = len(df)
+        df = deduplicator.drop_duplicates(df)
+    finally:
+        if local_deduplicator:
+            deduplicator.close()
+    state['duplicates'] = rows_before - len(df)
+    state['dedup_columns'] = list(df.columns)
+    if state['duplicates'] > 0:
+        print(f"     Удалено дубликатов: {state['duplicates']}")
+    else:
+        print("    Дубликатов не найдено")
+    return df
+
+def _drop_columns(df, state, config):
+    columns_to_drop = [col for col in state['columns_to_drop'] if col in df.columns]
+    return df.drop(columns=columns_to_drop) if columns_to_drop else df
+
+def _category_columns(string_columns, rows, state, config):
+    """Non-numeric columns that stay dictionary-encoded (fixed by the first frame of a stream)"""
+    category_columns = config.get('category_columns')
+    if category_columns is None:
+        profile = state['profile']
+        category_columns = [
+            col for col in string_columns
+            if profile.at[col, 'distinct_count'] + 1 <= DICTIONARY_MAX_RATIO * rows
+        ]
+    return category_columns
+
+def _record_categories(string_columns, category_columns, categories, config):
+    """Remember category columns and vocabularies after encoding a frame"""
+    dictionary_columns = [col for col in string_columns if col in category_columns]
+    # Словари категорий всех батчей - для сохраняемого состояния
+    vocabulary = config.setdefault('vocabulary', {})
+    for col in dictionary_columns:
+        known = vocabulary.setdefault(col, [])
+        seen = set(known)
+        known.extend(value for value in categories(col) if value not in seen)
+    if config.get('category_columns') is None:
+        # Следующие батчи потока кодируются так же
+        config['category_columns'] = dictionary_columns
+    _column_log(config, f"    Словарные колонки (category): {dictionary_columns}")
+    _column_log(config, f"    Строковые колонки: {[col for col in string_columns if col not in category_columns]}")
+
+def _encode(df, state, config):
+    # Нечисловые колонки остаются словарными (category): значения хранятся один раз,
+    # сравнения идут по кодам. В строки колонки декодируются только при записи в SQLite.
+    # Колонки с почти уникальными значениями (идентификаторы) словарь не сжимает -
+    # они приводятся к обычным строкам
+    print("🔧 Приведение нечисловых колонок...")
+    string_columns = [col for col in df.columns if col not in state['numeric_columns']]
+    category_columns = _category_columns(string_columns, len(df), state, config)
+    encode = lambda col: _string_category(df[col]) if col in category_columns else df[col].astype(str)
+    for col, values in zip(string_columns, _map_columns(encode, string_columns, config)):
+        df[col] = values
+    _record_categories(string_columns, category_columns, lambda col: df[col].cat.categories, config)
+    return df
+
+def _summary(df, state, config):
+    # Базовая статистика после трансформации (диапазоны из профиля -
+    # заполнение медианой их не меняет)
+    numeric_columns = state['numeric_columns']
+    profile = state.get('profile')
+    print(" Статистика после трансформации:")
+    print(f"   • Размер данных: {df.shape[0]} строк, {df.shape[1]} колонок")
+    print(f"   • Числовые колонки: {len(numeric_columns)}")
+    print(f"   • Строковые колонки: {len(df.columns) - len(numeric_columns)}")
+
+    if numeric_columns and not config.get('quiet'):
+        print(f"   • Примеры числовых колонок:")
+        for col in numeric_columns[:3]:
+            if col in df.columns and profile is not None:
+                print(f"     {col}: {profile.at[col, 'min']:.1f} - {profile.at[col, 'max']:.1f}")
+            elif col in df.columns:
+                print(f"     {col}: {df[col].min():.1f} - {df[col].max():.1f}")
+
+    # Отчет о дедупликации для валидации. Он верен, только если дубликаты искались по
+    # колонкам результата: строки, различавшиеся лишь в удаленных колонках, снова совпадают
+    df.attrs['duplicates_removed'] = state['duplicates']
+    if state.get('dedup_columns') == list(df.columns):
+        df.attrs['deduplicated_rows'] = len(df)
+    else:
+        df.attrs.pop('deduplicated_rows', None)
+    return df
+
+def _apply_columns(df, state, config):
+    """Fill and encode every kept column with the fitted state, one pass per column"""
+    print(" Применение сохраненного состояния трансформации...")
+    missing = [col for col in config['keep_columns'] if col not in df.columns]
+    if missing:
+        raise ValueError(f"В данных нет колонок из сохраненного состояния: {missing}")
+    df = df.copy(deep=False)
+    numeric_columns = config['numeric_columns']
+    medians = config['medians']
+    category_columns = set(config['category_columns'])
+    vocabulary = config['vocabulary']
+    state['numeric_columns'] = numeric_columns
+    state['columns_to_drop'] = [col for col in df.columns if col not in config['keep_columns']]
+
+    def apply(col):
+        values = df[col]
+        if col in numeric_columns:
+            if not pd.api.types.is_numeric_dtype(values):
+                values = pd.to_numeric(values, errors='coerce')
+            return values.fillna(medians[col]).astype('float64'), 0
+        values = _string_values(values)
+        if values.dtype.name == 'category':
+            values = values.astype(object)
+        values = values.fillna('Unknown')
+        if col not in category_columns:
+            return values.astype(str), 0
+        values = values.astype(str)
+        # Коды известных значений совпадают с обучением, новые значения добавляются в конец
+        known = vocabulary.get(col, [])
+        unseen = sorted(set(values.unique()) - set(known))
+        return pd.Series(pd.Categorical(values, categories=known + unseen), index=values.index), len(unseen)
+
+    columns = config['keep_columns']
+    for col, (values, unseen) in zip(columns, _map_columns(apply, columns, config)):
+        df[col] = values
+        if unseen:
+            _column_log(config, f"    {col}: новых значений категорий - {unseen}")
+    return df
+
+# --- план ---
+
+class TransformPlan:
+    """
+    Declarative description of the transform steps
+
+    Building a plan does not touch any data; steps run only when execute()
+    is called, and the same plan can be executed for every batch of a
+    stream. optimize() returns an equivalent plan with fewer materialized
+    intermediates: the defensive input copy is removed (steps replace
+    columns instead of writing into the input), numeric coercion, profiling
+    and median fill are fused into one step, and the column drop is moved
+    before encoding so dropped columns are never converted.
+
+    Decisions made on the first executed frame (kept and categorical
+    columns) are stored in the plan config and reused by later executions.
+    With config['workers'] > 1 the per-column work of the steps (coercion,
+    profiling, fills, encoding) runs in a thread pool; config['quiet']
+    turns off the per-column log lines.
+    Wall and CPU times and row counts of every step are accumulated for
+    explain() and the run metrics.
+    """
+
+    def __init__(self, steps: List[Step], config: Optional[Dict[str, Any]] = None,
+                 optimized: bool = False, notes: Optional[List[str]] = None):
+        self.steps = steps
+        self.config = config if config is not None else {}
+        self.optimized = optimized
+        self.notes = notes or []
+        self.stats = {step.name: {'calls': 0, 'seconds': 0.0, 'cpu_seconds': 0.0, 'rows_in': 0, 'rows_out': 0}
+                      for step in steps}
+
+    @classmethod
+    def default(cls, keep_columns: Optional[List[str]] = None,
+                category_columns: Optional[List[str]] = None,
+                medians: Optional[Dict[str, float]] = None,
+                deduplicator: Optional[RowDeduplicator] = None, workers: int = 1,
+                quiet: bool = False) -> 'TransformPlan':
+        """Logical plan of transform_data, in the order the steps are defined"""
+        config = {'keep_columns': keep_columns, 'category_columns': category_columns,
+                  'medians': medians, 'deduplicator': deduplicator, 'workers': workers, 'quiet': quiet}
+        return cls([
+            Step('copy', 'копия входного DataFrame', _copy_input),
+            Step('coerce_numeric', 'приведение числовых колонок (pd.to_numeric)', _coerce_numeric),
+            Step('profile', 'профиль всех колонок за один проход', _profile),
+            Step('decide_drops', 'выбор бесполезных колонок по профилю', _decide_drops),
+            Step('fill_numeric', 'заполнение числовых пропусков медианой', _fill_numeric),
+            Step('fill_categorical', "заполнение категориальных пропусков 'Unknown'", _fill_categorical),
+            Step('dedup', 'удаление дубликатов по хешам строк', _deduplicate),
+            Step('encode', 'category / str для нечисловых колонок', _encode),
+            Step('drop_columns', 'удаление бесполезных колонок', _drop_columns),
+            Step('summary', 'статистика и отчет о дубликатах', _summary),
+        ], config)
+
+    @classmethod
+    def from_state(cls, fitted: Dict[str, Any], deduplicator: Optional[RowDeduplicator] = None,
+                   workers: int = 1, quiet: bool = False) -> 'TransformPlan':
+        """
+        Apply plan for a fitted transform state (see transform_state)
+        
+        Kept columns, medians and category vocabularies come from the state,
+        so nothing is profiled: every kept column is filled and encoded in
+        one step, then rows are deduplicated and the other columns dropped.
+        """
+        config = {'keep_columns': fitted['keep_columns'], 'numeric_columns': fitted['numeric_columns'],
+                  'category_columns': fitted['category_columns'], 'medians': fitted['medians'],
+                  'vocabulary': {col: list(values) for col, values in fitted['vocabulary'].items()},
+                  'null_ratios': fitted.get('null_ratios', {}), 'fitted_medians': dict(fitted['medians']),
+                  'deduplicator': deduplicator, 'workers': workers, 'quiet': quiet}
+        return cls([
+            Step('apply_columns', 'заполнение и кодирование колонок по сохраненному состоянию', _apply_columns),
+            Step('dedup', 'удаление дубликатов по хешам строк', _deduplicate),
+            Step('drop_columns', 'удаление колонок, отброшенных при обучении', _drop_columns),
+            Step('summary', 'статистика и отчет о дубликатах', _summary),
+        ], config, optimized=True)
+
+    def optimize(self) -> 'TransformPlan':
+        """Equivalent plan with the rewrite rules applied"""
+        if self.optimized:
+            return self
+        steps = list(self.steps)
+        notes = []
+        names = [step.name for step in steps]
+
+        # 1. Копия входа не нужна: шаги заменяют колонки, а не пишут во вход
+        if 'copy' in names:
+            steps = [step for step in steps if step.name != 'copy']
+            notes.append("убрана копия входа (шаги заменяют колонки, вход не меняется)")
+
+        # 2. Приведение типов + профиль числовых колонок + заполнение медианой - один шаг
+        names = [step.name for step in steps]
+        if 'coerce_numeric' in names and 'fill_numeric' in names:
+            fused = Step('coerce_fill_numeric', 'приведение, профиль и заполнение числовых колонок за один шаг',
+                         _coerce_fill_numeric, fused=('coerce_numeric', 'fill_numeric'))
+            steps = [fused if step.name == 'coerce_numeric' else step
+                     for step in steps if step.name != 'fill_numeric']
+            steps = [step._replace(description='профиль нечисловых колонок (числовые уже профилированы)')
+                     if step.name == 'profile' else step for step in steps]
+            notes.append("слиты coerce_numeric + fill_numeric: числовая колонка материализуется один раз")
+
+        # 3. Удаление колонок - сразу после последнего шага, которому нужны все колонки
+        names = [step.name for step in steps]
+        if 'drop_columns' in names and 'dedup' in names and names.index('drop_columns') > names.index('dedup') + 1:
+            drop = steps.pop(names.index('drop_columns'))
+            steps.insert([step.name for step in steps].index('dedup') + 1, drop)
+            notes.append("drop_columns перенесен сразу после dedup: удаляемые колонки не кодируются")
+
+        return TransformPlan(steps, self.config, optimized=True, notes=notes)
+
+    def execute(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Run the plan on one DataFrame"""
+        state: PlanState = {'duplicates': 0}
+        for step in self.steps:
+            stats = self.stats[step.name]
+            rows_in = len(df)
+            started = time.perf_counter()
+            # Время CPU процесса: с workers > 1 в него входят потоки пула
+            started_cpu = time.process_time()
+            df = step.run(df, state, self.config)
+            stats['seconds'] += time.perf_counter() - started
+            stats['cpu_seconds'] += time.process_time() - started_cpu
+            stats['calls'] += 1
+            stats['rows_in'] += rows_in
+            stats['rows_out'] += len(df)
+        return df
+
+    def explain(self) -> str:
+        """Text description of the plan with the accumulated cost of every step"""
+        title = 'оптимизированный' if self.optimized else 'логический'
+        lines = [f" План трансформации ({title}):"]
+        total = sum(stats['seconds'] for stats in self.stats.values())
+        for number, step in enumerate(self.steps, start=1):
+            stats = self.stats[step.name]
+            line = f"   {number:>2}. {step.name:<20} {step.description}"
+            if step.fused:
+                line += f" [слито: {', '.join(step.fused)}]"
+            lines.append(line)
+            if stats['calls']:
+                share = stats['seconds'] / total * 100 if total else 0.0
+                lines.append(f"       {stats['seconds'] * 1000:9.1f} мс ({share:4.1f}%), "
+                             f"CPU {stats['cpu_seconds'] * 1000:.1f} мс, "
+                             f"вызовов: {stats['calls']}, строк: {stats['rows_in']} -> {stats['rows_out']}")
+        for note in self.notes:
+            lines.append(f"   * {note}")
+        if total:
+            lines.append(f"   Всего: {total * 1000:.1f} мс")
+        return "\n".join(lines)
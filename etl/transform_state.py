@@ -0,0 +1,129 @@
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+# Версия формата файла состояния - меняется при несовместимых изменениях
+STATE_FORMAT = 1
+
+# Доля изменения пропусков или новых категорий, после которой состояние считается устаревшим
+DRIFT_THRESHOLD = 0.1
+
+
+def state_from_plan(plan, source: str) -> Dict[str, Any]:
+    """
+    Transform state learned by an executed plan (see TransformPlan.from_state)
+
+    Args:
+        plan: TransformPlan that has transformed at least one frame
+        source: Input the state was fitted on (for the record only)
+
+    Returns:
+        dict: Kept and dropped columns, fill medians, category vocabularies,
+        output dtypes and null ratios of the fitted data
+    """
+    config = plan.config
+    if config.get('keep_columns') is None or config.get('category_columns') is None:
+        raise ValueError("План еще не выполнялся - состояние трансформации не определено")
+    keep_columns = list(config['keep_columns'])
+    numeric_columns = [col for col in config['numeric_columns'] if col in keep_columns]
+    category_columns = [col for col in config['category_columns'] if col in keep_columns]
+    dtypes = {}
+    for col in keep_columns:
+        if col in numeric_columns:
+            dtypes[col] = 'float64'
+        elif col in category_columns:
+            dtypes[col] = 'category'
+        else:
+            dtypes[col] = 'object'
+    return {
+        'format': STATE_FORMAT,
+        'fitted_at': datetime.now().isoformat(timespec='seconds'),
+        'source': source,
+        'rows': plan.stats['summary']['rows_out'],
+        'keep_columns': keep_columns,
+        'dropped_columns': list(config.get('dropped_columns', [])),
+        'numeric_columns': numeric_columns,
+        'medians': {col: config['fitted_medians'][col] for col in numeric_columns},
+        'category_columns': category_columns,
+        'vocabulary': {col: list(config['vocabulary'].get(col, [])) for col in category_columns},
+        'dtypes': dtypes,
+        'null_ratios': {col: config.get('null_ratios', {}).get(col, 0.0) for col in keep_columns},
+    }
+
+
+def load_state(path: str) -> Optional[Dict[str, Any]]:
+    """Read a saved transform state, None if there is none"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('format') != STATE_FORMAT:
+        raise ValueError(f"Неподдерживаемый формат состояния трансформации {state.get('format')}: {path}")
+    return state
+
+
+def save_state(path: str, state: Dict[str, Any]) -> int:
+    """
+    Save a transform state as the next version
+
+    The current state is written to path, and every version is kept next to
+    it as <name>.v<N>.json, so an earlier state can be restored.
+
+    Returns:
+        int: Version number of the saved state
+    """
+    previous = load_state(path) if os.path.exists(path) else None
+    state = dict(state, version=(previous or {}).get('version', 0) + 1)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    stem, extension = os.path.splitext(path)
+    for target in (f"{stem}.v{state['version']}{extension or '.json'}", path):
+        tmp_path = f"{target}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, target)
+    return state['version']
+
+
+def detect_drift(state: Dict[str, Any], raw_df: pd.DataFrame,
+                 threshold: float = DRIFT_THRESHOLD) -> List[str]:
+    """
+    Differences of new raw data from the data a state was fitted on
+
+    Args:
+        state: Transform state (see load_state)
+        raw_df: Raw frame or first batch of the new data
+        threshold: Allowed change of the null ratio and share of rows with
+            unseen categories
+
+    Returns:
+        list: Descriptions of the drift found, empty if the state still fits
+    """
+    if raw_df.empty:
+        return []
+    reasons = []
+    missing = [col for col in state['keep_columns'] if col not in raw_df.columns]
+    if missing:
+        reasons.append(f"нет колонок {missing}")
+    known = set(state['keep_columns']) | set(state.get('dropped_columns', []))
+    new_columns = [col for col in raw_df.columns if col not in known]
+    if new_columns:
+        reasons.append(f"новые колонки {new_columns}")
+
+    for col in state['keep_columns']:
+        if col not in raw_df.columns:
+            continue
+        values = raw_df[col]
+        null_ratio = float(values.isna().mean())
+        fitted_ratio = state['null_ratios'].get(col, 0.0)
+        if abs(null_ratio - fitted_ratio) > threshold:
+            reasons.append(f"{col}: доля пропусков {fitted_ratio:.2f} -> {null_ratio:.2f}")
+        if col in state['vocabulary']:
+            present = values.dropna()
+            if len(present):
+                unseen = 1.0 - float(present.astype(str).isin(state['vocabulary'][col]).mean())
+                if unseen > threshold:
+                    reasons.append(f"{col}: новые категории в {unseen:.0%} строк")
+    return reasons
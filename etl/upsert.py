@@ -0,0 +1,44 @@
+from typing import Sequence
+
+# Ключ строки при дозагрузке: пациент определяется идентификатором
+UPSERT_KEY = 'Patient Id'
+
+def quote_identifier(name: str) -> str:
+    """Identifier in double quotes (SQLite and Postgres)"""
+    return '"' + name.replace('"', '""') + '"'
+
+def merge_statement(table: str, staging: str, columns: Sequence[str], key: str = UPSERT_KEY,
+                    dialect: str = 'sqlite') -> str:
+    """
+    INSERT ... ON CONFLICT DO UPDATE that merges a staging table into the target
+
+    New keys are inserted; existing rows are updated only when some column
+    differs (null-safe comparison), so unchanged rows are not written.
+    The target needs a unique index or primary key on key.
+
+    Args:
+        table: Target table (may include a schema, already quoted)
+        staging: Staging table with the same columns (already quoted)
+        columns: Column names
+        key: Conflict column
+        dialect: 'sqlite' or 'postgresql'
+
+    Returns:
+        str: SQL statement
+    """
+    if key not in columns:
+        raise ValueError(f"Нет ключевой колонки {key} для дозагрузки")
+    names = ', '.join(quote_identifier(col) for col in columns)
+    values = [col for col in columns if col != key]
+    # IS NOT в SQLite и IS DISTINCT FROM в Postgres сравнивают NULL как значение
+    different = 'IS NOT' if dialect == 'sqlite' else 'IS DISTINCT FROM'
+    # WHERE true нужен SQLite, чтобы ON CONFLICT не читался как часть SELECT
+    sql = f"INSERT INTO {table} ({names}) SELECT {names} FROM {staging} WHERE true " \
+          f"ON CONFLICT ({quote_identifier(key)}) "
+    if not values:
+        return sql + "DO NOTHING"
+    target = table.split('.')[-1]
+    updates = ', '.join(f"{quote_identifier(col)} = excluded.{quote_identifier(col)}" for col in values)
+    changed = ' OR '.join(f"{target}.{quote_identifier(col)} {different} excluded.{quote_identifier(col)}"
+                          for col in values)
+    return sql + f"DO UPDATE SET {updates} WHERE {changed}"
@@ -1,22 +1,35 @@
 import pandas as pd
+import pyarrow as pa
+from typing import Union
 
-def validate_raw_data(df: pd.DataFrame) -> bool:
+from arrow_backend import as_table, count_duplicates as count_table_duplicates, null_counts
+from row_dedup import count_duplicates
+
+def validate_raw_data(df: Union[pd.DataFrame, pa.Table], backend: str = 'pandas') -> bool:
     """
     Validate raw data after extraction
     
     Args:
-        df: Raw DataFrame to validate
+        df: Raw DataFrame (or Arrow table with backend='arrow') to validate
+        backend: 'pandas', or 'arrow' to count nulls with pyarrow.compute
         
     Returns:
         bool: True if validation passed
     """
     print("🔍 Валидация сырых данных...")
+    if backend == 'arrow':
+        table = as_table(df)
+        rows, columns = table.num_rows, table.column_names
+        empty_columns = [col for col, nulls in null_counts(table).items() if nulls == rows]
+    else:
+        rows, columns = len(df), df.columns
+        empty_columns = df.columns[df.isnull().all()].tolist()
     
     checks_passed = 0
     total_checks = 4
     
     # Проверка 1: DataFrame не пустой
-    if not df.empty:
+    if rows > 0 and len(columns) > 0:
         print("    Данные не пустые")
         checks_passed += 1
     else:
@@ -24,23 +37,22 @@ def validate_raw_data(df: pd.DataFrame) -> bool:
         return False
     
     # Проверка 2: Есть колонки
-    if len(df.columns) > 0:
-        print(f"    Есть колонки: {len(df.columns)}")
+    if len(columns) > 0:
+        print(f"    Есть колонки: {len(columns)}")
         checks_passed += 1
     else:
         print("    Нет колонок")
         return False
     
     # Проверка 3: Есть строки
-    if len(df) > 0:
-        print(f"    Есть строки: {len(df)}")
+    if rows > 0:
+        print(f"    Есть строки: {rows}")
         checks_passed += 1
     else:
         print("    Нет строк")
         return False
     
     # Проверка 4: Нет полностью пустых колонок
-    empty_columns = df.columns[df.isnull().all()].tolist()
     if not empty_columns:
         print("    Нет полностью пустых колонок")
         checks_passed += 1
@@ -50,12 +62,14 @@ def validate_raw_data(df: pd.DataFrame) -> bool:
     print(f"    Результат валидации: {checks_passed}/{total_checks}")
     return checks_passed >= 3
 
-def validate_transformed_data(df: pd.DataFrame) -> bool:
+def validate_transformed_data(df: Union[pd.DataFrame, pa.Table], backend: str = 'pandas') -> bool:
     """
     Validate transformed data
     
     Args:
-        df: Transformed DataFrame to validate
+        df: Transformed DataFrame (or Arrow table with backend='arrow') to validate
+        backend: 'pandas', or 'arrow' to count nulls and duplicates with
+            pyarrow.compute (duplicates by grouping on all columns)
         
     Returns:
         bool: True if validation passed
@@ -65,16 +79,32 @@ def validate_transformed_data(df: pd.DataFrame) -> bool:
     checks_passed = 0
     total_checks = 3
     
+    attrs = df.attrs if isinstance(df, pd.DataFrame) else {}
+    table = as_table(df) if backend == 'arrow' else None
+    rows = table.num_rows if table is not None else len(df)
+    column_count = table.num_columns if table is not None else len(df.columns)
+    
     # Проверка 1: Нет пропусков
-    missing_values = df.isnull().sum().sum()
+    if table is not None:
+        missing_values = sum(null_counts(table).values())
+    else:
+        missing_values = df.isnull().sum().sum()
     if missing_values == 0:
         print("    Нет пропущенных значений")
         checks_passed += 1
     else:
         print(f"     Пропущенные значения: {missing_values}")
     
-    # Проверка 2: Нет дубликатов
-    duplicates = df.duplicated().sum()
+    # Проверка 2: Нет дубликатов. Если это тот же результат transform_data
+    # (число строк совпадает с отчетом, а дубликаты искались по его колонкам),
+    # берем ее отчет, иначе ищем дубликаты по векторным хешам строк
+    if attrs.get('deduplicated_rows') == rows:
+        duplicates = 0
+        print(f"    Дедупликация уже выполнена (удалено строк: {attrs.get('duplicates_removed', 0)})")
+    elif table is not None:
+        duplicates = count_table_duplicates(table)
+    else:
+        duplicates = count_duplicates(df)
     if duplicates == 0:
         print("    Нет дубликатов")
         checks_passed += 1
@@ -82,7 +112,7 @@ def validate_transformed_data(df: pd.DataFrame) -> bool:
         print(f"     Дубликаты: {duplicates}")
     
     # Проверка 3: Разумный размер данных
-    if len(df) > 0 and len(df.columns) > 0:
+    if rows > 0 and column_count > 0:
         print("    Размер данных корректен")
         checks_passed += 1
     else:
@@ -101,4 +131,5 @@ if __name__ == "__main__":
     print(" Тестирование модуля валидации...")
     validate_raw_data(test_df)
     validate_transformed_data(test_df)
+    validate_transformed_data(test_df, backend='arrow')
     print(" Модуль validate работает корректно")
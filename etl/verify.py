@@ -0,0 +1,220 @@
+import math
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from bulk_loader import is_database_url
+from upsert import quote_identifier as _quote
+
+def _is_numeric(values: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(values.dtype) and values.dtype.name != 'category'
+
+def _text_lengths(values: pd.Series) -> int:
+    """Total length of the non-null values as text (what SQLite LENGTH() sums)"""
+    if values.dtype.name == 'category':
+        # Длины считаются по категориям и раскладываются по кодам
+        lengths = values.cat.categories.astype(str).str.len().to_numpy()
+        codes = values.cat.codes.to_numpy()
+        return int(lengths[codes[codes >= 0]].sum())
+    present = values.dropna()
+    return int(present.astype(str).str.len().sum()) if len(present) else 0
+
+def _bounds(values: pd.Series) -> Optional[Tuple]:
+    """Min and max of the non-null values: numbers as float, everything else as text"""
+    if _is_numeric(values):
+        present = values.dropna()
+        return (float(present.min()), float(present.max())) if len(present) else None
+    if values.dtype.name == 'category':
+        # Только категории, которые встречаются в колонке
+        codes = pd.unique(values.cat.codes.to_numpy())
+        present = pd.Series(values.cat.categories[codes[codes >= 0]].astype(str))
+    else:
+        present = values.dropna().astype(str)
+    return (present.min(), present.max()) if len(present) else None
+
+def _merge_bounds(known: Optional[Tuple], bounds: Optional[Tuple]) -> Optional[Tuple]:
+    if known is None or bounds is None:
+        return bounds if known is None else known
+    return min(known[0], bounds[0]), max(known[1], bounds[1])
+
+class FrameDigest:
+    """
+    Additive fingerprint of the rows written to a sink
+
+    rows and per column the non-null count, a sum (the value for numeric
+    columns, the text length otherwise) and the min/max value (numbers, or
+    text in code point order). Digests of batches add up to the digest of
+    the whole output, so it is computed from the frames while writing, batch
+    by batch, and verification never reads the data back: a database
+    computes the same values in one aggregate query (see table_digest), a
+    Parquet file has null counts and min/max in its column statistics (see
+    verify_parquet_file). It is a check of counts and aggregates, not a
+    checksum of every value.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns: Dict[str, List] = {}
+        self.numeric: Set[str] = set()
+        self.bounds: Dict[str, Optional[Tuple]] = {}
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        for col in df.columns:
+            values = df[col]
+            count = int(values.count())
+            if _is_numeric(values):
+                self.numeric.add(col)
+                total = float(values.sum())
+            else:
+                total = _text_lengths(values)
+            state = self.columns.setdefault(col, [0, 0])
+            state[0] += count
+            state[1] += total
+            self.bounds[col] = _merge_bounds(self.bounds.get(col), _bounds(values))
+
+    def nulls(self, col: str) -> int:
+        return self.rows - self.columns[col][0]
+
+def _total(expression: str, dialect: str) -> str:
+    # TOTAL в SQLite не переполняется на больших целых и дает 0.0 для пустой колонки
+    return f"TOTAL({expression})" if dialect == 'sqlite' else f"COALESCE(SUM({expression}), 0)"
+
+def _min_max(expression: str, numeric: bool, dialect: str) -> List[str]:
+    if not numeric and dialect == 'postgresql':
+        # Порядок байтов UTF-8 (как в Python и в BINARY SQLite), а не правила локали базы
+        expression = f'{expression} COLLATE "C"'
+    return [f"MIN({expression})", f"MAX({expression})"]
+
+def table_digest(conn, table: str, expected: FrameDigest, dialect: str = 'sqlite') -> FrameDigest:
+    """
+    Count/sum/min/max digest of a database table in one aggregate query
+
+    Columns and their kinds (numeric or text) are taken from the expected
+    digest. The scan runs inside the database and returns one row: no table
+    data is transferred to Python.
+
+    Args:
+        conn: DB-API connection (sqlite3 or psycopg2)
+        table: Table name
+        expected: Digest of the rows loaded into the table
+        dialect: 'sqlite' or 'postgresql'
+    """
+    columns = list(expected.columns)
+    parts = ['COUNT(*)']
+    for col in columns:
+        quoted = _quote(col)
+        numeric = col in expected.numeric
+        parts.append(f"COUNT({quoted})")
+        parts.append(_total(quoted if numeric else f"LENGTH({quoted})", dialect))
+        parts.extend(_min_max(quoted, numeric, dialect))
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {', '.join(parts)} FROM {_quote(table)}")
+        values = cursor.fetchone()
+    finally:
+        cursor.close()
+    digest = FrameDigest()
+    digest.rows = values[0]
+    digest.numeric = set(expected.numeric)
+    for index, col in enumerate(columns):
+        count, total, low, high = values[1 + 4 * index:5 + 4 * index]
+        # Postgres возвращает SUM целых как Decimal
+        digest.columns[col] = [count, float(total)]
+        if low is None:
+            digest.bounds[col] = None
+        elif col in expected.numeric:
+            digest.bounds[col] = (float(low), float(high))
+        else:
+            digest.bounds[col] = (str(low), str(high))
+    return digest
+
+def _bounds_problem(col: str, actual: Optional[Tuple], expected: Optional[Tuple]) -> Optional[str]:
+    if actual != expected:
+        return f"{col}: min/max {actual}, ожидалось {expected}"
+    return None
+
+def compare_digests(expected: FrameDigest, actual: FrameDigest) -> List[str]:
+    """Differences of row counts and of the per-column count, sum and min/max"""
+    if expected.rows != actual.rows:
+        return [f"строк {actual.rows}, ожидалось {expected.rows}"]
+    problems = []
+    for col, (count, total) in expected.columns.items():
+        if col not in actual.columns:
+            problems.append(f"нет колонки {col}")
+            continue
+        actual_count, actual_total = actual.columns[col]
+        if actual_count != count:
+            problems.append(f"{col}: непустых значений {actual_count}, ожидалось {count}")
+        elif not math.isclose(actual_total, total, rel_tol=1e-9, abs_tol=1e-6):
+            problems.append(f"{col}: сумма {actual_total:.6g}, ожидалось {total:.6g}")
+        elif col in actual.bounds:
+            problem = _bounds_problem(col, actual.bounds[col], expected.bounds.get(col))
+            if problem:
+                problems.append(problem)
+    return problems
+
+def _statistics_bounds(statistics, numeric: bool) -> Optional[Tuple]:
+    low, high = statistics.min, statistics.max
+    if isinstance(low, bytes):
+        low, high = low.decode(), high.decode()
+    return (float(low), float(high)) if numeric else (str(low), str(high))
+
+def verify_parquet_file(path: str, expected: FrameDigest, columns: Sequence[str]) -> List[str]:
+    """
+    Check a written Parquet file against the digest of its rows, by the footer only
+
+    The row count, the null counts and the min/max of the column statistics
+    (computed by the Parquet writer from the encoded values) are compared
+    with the digest computed from the frames while writing. A lost or
+    altered row group, a wrong column or values cut at the extremes show up
+    here. A changed value between the min and the max does not: only the
+    extremes are recorded. Columns written without statistics are checked
+    by the row count alone. The footer size depends on the number of row
+    groups and columns, not on the number of rows.
+
+    Args:
+        path: Parquet file
+        expected: Digest of the rows written to the file
+        columns: Column names in file order
+    """
+    metadata = pq.read_metadata(path)
+    problems = []
+    if metadata.num_rows != expected.rows:
+        problems.append(f"{path}: строк {metadata.num_rows}, записано {expected.rows}")
+    for index, col in enumerate(columns):
+        null_counts = []
+        bounds = None
+        has_bounds = True
+        for group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(group).column(index).statistics
+            if statistics is None or not statistics.has_null_count:
+                break
+            null_counts.append(statistics.null_count)
+            if statistics.has_min_max:
+                bounds = _merge_bounds(bounds, _statistics_bounds(statistics, col in expected.numeric))
+            elif statistics.num_values:
+                # Значения есть, а min/max не записаны (например, слишком длинные строки)
+                has_bounds = False
+        else:
+            if sum(null_counts) != expected.nulls(col):
+                problems.append(f"{path}: {col}: пропусков {sum(null_counts)}, записано {expected.nulls(col)}")
+            elif has_bounds:
+                problem = _bounds_problem(col, bounds, expected.bounds.get(col))
+                if problem:
+                    problems.append(f"{path}: {problem}")
+    return problems
+
+def verify_table(db: str, table: str, expected: FrameDigest) -> List[str]:
+    """Compare a table (SQLite path or Postgres URL) with the digest of the rows loaded into it"""
+    if is_database_url(db):
+        from postgres_loader import pooled_engine
+        conn, dialect = pooled_engine(db).raw_connection(), 'postgresql'
+    else:
+        conn, dialect = sqlite3.connect(db), 'sqlite'
+    try:
+        return compare_digests(expected, table_digest(conn, table, expected, dialect))
+    finally:
+        conn.close()
@@ -1,34 +1,60 @@
 import pandas as pd
-import wget
 import os
+import sys
 import numpy as np
+import pyarrow as pa
+
+# Загрузчик файлов общий с ETL пайплайном
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'etl'))
+from http_download import RangedDownload
+from column_schema import read_csv_table
 
 class DataLoader:
     def __init__(self):
         self.FILE_ID = "1aUvCzNoEHzLiKqYh9t9MZ-8wU-qtNFNS"
         self.data_folder = "data"
         self.file_path = os.path.join(self.data_folder, "dataset.csv")
+        # Типы колонок, выведенные при первом чтении CSV
+        self.schema_path = os.path.join(self.data_folder, "dataset.schema.json")
         self.df = None
     
     def download_and_load_data(self):
-        """Скачивание и загрузка данных с Google Drive"""
+        """Скачивание и загрузка данных с Google Drive
+        
+        Файл качается параллельными диапазонами с докачкой после обрыва,
+        неизмененный файл повторно не скачивается (условный GET), а разбор
+        CSV начинается, пока хвост файла еще загружается.
+        """
         file_url = f"https://drive.google.com/uc?id={self.FILE_ID}"
         
         os.makedirs(self.data_folder, exist_ok=True)
         
         print("Скачивание данных с Google Drive...")
-        wget.download(file_url, self.file_path)
-        print("\nДанные скачаны!")
+        download = RangedDownload(file_url, self.file_path).start()
+        with download.open_stream() as stream:
+            self.df = self._read_csv(stream)
+        download.wait()
+        if download.not_modified:
+            print("Файл на сервере не изменился, использована локальная копия")
+        else:
+            print("Данные скачаны!")
         
-        self.df = pd.read_csv(self.file_path, encoding='latin1')
         print(f"Загружено данных: {self.df.shape}")
         return self.df
     
+    def _read_csv(self, source):
+        """Многопоточный разбор CSV через Arrow с сохраненной схемой колонок"""
+        table = read_csv_table(source, schema_path=self.schema_path, encoding='latin1')
+        # Очистка ниже работает со строками object, как после pd.read_csv - словари раскодируем
+        strings = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_dictionary(field.type) else field
+                             for field in table.schema])
+        return table.cast(strings).to_pandas()
+    
     def load_data(self):
         """Загрузка данных"""
         if os.path.exists(self.file_path):
             print("Загрузка существующих данных...")
-            self.df = pd.read_csv(self.file_path, encoding='latin1')
+            self.df = self._read_csv(self.file_path)
             print(f"Загружено: {self.df.shape}")
         else:
             print("Файл не найден, скачиваем с Google Drive...")
@@ -1,57 +1,69 @@
+import argparse
 import pandas as pd
-import psycopg2
-from sqlalchemy import create_engine
+import sys
 import os
 from dotenv import load_dotenv
 
-def write_dataset_to_postgres():
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'etl'))
+from postgres_loader import PostgresBulkLoader
+
+def write_dataset_to_postgres(mode='replace'):
     """
     Записывает датасет в таблицу PostgreSQL
     ВАЖНО: Учетные данные должны быть установлены как переменные окружения
+
+    mode: 'replace' - пересоздать таблицу, 'upsert' - дозагрузка по Patient Id
     """
     try:
         load_dotenv()
-        
+
         # Загружаем данные из найденного parquet файла
         df = pd.read_parquet('/Users/anna/data_loader_project_clean/data/optimized_dataset.parquet')
-        
+
         # Ограничиваем 100 строками
         df = df.head(100)
-        
+
         print(f"Загружено {len(df)} строк для записи в БД")
         print(f"Колонки: {list(df.columns)}")
-        
+
         # Проверяем наличие переменных окружения
         required_vars = ['DB_HOST', 'DB_USER', 'DB_PASSWORD']
         missing_vars = [var for var in required_vars if not os.getenv(var)]
-        
+
         if missing_vars:
             print(f"Переменные окружения не установлены: {missing_vars}")
             print("Это нормально при локальном тесте")
             return
-        
+
         # Подключаемся к PostgreSQL
         connection_string = (
             f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
             f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT', '5432')}/homeworks"
         )
-        
-        engine = create_engine(connection_string)
+
         table_name = 'samoylova'
-        
-        df.to_sql(
-            table_name, 
-            engine, 
-            schema='public', 
-            if_exists='replace', 
-            index=False
-        )
-        
-        print(f"Успешно записано {len(df)} строк в таблицу {table_name}")
+
+        # COPY FROM STDIN через соединение из общего пула вместо построчных INSERT из to_sql
+        loader = PostgresBulkLoader(connection_string, table_name, schema='public', mode=mode, indexes=())
+        try:
+            loader.write(df)
+            loader.finish()
+        except Exception:
+            loader.close()
+            raise
+
+        if mode == 'upsert':
+            print(f"Дозагрузка в таблицу {table_name}: {loader.report()}")
+            return
+
+        print(f"Успешно записано {len(df)} строк в таблицу {table_name}: {loader.report()}")
         print("Домашнее задание 6 успешно выполнено")
-        
+
     except Exception as e:
         print(f"Ошибка: {e}")
 
 if __name__ == "__main__":
-    write_dataset_to_postgres()
+    parser = argparse.ArgumentParser(description='Запись датасета в PostgreSQL')
+    parser.add_argument('--mode', choices=['replace', 'upsert'], default='replace',
+                        help='replace - пересоздать таблицу, upsert - дозагрузка по Patient Id')
+    write_dataset_to_postgres(parser.parse_args().mode)
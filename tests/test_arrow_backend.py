@@ -0,0 +1,70 @@
+"""
+The Arrow transform backend gives the same output as the pandas one
+
+    python -m pytest tests/test_arrow_backend.py
+"""
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from synthetic_data import synthetic_frame
+from transform import transform_data
+
+
+def _transform(df, backend):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return transform_data(df, backend=backend)
+
+
+def test_mixed_type_object_columns():
+    rows = 200
+    df = pd.DataFrame({
+        'Patient Id': [f"PID{index}" for index in range(rows)],
+        # Числа вперемешку со строками - в числовой и в строковой колонке
+        'Patient Age': [index % 15 if index % 10 else 'unknown' for index in range(rows)],
+        'Gender': ['Male' if index % 3 else (1 if index % 2 else None) for index in range(rows)],
+        'Institute Name': [f"Institute {index % 4}" if index % 5 else 2.5 for index in range(rows)],
+        'Blood cell count (mcL)': np.linspace(4.0, 6.0, rows),
+    }).astype({'Patient Age': object, 'Gender': object, 'Institute Name': object})
+
+    expected = _transform(df, 'pandas')
+    result = _transform(df, 'arrow')
+    pd.testing.assert_frame_equal(result, expected)
+    assert result['Patient Age'].isna().sum() == 0
+    assert 'unknown' not in result['Patient Age'].astype(str).tolist()
+
+
+def _float_input(rows):
+    # Как из CSV: целые с пропусками - float64, строки - object
+    df = synthetic_frame(rows)
+    return df.astype({col: 'float64' for col in df.columns if df[col].dtype == 'Int64'})
+
+
+def _int64_input(rows):
+    # Как Parquet, записанный pandas: Test, Symptom и возраст - Int64 с пропусками
+    return synthetic_frame(rows)
+
+
+def _categorical_input(rows):
+    # Словарные колонки (Arrow dictionary), в том числе с числовыми категориями
+    df = synthetic_frame(rows)
+    columns = [col for col in df.columns if col != 'Patient Id' and (df[col].dtype == object or col.startswith('Symptom'))]
+    return df.astype({col: 'category' for col in columns})
+
+
+@pytest.mark.parametrize('make_input', [_float_input, _int64_input, _categorical_input])
+def test_same_output_for_input_dtypes(make_input):
+    df = make_input(3000)
+    expected = _transform(df, 'pandas')
+    result = _transform(df, 'arrow')
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.isna().sum().sum() == 0
+    assert (result.dtypes[['Patient Age', 'No. of previous abortion']] == 'float64').all()
@@ -0,0 +1,138 @@
+"""
+Arrow CSV reading with declared numeric columns
+
+    python -m pytest tests/test_column_schema.py
+"""
+import io
+import json
+import math
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+
+from column_schema import SCHEMA_DIR, iter_csv_batches, load_schema, read_csv_table, schema_path_for
+
+ROWS = 5000
+
+
+def _write_csv(path, bad_row):
+    lines = ['Patient Id,Patient Age,Gender,Test 1']
+    for index in range(ROWS):
+        age = 'unknown' if index == bad_row else ('-99' if index % 7 == 0 else str(index % 15))
+        lines.append(f"PID{index},{age},{'Male' if index % 2 else 'Female'},0")
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def _expected_ages(bad_row):
+    # Как pd.to_numeric(errors='coerce') после NA_VALUES: -99 и нечисло - пропуски
+    return [None if index == bad_row or index % 7 == 0 else float(index % 15) for index in range(ROWS)]
+
+
+def _ages(table):
+    return [None if value is None or math.isnan(value) else value
+            for value in table.column('Patient Age').to_pylist()]
+
+
+def test_non_numeric_token_becomes_null(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    schema_path = str(tmp_path / 'schema.json')
+    _write_csv(path, bad_row=ROWS - 3)
+
+    table = read_csv_table(path, schema_path)
+    assert pa.types.is_float64(table.schema.field('Patient Age').type)
+    assert _ages(table) == _expected_ages(ROWS - 3)
+    # Сохраненная схема читает колонку строкой - второе чтение не падает и дает то же
+    assert load_schema(schema_path)['Patient Age'] == pa.string()
+    assert read_csv_table(path, schema_path).equals(table)
+
+
+def test_non_numeric_token_with_numeric_schema(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    schema_path = str(tmp_path / 'schema.json')
+    _write_csv(path, bad_row=-1)
+    read_csv_table(path, schema_path)
+    assert load_schema(schema_path)['Patient Age'] == pa.float64()
+
+    _write_csv(path, bad_row=10)
+    assert _ages(read_csv_table(path, schema_path)) == _expected_ages(10)
+
+
+def test_streamed_batches_with_late_non_numeric_token(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    _write_csv(path, bad_row=ROWS - 3)
+
+    batches = list(iter_csv_batches(path, batch_rows=1000))
+    assert [batch.num_rows for batch in batches] == [1000] * 5
+    assert all(pa.types.is_float64(batch.schema.field('Patient Age').type) for batch in batches)
+    assert _ages(pa.concat_tables(batches)) == _expected_ages(ROWS - 3)
+    assert pa.concat_tables(batches).column('Patient Id').to_pylist() == [f"PID{i}" for i in range(ROWS)]
+
+
+def test_stream_source_with_non_numeric_token(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    _write_csv(path, bad_row=42)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    table = read_csv_table(io.BufferedReader(io.BytesIO(data)))
+    assert _ages(table) == _expected_ages(42)
+    batches = list(iter_csv_batches(io.BufferedReader(io.BytesIO(data)), batch_rows=2000))
+    assert _ages(pa.concat_tables(batches)) == _expected_ages(42)
+
+
+def test_same_values_as_pandas_to_numeric(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    tokens = ['5', '+5', '5.', '.5', '1e3', ' 7 ', 'nan', 'inf', 'unknown', '0x10', '1,5', '12abc']
+    with open(path, 'w') as f:
+        f.write('Patient Age\n' + '\n'.join(f'"{token}"' for token in tokens) + '\n')
+
+    table = read_csv_table(path)
+    expected = pd.to_numeric(pd.Series(tokens), errors='coerce')
+    pd.testing.assert_series_equal(table.column('Patient Age').to_pandas(), expected, check_names=False)
+
+
+def _types(table):
+    return {field.name: field.type for field in table.schema}
+
+
+def test_streamed_batches_are_encoded_like_the_whole_file(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    _write_csv(path, bad_row=-1)
+
+    table = read_csv_table(path, str(tmp_path / 'whole.json'))
+    batches = list(iter_csv_batches(path, batch_rows=1000, schema_path=str(tmp_path / 'stream.json')))
+    assert pa.types.is_dictionary(table.schema.field('Gender').type)
+    assert all(_types(batch) == _types(table) for batch in batches)
+    assert load_schema(str(tmp_path / 'stream.json'))['Gender'] == load_schema(str(tmp_path / 'whole.json'))['Gender']
+
+
+def test_stale_schema_is_inferred_again_while_streaming(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    schema_path = str(tmp_path / 'schema.json')
+    _write_csv(path, bad_row=-1)
+    # Схема от другого файла: Gender там была числом
+    with open(schema_path, 'w') as f:
+        json.dump({'columns': {'Patient Id': 'string', 'Patient Age': 'double', 'Gender': 'double',
+                               'Test 1': 'double'}}, f)
+
+    batches = list(iter_csv_batches(path, batch_rows=1000, schema_path=schema_path))
+    genders = pa.concat_tables(batches).column('Gender').to_pylist()
+    assert genders == ['Male' if index % 2 else 'Female' for index in range(ROWS)]
+    assert _ages(pa.concat_tables(batches)) == _expected_ages(-1)
+    assert load_schema(schema_path)['Gender'] == pa.dictionary(pa.int32(), pa.string())
+    assert load_schema(schema_path)['Patient Age'] == pa.float64()
+
+
+def test_default_schema_path_does_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = schema_path_for('data.csv')
+    os.mkdir('other')
+    monkeypatch.chdir('other')
+    assert os.path.dirname(first) == SCHEMA_DIR
+    assert schema_path_for('data.csv') != first
+    assert schema_path_for(str(tmp_path / 'data.csv')) == first
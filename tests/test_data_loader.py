@@ -0,0 +1,31 @@
+"""
+DataLoader on CSV parsed by the Arrow reader
+
+    python -m pytest tests/test_data_loader.py
+"""
+import contextlib
+import io
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'experiments', 'data_loader_project'))
+
+from data_loader import DataLoader
+
+
+def test_strings_stay_object_and_get_cleaned(tmp_path):
+    path = tmp_path / 'dataset.csv'
+    rows = [f"PID{index},{index % 15},{'' if index % 4 == 0 else ('Yes' if index % 3 else 'No')},Alive"
+            for index in range(1000)]
+    path.write_text('Patient Id,Patient Age,Maternal gene,Status\n' + '\n'.join(rows) + '\n')
+
+    loader = DataLoader()
+    loader.file_path = str(path)
+    loader.schema_path = str(tmp_path / 'dataset.schema.json')
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = loader.load_data()
+        # Словарные колонки Arrow приходят строками object, как из pd.read_csv
+        assert df['Maternal gene'].dtype == object
+        assert df['Status'].dtype == object
+        loader.auto_clean_problematic_columns()
+    assert loader.df['Maternal gene'].isna().sum() == 0
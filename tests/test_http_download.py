@@ -0,0 +1,161 @@
+"""
+RangedDownload against a local http.server with byte ranges and ETags
+
+    python -m pytest tests/test_http_download.py
+"""
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+
+from http_download import RangedDownload
+
+# Размер чанка не кратен размеру чтений - чтения пересекают границы чанков
+CHUNK_SIZE = 10007
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves server.payload with Range, ETag and If-None-Match; fails ranges starting at server.fail_from or later"""
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self, status, length, extra=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', self.server.etag)
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.server.requests.append(('HEAD', None))
+        if self.headers.get('If-None-Match') == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self._headers(200, len(self.server.payload))
+
+    def do_GET(self):
+        payload = self.server.payload
+        byte_range = self.headers.get('Range')
+        self.server.requests.append(('GET', byte_range))
+        if not byte_range:
+            self._headers(200, len(payload))
+            self.wfile.write(payload)
+            return
+        start, end = (int(value) for value in byte_range.split('=')[1].split('-'))
+        if self.server.fail_from is not None and start >= self.server.fail_from:
+            self.send_error(503)
+            return
+        # Чанки приходят не по порядку
+        time.sleep(random.random() * self.server.max_delay)
+        self._headers(206, end - start + 1, {'Content-Range': f"bytes {start}-{end}/{len(payload)}"})
+        self.wfile.write(payload[start:end + 1])
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.daemon_threads = True
+    rows = [f"{index},PID0x{index:x},{index % 15},{'Yes' if index % 3 else 'No'}\n" for index in range(20000)]
+    httpd.payload = ('id,Patient Id,Patient Age,Status\n' + ''.join(rows)).encode()
+    httpd.etag = f'"{hashlib.sha1(httpd.payload).hexdigest()}"'
+    httpd.requests = []
+    httpd.fail_from = None
+    httpd.max_delay = 0.01
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(httpd):
+    return f"http://127.0.0.1:{httpd.server_address[1]}/data.csv"
+
+
+def _read_stream(download):
+    with download.open_stream() as stream:
+        # Мелкие чтения, как у разборщика CSV, попадают на границы чанков
+        data = b''.join(iter(lambda: stream.read(4093), b''))
+    download.wait()
+    return data
+
+
+def test_csv_parsed_from_stream_while_downloading(server, tmp_path):
+    rows = [f"{index},PID0x{index:x},{index % 15},{'Yes' if index % 3 else 'No'}\n" for index in range(300000)]
+    server.payload = ('id,Patient Id,Patient Age,Status\n' + ''.join(rows)).encode()
+    expected = pa_csv.read_csv(pa.BufferReader(server.payload))
+
+    def download(index):
+        download = RangedDownload(_url(server), str(tmp_path / f"data-{index}.csv"), parts=4,
+                                  chunk_size=300007)
+        # Разборщик Arrow читает блоками по 1 MB поверх недокачанных чанков
+        with download.open_stream() as stream:
+            table = pa_csv.read_csv(stream)
+        download.wait()
+        return table
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        tables = list(executor.map(download, range(12)))
+    assert all(table.equals(expected) for table in tables)
+    for index in range(12):
+        assert (tmp_path / f"data-{index}.csv").read_bytes() == server.payload
+
+
+def test_ranged_download_streams_exact_bytes(server, tmp_path):
+    download = RangedDownload(_url(server), str(tmp_path / 'data.csv'), parts=4, chunk_size=CHUNK_SIZE)
+    assert _read_stream(download) == server.payload
+    assert (tmp_path / 'data.csv').read_bytes() == server.payload
+    assert sum(1 for method, byte_range in server.requests if method == 'GET' and byte_range) > 1
+
+
+def test_interrupted_download_resumes_missing_chunks(server, tmp_path):
+    dest = str(tmp_path / 'data.csv')
+    server.fail_from = CHUNK_SIZE * 5
+    with pytest.raises(Exception):
+        RangedDownload(_url(server), dest, parts=1, chunk_size=CHUNK_SIZE, retries=0).wait()
+    assert not os.path.exists(dest)
+
+    server.fail_from = None
+    server.requests.clear()
+    download = RangedDownload(_url(server), dest, parts=4, chunk_size=CHUNK_SIZE)
+    data = _read_stream(download)
+    assert data == server.payload
+    assert download.resumed_chunks == 5
+    fetched = [byte_range for method, byte_range in server.requests if method == 'GET' and byte_range]
+    assert all(int(byte_range.split('=')[1].split('-')[0]) >= CHUNK_SIZE * 5 for byte_range in fetched)
+
+
+def test_unchanged_file_is_revalidated_with_304(server, tmp_path):
+    dest = str(tmp_path / 'data.csv')
+    RangedDownload(_url(server), dest, chunk_size=CHUNK_SIZE).wait()
+
+    server.requests.clear()
+    download = RangedDownload(_url(server), dest, chunk_size=CHUNK_SIZE)
+    assert _read_stream(download) == server.payload
+    assert download.not_modified
+    assert server.requests == [('HEAD', None)]
+
+
+def test_changed_file_is_downloaded_again(server, tmp_path):
+    dest = str(tmp_path / 'data.csv')
+    RangedDownload(_url(server), dest, chunk_size=CHUNK_SIZE).wait()
+
+    server.payload = server.payload.replace(b'Yes', b'Ja!')
+    server.etag = f'"{hashlib.sha1(server.payload).hexdigest()}"'
+    download = RangedDownload(_url(server), dest, chunk_size=CHUNK_SIZE)
+    assert _read_stream(download) == server.payload
+    assert not download.not_modified
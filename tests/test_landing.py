@@ -0,0 +1,77 @@
+"""
+RawLandingZone writer thread: publishing at exit, a dead writer, stale temporary files
+
+    python -m pytest tests/test_landing.py
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+ETL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl')
+sys.path.append(ETL_DIR)
+
+from landing import RawLandingZone
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('Patient Id,Patient Age\n' + ''.join(f"PID{index},{index % 15}\n" for index in range(1000)))
+    return str(path)
+
+
+def _landing(source, raw_dir):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return RawLandingZone(source, raw_dir=str(raw_dir))
+
+
+def test_snapshot_is_published_when_caller_does_not_finish(source, tmp_path):
+    # Как бенчмарк или __main__ модуля: load_data без finish_raw_landing
+    schema_path = str(tmp_path / 'schema.json')
+    script = (f"import sys; sys.path.append({ETL_DIR!r}); from extract import load_data; "
+              f"load_data({source!r}, csv_schema={schema_path!r})")
+    subprocess.run([sys.executable, '-c', script], cwd=tmp_path, check=True, capture_output=True)
+    names = os.listdir(tmp_path / 'data' / 'raw')
+    assert any(name.startswith('raw_') and name.endswith('.parquet') for name in names)
+    assert not [name for name in names if name.endswith('.tmp')]
+
+
+def test_close_returns_when_the_writer_died_with_a_full_queue(source, tmp_path):
+    landing = _landing(source, tmp_path / 'raw')
+    landing.write(pd.DataFrame({'a': [1, 2]}))
+    # Другой тип колонки во втором батче - писатель падает
+    landing.write(pd.DataFrame({'a': ['x', 'y']}))
+    landing._thread.join(timeout=10)
+    assert not landing._thread.is_alive()
+    with pytest.raises(Exception):
+        landing.write(pd.DataFrame({'a': [3]}))
+    landing._queue.put_nowait(pd.DataFrame({'a': [4]}))
+    landing._queue.put_nowait(pd.DataFrame({'a': [5]}))
+
+    closer = threading.Thread(target=landing.close, kwargs={'discard': True}, daemon=True)
+    closer.start()
+    closer.join(timeout=10)
+    assert not closer.is_alive()
+    assert not [name for name in os.listdir(tmp_path / 'raw') if name.endswith('.tmp')]
+
+
+def test_stale_temporary_files_are_swept(source, tmp_path):
+    raw_dir = tmp_path / 'raw'
+    raw_dir.mkdir()
+    # Процесса с таким pid нет; имя без pid - от прежних версий; свой pid - живой писатель
+    dead = raw_dir / '.raw_999999999_1.parquet.tmp'
+    legacy = raw_dir / '.raw_140141865719488.parquet.tmp'
+    alive = raw_dir / f".raw_{os.getpid()}_1.parquet.tmp"
+    for path in (dead, legacy, alive):
+        path.write_bytes(b'partial')
+
+    landing = _landing(source, raw_dir)
+    landing.close(discard=True)
+    assert not dead.exists() and not legacy.exists()
+    assert alive.exists()
@@ -0,0 +1,48 @@
+"""
+Streaming medians from KLL sketches
+
+    python -m pytest tests/test_quantile_sketch.py
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+
+from quantile_sketch import _add_counts, compute_medians
+
+
+def _batches(rows=200000, batch_rows=10000, seed=1):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Blood cell count (mcL)': rng.normal(4.9, 0.25, rows),
+        # Мало различных значений: большинство строк совпадает с медианой
+        'Patient Age': rng.integers(0, 15, rows).astype(float),
+        'Test 1': np.zeros(rows),
+    })
+    df.loc[rng.random(rows) < 0.1, 'Patient Age'] = np.nan
+    return df, lambda: (df.iloc[start:start + batch_rows] for start in range(0, rows, batch_rows))
+
+
+def test_sketch_medians_are_the_same_on_every_run():
+    df, make_batches = _batches()
+    columns = list(df.columns)
+    first = compute_medians(make_batches, columns, mode='sketch')
+    assert all(compute_medians(make_batches, columns, mode='sketch') == first for _ in range(3))
+
+
+@pytest.mark.parametrize('rows', [200000, 200001])
+def test_exact_medians_match_pandas(rows):
+    df, make_batches = _batches(rows=rows)
+    medians = compute_medians(make_batches, list(df.columns), mode='exact')
+    assert medians == {col: float(df[col].median()) for col in df.columns}
+
+
+def test_window_keeps_counts_of_distinct_values():
+    counts = _add_counts(None, np.array([3.0, 1.0, 3.0, 3.0]))
+    counts = _add_counts(counts, np.array([2.0, 3.0, 1.0]))
+    assert counts[0].tolist() == [1.0, 2.0, 3.0]
+    assert counts[1].tolist() == [2, 1, 4]
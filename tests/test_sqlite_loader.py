@@ -0,0 +1,79 @@
+"""
+SQLiteBulkLoader with rows repeating Patient Id
+
+    python -m pytest tests/test_sqlite_loader.py
+"""
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+
+from sqlite_loader import SQLiteBulkLoader
+
+
+def _frame(rows=1000):
+    # Каждый десятый пациент встречается дважды с другим возрастом
+    ids = [f"PID{index}" for index in range(rows)] + [f"PID{index}" for index in range(0, rows, 10)]
+    return pd.DataFrame({
+        'Patient Id': ids,
+        'Patient Age': [float(index % 15) for index in range(len(ids))],
+        'Gender': ['Male' if index % 2 else 'Female' for index in range(len(ids))],
+    })
+
+
+def _load(db_path, batches, mode):
+    loader = SQLiteBulkLoader(str(db_path), mode=mode, indexes=[('Gender',)], commit_rows=300)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for batch, df in enumerate(batches):
+            loader.write(df, batch=batch)
+        loader.finish()
+    return loader
+
+
+def test_full_load_keeps_rows_repeating_the_key(tmp_path):
+    df = _frame()
+    db_path = tmp_path / 'data.db'
+    loader = _load(db_path, [df.iloc[:600], df.iloc[600:]], mode='replace')
+    assert loader.repeated_keys == 100
+    assert 'повторяют Patient Id' in loader.report()
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM medical_data').fetchone()[0] == len(df)
+        # Поиск по ключу идет по индексу, а не по полному просмотру таблицы
+        plan = conn.execute('EXPLAIN QUERY PLAN SELECT * FROM medical_data WHERE "Patient Id" = ?',
+                            ('PID10',)).fetchall()
+        assert 'USING INDEX' in plan[0][-1]
+        ages = conn.execute('SELECT "Patient Age" FROM medical_data WHERE "Patient Id" = ? ORDER BY rowid',
+                            ('PID10',)).fetchall()
+    assert ages == [(10.0,), (1000 % 15 + 1.0,)]
+
+
+def test_upsert_keeps_the_last_row_of_a_key(tmp_path):
+    df = _frame()
+    db_path = tmp_path / 'data.db'
+    loader = _load(db_path, [df], mode='upsert')
+    assert loader.repeated_keys == 0
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM medical_data').fetchone()[0] == 1000
+        age = conn.execute('SELECT "Patient Age" FROM medical_data WHERE "Patient Id" = ?', ('PID10',)).fetchone()
+    assert age == (1000 % 15 + 1.0,)
+
+
+def test_column_types_follow_dtypes_not_the_first_batch(tmp_path):
+    df = _frame()
+    # В первом батче возраст целый, во втором - с дробной частью
+    df.loc[600:, 'Patient Age'] += 0.5
+    db_path = tmp_path / 'data.db'
+    _load(db_path, [df.iloc[:600], df.iloc[600:]], mode='replace')
+
+    with sqlite3.connect(db_path) as conn:
+        types = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(medical_data)')}
+        stored = conn.execute('SELECT DISTINCT typeof("Patient Age") FROM medical_data').fetchall()
+    assert types == {'Patient Id': 'TEXT', 'Patient Age': 'REAL', 'Gender': 'TEXT'}
+    assert stored == [('real',)]
@@ -0,0 +1,73 @@
+"""
+transform_data: column drop decisions and null filling of non-string inputs
+
+    python -m pytest tests/test_transform.py
+"""
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+
+from transform import transform_data
+
+
+def _frame(rows=100):
+    index = np.arange(rows)
+    return pd.DataFrame({
+        'Patient Id': [f"PID{i}" for i in index],
+        'Patient Age': (index % 15).astype(float),
+        'Gender': np.where(index % 2, 'Male', 'Female'),
+        # Одно значение и пропуски - удаляется. Исходная версия удаляла такую колонку
+        # только после первых десяти нечисловых (как 'Parental consent' в датасете)
+        'Parental consent': np.where(index % 10 == 0, None, 'Yes'),
+        # Два значения и пропуски - остается, пропуски заполняются 'Unknown'
+        'Maternal gene': np.where(index % 10 == 0, None, np.where(index % 3, 'Yes', 'No')),
+        # >90% пропусков: числовая остается и заполняется медианой, нечисловая удаляется
+        'Blood cell count (mcL)': np.where(index < 5, 4.0 + index, np.nan),
+        'Mostly empty': np.where(index < 5, 'x', None),
+        'Test 1': np.zeros(rows),
+    })
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'arrow'])
+def test_single_valued_and_mostly_empty_columns_are_dropped(backend):
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = transform_data(_frame(), backend=backend)
+    assert list(out.columns) == ['Patient Id', 'Patient Age', 'Gender', 'Maternal gene', 'Blood cell count (mcL)']
+    assert out['Maternal gene'].isna().sum() == 0
+    assert (out['Maternal gene'] == 'Unknown').sum() == 10
+    assert (out['Blood cell count (mcL)'] == 6.0).sum() == 96
+
+
+def _parquet_frame(rows=1000):
+    # Как Parquet, записанный pandas: целые с пропусками - Int64, категории с числами
+    rng = np.random.default_rng(0)
+    gaps = rng.random(rows) < 0.1
+    return pd.DataFrame({
+        'Patient Id': [f"PID{i}" for i in range(rows)],
+        'Patient Age': pd.array(rng.integers(0, 15, rows), dtype='Int64'),
+        'Birth asphyxia': pd.array(np.where(gaps, None, rng.integers(0, 2, rows)), dtype='Int64'),
+        'Heart Rate': pd.Categorical(np.where(gaps, None, rng.integers(0, 2, rows).astype(object))),
+        'Status': pd.Categorical(np.where(rng.random(rows) < 0.1, None, rng.choice(['Alive', 'Deceased'], rows))),
+    })
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'arrow'])
+def test_nullable_int_and_numeric_categories_are_filled(backend):
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = transform_data(_parquet_frame(), backend=backend)
+    assert out.isna().sum().sum() == 0
+    assert (out['Birth asphyxia'] == 'Unknown').sum() == (out['Heart Rate'] == 'Unknown').sum() > 0
+
+
+def test_nullable_int_values_become_their_strings():
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = transform_data(_parquet_frame())
+    assert sorted(out['Birth asphyxia'].unique()) == ['0', '1', 'Unknown']
+    assert sorted(out['Heart Rate'].unique()) == ['0', '1', 'Unknown']
@@ -0,0 +1,59 @@
+"""
+Duplicate check of validate_transformed_data on transform_data output
+
+    python -m pytest tests/test_validate.py
+"""
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+
+from transform import transform_data
+from validate import validate_transformed_data
+
+
+def _frame(rows=100):
+    df = pd.DataFrame({
+        'Patient Id': [f"PID{index}" for index in range(rows)],
+        'Patient Age': np.arange(rows, dtype=float) % 15,
+        'Gender': ['Male' if index % 2 else 'Female' for index in range(rows)],
+        # >90% пропусков - колонка удаляется после дедупликации
+        'Mostly empty': [None] * rows,
+    })
+    # Две пары строк различаются только в удаляемой колонке
+    df.loc[1, ['Patient Id', 'Patient Age', 'Gender']] = df.loc[0, ['Patient Id', 'Patient Age', 'Gender']].values
+    df.loc[3, ['Patient Id', 'Patient Age', 'Gender']] = df.loc[2, ['Patient Id', 'Patient Age', 'Gender']].values
+    df.loc[[0, 2], 'Mostly empty'] = 'x'
+    return df
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'arrow'])
+def test_duplicates_left_by_dropped_columns_are_reported(backend):
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = transform_data(_frame(), backend=backend)
+    assert 'Mostly empty' not in out.columns
+    assert out.duplicated().sum() == 2
+
+    report = io.StringIO()
+    with contextlib.redirect_stdout(report):
+        validate_transformed_data(out)
+    assert 'Дубликаты: 2' in report.getvalue()
+    assert 'Результат валидации: 2/3' in report.getvalue()
+
+
+def test_report_is_used_when_no_columns_are_dropped():
+    df = _frame().drop(columns=['Mostly empty'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = transform_data(df)
+    assert out.attrs['deduplicated_rows'] == len(out)
+
+    report = io.StringIO()
+    with contextlib.redirect_stdout(report):
+        assert validate_transformed_data(out)
+    assert 'Дедупликация уже выполнена (удалено строк: 2)' in report.getvalue()
@@ -0,0 +1,76 @@
+"""
+Post-load verification of Parquet files and database tables without reading the data back
+
+    python -m pytest tests/test_verify.py
+"""
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'etl'))
+
+from parquet_sink import ParquetOptions, ParquetSink
+from sqlite_loader import SQLiteBulkLoader
+from verify import FrameDigest, verify_table
+
+
+def _frame(rows=1000, offset=0):
+    index = np.arange(offset, offset + rows)
+    return pd.DataFrame({
+        'Patient Id': [f"PID{i}" for i in index],
+        'Patient Age': (index % 15).astype(float),
+        'Blood cell count (mcL)': np.where(index % 9 == 0, np.nan, 4.0 + (index % 100) / 50),
+        'Gender': pd.Categorical(np.where(index % 2, 'Male', 'Female')),
+    })
+
+
+def _write_parquet(path, batches):
+    sink = ParquetSink(str(path), ParquetOptions(row_group_rows=700))
+    for df in batches:
+        sink.write(df)
+    sink.close()
+    return sink
+
+
+def test_parquet_file_matches_the_written_rows(tmp_path):
+    sink = _write_parquet(tmp_path / 'out.parquet', [_frame(), _frame(offset=1000)])
+    assert sink.verify() == []
+
+
+def test_parquet_values_changed_after_writing_are_found(tmp_path):
+    path = tmp_path / 'out.parquet'
+    sink = _write_parquet(path, [_frame(), _frame(offset=1000)])
+    # Тот же размер и те же пропуски, но другие данные - футер записан заново
+    table = pq.read_table(path)
+    ages = table.column('Patient Age').to_numpy().copy()
+    ages[5] = 99.0
+    table = table.set_column(1, 'Patient Age', pa.array(ages))
+    pq.write_table(table, path, row_group_size=700)
+
+    problems = sink.verify()
+    assert len(problems) == 1 and 'Patient Age' in problems[0] and 'min/max' in problems[0]
+
+
+def test_database_table_is_checked_by_counts_sums_and_bounds(tmp_path):
+    df = _frame()
+    db_path = str(tmp_path / 'data.db')
+    loader = SQLiteBulkLoader(db_path, indexes=[])
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.write(df)
+        loader.finish()
+    expected = FrameDigest()
+    expected.update(df)
+    assert verify_table(db_path, 'medical_data', expected) == []
+
+    # Та же длина строки и то же число значений - сумма длин не меняется, max меняется
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""UPDATE medical_data SET "Gender" = 'Zzzz' WHERE "Patient Id" = 'PID1'""")
+    problems = verify_table(db_path, 'medical_data', expected)
+    assert problems == ["Gender: min/max ('Female', 'Zzzz'), ожидалось ('Female', 'Male')"]